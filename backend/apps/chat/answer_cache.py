@@ -0,0 +1,115 @@
+"""
+Semantic answer cache for chat responses.
+
+An entry belongs to a user and a file set: the sorted (id, updated_at) of every
+file the question referenced (all of the user's files when none were selected),
+hashed into `file_set_key`. A new question reuses an entry with the same key
+whose query embedding has cosine similarity of at least
+`ANSWER_CACHE_SIMILARITY_THRESHOLD`, so a file that changed since never serves
+an old answer. Signals in `apps.chat.signals` also delete the entries of a
+file when it is saved (re-ingested, renamed) or deleted.
+
+Only first questions of a conversation are cached; follow-ups depend on the
+earlier turns.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from typing import List, Optional
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.files.models import FileAsset
+from .models import AnswerCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def _referenced_files(user_id: int, file_ids: Optional[List[int]]):
+    files = FileAsset.objects.filter(user_id=user_id)
+    if file_ids:
+        files = files.filter(id__in=file_ids)
+    return list(files.order_by('id').values_list('id', 'updated_at'))
+
+
+def file_set_key(files) -> str:
+    identity = ';'.join(f"{file_id}:{updated_at.isoformat()}" for file_id, updated_at in files)
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def _normalized(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype='<f4')
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def lookup(user_id: int, file_ids: Optional[List[int]], query_embedding: List[float]) -> Optional[dict]:
+    """A cached answer for a near-identical question about the same file versions, or None."""
+    key = file_set_key(_referenced_files(user_id, file_ids))
+    candidates = list(
+        AnswerCacheEntry.objects.filter(
+            user_id=user_id,
+            file_set_key=key,
+            created_at__gte=timezone.now() - timedelta(seconds=settings.ANSWER_CACHE_TTL),
+        ).order_by('-last_used_at').values_list('id', 'query_embedding')[:settings.ANSWER_CACHE_MAX_CANDIDATES]
+    )
+    query = _normalized(query_embedding)
+    vectors = [np.frombuffer(bytes(blob), dtype='<f4') for _, blob in candidates]
+    matching = [index for index, vector in enumerate(vectors) if vector.shape == query.shape]
+    if not matching:
+        return None
+    scores = np.vstack([vectors[index] for index in matching]) @ query
+    best = int(np.argmax(scores))
+    if scores[best] < settings.ANSWER_CACHE_SIMILARITY_THRESHOLD:
+        return None
+
+    entry_id = candidates[matching[best]][0]
+    AnswerCacheEntry.objects.filter(id=entry_id).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    entry = AnswerCacheEntry.objects.filter(id=entry_id).values('response', 'citations', 'chunks_used').first()
+    if entry is None:
+        return None  # Invalidated in the meantime
+    logger.info(f"[Chat] Answer cache hit for user {user_id} (similarity {scores[best]:.3f})")
+    return {
+        'response': entry['response'],
+        'citations': entry['citations'],
+        'chunks_used': entry['chunks_used'],
+        'cached': True,
+    }
+
+
+def store(user_id: int, file_ids: Optional[List[int]], query_text: str, query_embedding: List[float], result: dict):
+    """Cache a generated answer, then evict the user's least recently used entries beyond the bound."""
+    files = _referenced_files(user_id, file_ids)
+    if not files:
+        return
+    entry = AnswerCacheEntry.objects.create(
+        user_id=user_id,
+        file_set_key=file_set_key(files),
+        all_files=not file_ids,
+        query_text=query_text,
+        query_embedding=_normalized(query_embedding).tobytes(),
+        response=result['response'],
+        citations=result.get('citations', []),
+        chunks_used=result.get('chunks_used', 0),
+    )
+    entry.files.set([file_id for file_id, _ in files])
+
+    stale = list(
+        AnswerCacheEntry.objects.filter(user_id=user_id).order_by('-last_used_at', '-id')
+        .values_list('id', flat=True)[settings.ANSWER_CACHE_MAX_ENTRIES_PER_USER:]
+    )
+    if stale:
+        AnswerCacheEntry.objects.filter(id__in=stale).delete()
+
+
+def invalidate_file(file_asset: FileAsset) -> int:
+    """Delete cached answers that referenced a file, including the owner's all-files answers."""
+    _, deleted_by_model = AnswerCacheEntry.objects.filter(
+        Q(files=file_asset.id) | Q(user_id=file_asset.user_id, all_files=True)
+    ).delete()
+    deleted = deleted_by_model.get(AnswerCacheEntry._meta.label, 0)
+    if deleted:
+        logger.info(f"[Chat] Invalidated {deleted} cached answers for file {file_asset.id}")
+    return deleted
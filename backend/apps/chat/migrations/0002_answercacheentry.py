@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('files', '0003_fileasset_updated_at'),
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_set_key', models.CharField(max_length=64)),
+                ('all_files', models.BooleanField(default=False)),
+                ('query_text', models.TextField()),
+                ('query_embedding', models.BinaryField()),
+                ('response', models.TextField()),
+                ('citations', models.JSONField(default=list)),
+                ('chunks_used', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True)),
+                ('files', models.ManyToManyField(related_name='+', to='files.fileasset')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_cache_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'file_set_key', '-last_used_at'], name='chat_answer_user_id_8bc276_idx')],
+            },
+        ),
+    ]
@@ -38,3 +38,27 @@ class Message(models.Model):
     def __str__(self):
         return f"{self.role} message in conversation {self.conversation.id}"
 
+
+
+class AnswerCacheEntry(models.Model):
+    """A generated answer, reused for near-identical questions about the same file versions."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answer_cache_entries')
+    file_set_key = models.CharField(max_length=64)  # sha256 of the referenced files' ids and versions
+    files = models.ManyToManyField('files.FileAsset', related_name='+')  # Invalidated when any of these change
+    all_files = models.BooleanField(default=False)  # Asked without a file selection
+    query_text = models.TextField()
+    query_embedding = models.BinaryField()  # Normalized little-endian float32
+    response = models.TextField()
+    citations = models.JSONField(default=list)
+    chunks_used = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)  # LRU eviction order
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'file_set_key', '-last_used_at']),
+        ]
+    
+    def __str__(self):
+        return f"Cached answer {self.id} for {self.user.username}: {self.query_text[:50]}"
@@ -1,46 +1,77 @@
 import json
 import logging
 import requests
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 from django.conf import settings
-from apps.rag.services import retrieve_chunks, generate_embeddings
+from apps.rag import query_cache
+from . import answer_cache
+from apps.rag.services import keyword_search, retrieve_chunks, generate_embeddings
 
 logger = logging.getLogger(__name__)
 
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 
-def generate_chat_response(
+# Try a small set of models in order of preference
+MODEL_OPTIONS = [
+    "openai/gpt-4o-mini",  # Fast and cost-effective
+    "openai/gpt-4o",  # More capable
+    "anthropic/claude-3.5-sonnet",  # High quality
+]
+
+SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context from user's documents.
+
+If the context contains relevant information, use it to answer the question accurately.
+If the context does not contain relevant information, say "I cannot find information about this in your files."
+Always cite which file(s) you used when providing information from the context.
+
+Format citations as: [filename] or [filename, page X] if page numbers are available."""
+
+
+def prepare_chat(
     user_message: str,
     user_id: int,
     file_ids: Optional[List[int]] = None,
     conversation_history: Optional[List[dict]] = None,
 ) -> dict:
     """
-    Build a short answer based on the user's files.
-
-    This function:
-    - embeds the user question,
-    - fetches the most relevant chunks,
-    - calls the LLM through OpenRouter,
-    - and returns the answer plus simple file citations.
+    Embed the question and fetch its context, everything before the LLM call.
+    
+    Returns {'result': ...} when no LLM call is needed (cached answer, no
+    matching chunks, missing API key). Otherwise returns the OpenRouter
+    `messages`, `citations` and `chunks_used`, plus what `cache_answer` needs.
     """
     logger.info(f"[Chat] Generating response for user {user_id}, file_ids: {file_ids}")
     
-    # Generate query embedding with retry
-    query_embedding = None
-    max_embedding_retries = 2
+    # Generate query embedding with retry, unless the same question was embedded recently
+    query_embedding = query_cache.lookup(user_message)
+    if query_embedding:
+        logger.info(f"[Chat] Query embedding served from cache")
+    max_embedding_retries = 0 if query_embedding else 2
     for attempt in range(max_embedding_retries):
         try:
             logger.info(f"[Chat] Generating query embedding (attempt {attempt + 1}/{max_embedding_retries})...")
-            query_embeddings = generate_embeddings([user_message])
+            # Query embeddings have their own TTL cache; keep them out of the chunk embedding table
+            query_embeddings = generate_embeddings([user_message], use_cache=False)
             query_embedding = query_embeddings[0] if query_embeddings else None
             if query_embedding:
                 logger.info(f"[Chat] Query embedding generated: {len(query_embedding)} dimensions")
+                query_cache.store(user_message, query_embedding)
                 break
         except Exception as e:
             logger.error(f"[Chat] Error generating query embedding (attempt {attempt + 1}): {str(e)}", exc_info=True)
             if attempt == max_embedding_retries - 1:
                 logger.warning(f"[Chat] All embedding generation attempts failed, will try keyword fallback")
     
+    # Near-identical first question about the same file versions: reuse its answer
+    use_answer_cache = settings.ANSWER_CACHE_ENABLED and bool(query_embedding) and len(conversation_history or []) <= 1
+    if use_answer_cache:
+        try:
+            cached = answer_cache.lookup(user_id, file_ids, query_embedding)
+            if cached:
+                return {'result': cached}
+        except Exception as e:
+            logger.warning(f"[Chat] Answer cache lookup failed: {str(e)}")
+    
     # Retrieve relevant chunks
     chunks = []
     citations = []
@@ -48,56 +79,18 @@ def generate_chat_response(
     if query_embedding:
         try:
             logger.info(f"[Chat] Retrieving chunks for user {user_id}, file_ids: {file_ids}")
-            chunks = retrieve_chunks(query_embedding, user_id, file_ids)
-            logger.info(f"[Chat] Retrieved {len(chunks)} chunks via vector search")
+            chunks = retrieve_chunks(query_embedding, user_id, file_ids, query_text=user_message)
+            logger.info(f"[Chat] Retrieved {len(chunks)} chunks")
         except Exception as e:
             logger.error(f"[Chat] Error retrieving chunks: {str(e)}", exc_info=True)
     
     # RELIABLE FALLBACK: If vector search failed or returned no chunks, try keyword search
-    if not chunks and file_ids:
+    if not chunks:
         logger.info(f"[Chat] Vector search returned no chunks, trying keyword fallback...")
         try:
-            from apps.rag.models import DocumentChunk
-            from apps.files.models import FileAsset
-            
-            # Simple keyword search as fallback
-            query_words = user_message.lower().split()
-            query_words = [w for w in query_words if len(w) > 2]  # Filter short words
-            
-            if query_words:
-                # Search in chunk text
-                keyword_chunks = DocumentChunk.objects.filter(
-                    user_id=user_id,
-                    file_id__in=file_ids
-                )
-                
-                # Find chunks containing any query words
-                matching_chunks = []
-                for chunk in keyword_chunks:
-                    chunk_text_lower = chunk.chunk_text.lower()
-                    matches = sum(1 for word in query_words if word in chunk_text_lower)
-                    if matches > 0:
-                        matching_chunks.append({
-                            'chunk': chunk,
-                            'match_score': matches / len(query_words)
-                        })
-                
-                # Sort by match score and take top chunks
-                matching_chunks.sort(key=lambda x: x['match_score'], reverse=True)
-                top_matches = matching_chunks[:settings.TOP_K_CHUNKS]
-                
-                if top_matches:
-                    logger.info(f"[Chat] Keyword fallback found {len(top_matches)} chunks")
-                    chunks = [{
-                        'chunk_id': item['chunk'].id,
-                        'text': item['chunk'].chunk_text,
-                        'file_id': item['chunk'].file_id,
-                        'filename': item['chunk'].file.filename,
-                        'page_number': item['chunk'].page_number,
-                        'chunk_index': item['chunk'].chunk_index,
-                        'similarity': item['match_score'],  # Use match score as similarity
-                        'metadata': item['chunk'].metadata,
-                    } for item in top_matches]
+            chunks = keyword_search(user_message, user_id, file_ids)
+            if chunks:
+                logger.info(f"[Chat] Keyword fallback found {len(chunks)} chunks")
         except Exception as e:
             logger.error(f"[Chat] Keyword fallback failed: {str(e)}", exc_info=True)
     
@@ -121,172 +114,209 @@ def generate_chat_response(
         context = None
         logger.warning(f"[Chat] No chunks found for user {user_id}, file_ids: {file_ids}")
     
-    # Early return if no chunks found (before calling Bedrock)
+    # Early return if no chunks found (before calling the LLM)
     if not chunks or not context:
         logger.info(f"[Chat] No chunks available after all fallbacks, returning 'no information' message")
-        return {
+        return {'result': {
             'response': "I cannot find information about this in your files.",
             'citations': [],
             'chunks_used': 0
-        }
-    
-    # Generate response using OpenRouter API
-    # At this point, we know chunks exist (early return handled above)
+        }}
     
     # Check API key
-    openrouter_api_key = getattr(settings, 'OPENROUTER_API_KEY', None)
-    if not openrouter_api_key:
+    if not getattr(settings, 'OPENROUTER_API_KEY', None):
         logger.error("[Chat] OPENROUTER_API_KEY not configured")
-        return {
+        return {'result': {
             'response': "I apologize, but the AI service is not configured. Please set OPENROUTER_API_KEY in environment variables.",
             'citations': [],
             'chunks_used': 0
-        }
+        }}
     
-    try:
-        logger.info(f"[Chat] Initializing OpenRouter API...")
-        logger.info(f"[Chat] Context length: {len(context) if context else 0} chars, Chunks: {len(chunks)}")
-        
-        # System prompt
-        system_prompt = """You are a helpful assistant that answers questions based on the provided context from user's documents.
+    logger.info(f"[Chat] Context length: {len(context)} chars, Chunks: {len(chunks)}")
+    
+    # Build messages for OpenRouter (OpenAI-compatible format)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    
+    # Add conversation history
+    if conversation_history:
+        logger.info(f"[Chat] Adding {len(conversation_history[-5:])} messages from conversation history")
+        for msg in conversation_history[-5:]:  # Last 5 messages for context
+            messages.append({
+                "role": msg['role'],
+                "content": msg['content']
+            })
+    
+    # Add current user message with context
+    messages.append({
+        "role": "user",
+        "content": f"Context from documents:\n\n{context}\n\nUser question: {user_message}",
+    })
+    logger.debug(f"[Chat] OpenRouter messages prepared, count: {len(messages)}")
+    
+    return {
+        'messages': messages,
+        'citations': citations,
+        'chunks_used': len(chunks),
+        'cache_key': (user_id, file_ids, user_message, query_embedding) if use_answer_cache else None,
+    }
 
-If the context contains relevant information, use it to answer the question accurately.
-If the context does not contain relevant information, say "I cannot find information about this in your files."
-Always cite which file(s) you used when providing information from the context.
 
-Format citations as: [filename] or [filename, page X] if page numbers are available."""
-        
-        # Build messages for OpenRouter (OpenAI-compatible format)
-        messages = []
-        
-        # Add system message
-        messages.append({
-            "role": "system",
-            "content": system_prompt
-        })
-        
-        # Add conversation history
-        if conversation_history:
-            logger.info(f"[Chat] Adding {len(conversation_history[-5:])} messages from conversation history")
-            for msg in conversation_history[-5:]:  # Last 5 messages for context
-                messages.append({
-                    "role": msg['role'],
-                    "content": msg['content']
-                })
-        
-        # Add current user message with context
-        user_content = f"Context from documents:\n\n{context}\n\nUser question: {user_message}"
-        messages.append({
-            "role": "user",
-            "content": user_content
-        })
-        
-        logger.debug(f"[Chat] OpenRouter messages prepared, count: {len(messages)}")
-        
-        response_text = None
-        last_error = None
-        
-        # Try a small set of models in order of preference
-        model_options = [
-            "openai/gpt-4o-mini",  # Fast and cost-effective
-            "openai/gpt-4o",  # More capable
-            "anthropic/claude-3.5-sonnet",  # High quality
-        ]
-        
-        for model_id in model_options:
-            try:
-                logger.info(f"[Chat] Invoking OpenRouter model: {model_id}")
-                
-                url = "https://openrouter.ai/api/v1/chat/completions"
-                
-                headers = {
-                    "Authorization": f"Bearer {openrouter_api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://github.com/student-rag-assignment",
-                    "X-Title": "File Chat RAG",
-                }
-                
-                payload = {
-                    "model": model_id,
-                    "messages": messages,
-                    "max_tokens": 2048,
-                    "temperature": 0.7,
-                }
-                
-                response = requests.post(url, headers=headers, json=payload, timeout=60)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Extract response text
-                    if 'choices' in result and len(result['choices']) > 0:
-                        choice = result['choices'][0]
-                        if 'message' in choice and 'content' in choice['message']:
-                            response_text = choice['message']['content'].strip()
-                        else:
-                            raise ValueError("No content in response message")
-                    else:
-                        raise ValueError("No choices in response")
-                    
-                    if not response_text or len(response_text.strip()) == 0:
-                        raise ValueError("Empty text in OpenRouter response")
-                    
-                    logger.info(f"[Chat] OpenRouter response received from {model_id}, length: {len(response_text)} chars")
-                    logger.debug(f"[Chat] Response preview: {response_text[:200]}...")
-                    break  # Success, exit loop
-                    
-                elif response.status_code == 401:
-                    raise ValueError("Invalid API key or authentication failed")
-                elif response.status_code == 429:
-                    logger.warning(f"[Chat] Rate limit for {model_id}, trying next model...")
-                    continue  # Try next model
-                else:
-                    error_data = response.json() if response.content else {}
-                    error_msg = error_data.get('error', {}).get('message', f"HTTP {response.status_code}")
-                    raise ValueError(f"API error: {error_msg}")
-                    
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"[Chat] Request error for {model_id}: {str(e)}, trying next model...")
-                last_error = e
-                continue  # Try next model
-            except Exception as e:
-                logger.warning(f"[Chat] Error with {model_id}: {str(e)}, trying next model...")
-                last_error = e
-                continue  # Try next model
-        
-        if not response_text:
-            error_msg = str(last_error) if last_error else "All models failed"
-            logger.error(f"[Chat] All OpenRouter models failed: {error_msg}", exc_info=True)
+def _openrouter_request(model_id: str, messages: List[dict], stream: bool = False) -> requests.Response:
+    headers = {
+        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://github.com/student-rag-assignment",
+        "X-Title": "File Chat RAG",
+    }
+    payload = {
+        "model": model_id,
+        "messages": messages,
+        "max_tokens": 2048,
+        "temperature": 0.7,
+    }
+    if stream:
+        payload["stream"] = True
+    response = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60, stream=stream)
+    if response.status_code == 401:
+        response.close()
+        raise ValueError("Invalid API key or authentication failed")
+    if response.status_code == 429:
+        response.close()
+        raise ValueError(f"Rate limit for {model_id} (HTTP 429)")
+    if response.status_code != 200:
+        error_data = response.json() if response.content else {}
+        error_msg = error_data.get('error', {}).get('message', f"HTTP {response.status_code}")
+        raise ValueError(f"API error: {error_msg}")
+    return response
+
+
+def _complete(messages: List[dict]) -> Tuple[Optional[str], Optional[Exception]]:
+    """One full completion from the first model that answers: (text, last error)."""
+    last_error = None
+    for model_id in MODEL_OPTIONS:
+        try:
+            logger.info(f"[Chat] Invoking OpenRouter model: {model_id}")
+            result = _openrouter_request(model_id, messages).json()
             
-            # Check for common errors
-            if 'API key' in error_msg or 'authentication' in error_msg.lower() or '401' in error_msg:
-                return {
-                    'response': "I apologize, but there's an issue with the AI service authentication. Please check the API key configuration.",
-                    'citations': [],
-                    'chunks_used': len(chunks)
-                }
-            elif 'quota' in error_msg.lower() or 'limit' in error_msg.lower() or '429' in error_msg:
-                return {
-                    'response': "I apologize, but the AI service has reached its usage limit. Please try again later.",
-                    'citations': [],
-                    'chunks_used': len(chunks)
-                }
+            # Extract response text
+            if 'choices' in result and len(result['choices']) > 0:
+                choice = result['choices'][0]
+                if 'message' in choice and 'content' in choice['message']:
+                    response_text = choice['message']['content'].strip()
+                else:
+                    raise ValueError("No content in response message")
             else:
-                return {
-                    'response': f"I apologize, but I'm having trouble processing your request. Error: {error_msg[:150]}",
-                    'citations': [],
-                    'chunks_used': len(chunks)
-                }
-        
-        # Use Bedrock's response - don't override it
-        logger.info(f"[Chat] Returning response with {len(citations)} citations, {len(chunks)} chunks used")
+                raise ValueError("No choices in response")
+            
+            if not response_text:
+                raise ValueError("Empty text in OpenRouter response")
+            
+            logger.info(f"[Chat] OpenRouter response received from {model_id}, length: {len(response_text)} chars")
+            logger.debug(f"[Chat] Response preview: {response_text[:200]}...")
+            return response_text, None
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"[Chat] Request error for {model_id}: {str(e)}, trying next model...")
+            last_error = e
+        except Exception as e:
+            logger.warning(f"[Chat] Error with {model_id}: {str(e)}, trying next model...")
+            last_error = e
+    return None, last_error
+
+
+def _stream_completion(messages: List[dict]) -> Iterator[str]:
+    """Yield text deltas from the first model that starts answering.
+
+    Models are only switched before the first delta; an error after it is raised.
+    """
+    last_error = None
+    for model_id in MODEL_OPTIONS:
+        started = False
+        try:
+            logger.info(f"[Chat] Streaming from OpenRouter model: {model_id}")
+            with _openrouter_request(model_id, messages, stream=True) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    # Skips blank separators and ": OPENROUTER PROCESSING" comments
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    if 'error' in chunk:
+                        raise ValueError(f"API error: {chunk['error'].get('message', chunk['error'])}")
+                    choices = chunk.get('choices') or []
+                    text = (choices[0].get('delta') or {}).get('content') if choices else None
+                    if text:
+                        started = True
+                        yield text
+            if started:
+                logger.info(f"[Chat] OpenRouter stream from {model_id} finished")
+                return
+            raise ValueError("Empty text in OpenRouter response")
+        except Exception as e:
+            if started:
+                raise
+            logger.warning(f"[Chat] Error with {model_id}: {str(e)}, trying next model...")
+            last_error = e
+    raise ValueError(str(last_error) if last_error else "All models failed")
+
+
+def _error_result(error_msg: str, chunks_used: int) -> dict:
+    logger.error(f"[Chat] All OpenRouter models failed: {error_msg}")
+    
+    # Check for common errors
+    if 'API key' in error_msg or 'authentication' in error_msg.lower() or '401' in error_msg:
+        response = "I apologize, but there's an issue with the AI service authentication. Please check the API key configuration."
+    elif 'quota' in error_msg.lower() or 'limit' in error_msg.lower() or '429' in error_msg:
+        response = "I apologize, but the AI service has reached its usage limit. Please try again later."
+    else:
+        response = f"I apologize, but I'm having trouble processing your request. Error: {error_msg[:150]}"
+    return {'response': response, 'citations': [], 'chunks_used': chunks_used}
+
+
+def cache_answer(prepared: dict, result: dict):
+    if prepared.get('cache_key') is None:
+        return
+    user_id, file_ids, user_message, query_embedding = prepared['cache_key']
+    try:
+        answer_cache.store(user_id, file_ids, user_message, query_embedding, result)
+    except Exception as e:
+        logger.warning(f"[Chat] Could not cache answer: {str(e)}")
+
+
+def generate_chat_response(
+    user_message: str,
+    user_id: int,
+    file_ids: Optional[List[int]] = None,
+    conversation_history: Optional[List[dict]] = None,
+) -> dict:
+    """
+    Build a short answer based on the user's files.
+    
+    This function:
+    - embeds the user question,
+    - fetches the most relevant chunks,
+    - calls the LLM through OpenRouter,
+    - and returns the answer plus simple file citations.
+    """
+    prepared = prepare_chat(user_message, user_id, file_ids, conversation_history)
+    if 'result' in prepared:
+        return prepared['result']
+    
+    try:
+        response_text, last_error = _complete(prepared['messages'])
+        if not response_text:
+            return _error_result(str(last_error) if last_error else "All models failed", prepared['chunks_used'])
         
-        return {
+        logger.info(f"[Chat] Returning response with {len(prepared['citations'])} citations, {prepared['chunks_used']} chunks used")
+        result = {
             'response': response_text,
-            'citations': citations,
-            'chunks_used': len(chunks)
+            'citations': prepared['citations'],
+            'chunks_used': prepared['chunks_used']
         }
-        
+        cache_answer(prepared, result)
+        return result
+    
     except Exception as e:
         logger.error(f"[Chat] Error generating chat response: {str(e)}", exc_info=True)
         # Return more detailed error for debugging
@@ -294,6 +324,54 @@ Format citations as: [filename] or [filename, page X] if page numbers are availa
         return {
             'response': f"I apologize, but I encountered an error: {error_msg[:150]}. Please check the logs for details.",
             'citations': [],
-            'chunks_used': len(chunks) if chunks else 0
+            'chunks_used': prepared['chunks_used']
         }
 
+
+def stream_chat_response(
+    user_message: str,
+    user_id: int,
+    file_ids: Optional[List[int]] = None,
+    conversation_history: Optional[List[dict]] = None,
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Streaming variant of `generate_chat_response`, as (event, data) pairs.
+    
+    Yields one `citations` event, then `delta` events with text as the LLM
+    produces it, and finally `done` with the same dict `generate_chat_response`
+    returns. Answers that need no LLM call come as a single delta.
+    """
+    prepared = prepare_chat(user_message, user_id, file_ids, conversation_history)
+    if 'result' in prepared:
+        result = prepared['result']
+        yield 'citations', {'citations': result['citations'], 'cached': result.get('cached', False)}
+        yield 'delta', {'text': result['response']}
+        yield 'done', result
+        return
+    
+    yield 'citations', {'citations': prepared['citations'], 'cached': False}
+    parts = []
+    try:
+        for text in _stream_completion(prepared['messages']):
+            parts.append(text)
+            yield 'delta', {'text': text}
+    except Exception as e:
+        if not parts:
+            result = _error_result(str(e), prepared['chunks_used'])
+            yield 'delta', {'text': result['response']}
+            yield 'done', result
+            return
+        # The answer was cut off: keep what the user already saw
+        logger.error(f"[Chat] OpenRouter stream failed after {len(parts)} deltas: {str(e)}", exc_info=True)
+        yield 'error', {'error': 'The answer was interrupted.'}
+        yield 'done', {'response': ''.join(parts).strip(), 'citations': prepared['citations'], 'chunks_used': prepared['chunks_used']}
+        return
+    
+    result = {
+        'response': ''.join(parts).strip(),
+        'citations': prepared['citations'],
+        'chunks_used': prepared['chunks_used']
+    }
+    logger.info(f"[Chat] Streamed response with {len(result['citations'])} citations, {result['chunks_used']} chunks used")
+    cache_answer(prepared, result)
+    yield 'done', result
@@ -0,0 +1,21 @@
+"""Keep the answer cache consistent with the files it was built from."""
+import logging
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.files.models import FileAsset
+from . import answer_cache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=FileAsset, dispatch_uid='chat_answer_cache_file_saved')
+# Before delete: the cascade removes the cache entries' links to the file
+@receiver(pre_delete, sender=FileAsset, dispatch_uid='chat_answer_cache_file_deleted')
+def invalidate_cached_answers(sender, instance, **kwargs):
+    """Any save (rename, re-ingestion, status change) or delete of a file drops the answers that used it."""
+    try:
+        answer_cache.invalidate_file(instance)
+    except Exception as e:
+        # The file-set key already includes updated_at, so a missed delete can't serve a stale answer
+        logger.warning(f"[Chat] Could not invalidate cached answers for file {instance.id}: {str(e)}")
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.chat, name='chat'),
+    path('stream/', views.chat_stream, name='chat_stream'),
     path('history/<int:conversation_id>/', views.chat_history, name='chat_history'),
 ]
 
@@ -1,72 +1,69 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from django.db import connection
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+import json
 import logging
 
+from apps.files.renderers import EventStreamRenderer
 from .models import Conversation, Message
 from .serializers import ConversationSerializer, MessageSerializer, ChatRequestSerializer
-from .services import generate_chat_response
+from .services import generate_chat_response, stream_chat_response
 
 logger = logging.getLogger(__name__)
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def chat(request):
-    """Send message and get response with citations."""
-    serializer = ChatRequestSerializer(data=request.data)
-    if not serializer.is_valid():
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+def _validate_files(request, file_ids):
+    """Error response when a selected file is missing, not owned, processing or failed; None when all is well."""
+    if not file_ids:
+        return None
     
-    data = serializer.validated_data
-    user_message = data['message']
-    conversation_id = data.get('conversation_id')
-    file_ids = data.get('file_ids', [])
+    from apps.files.models import FileAsset
+    files = FileAsset.objects.filter(id__in=file_ids, user=request.user)
     
-    logger.info(f"[Chat View] Received chat request from user {request.user.id}, file_ids: {file_ids}, message: {user_message[:50]}...")
+    if files.count() != len(file_ids):
+        logger.warning(f"[Chat View] Some files not found or not owned by user. Requested: {file_ids}, Found: {list(files.values_list('id', flat=True))}")
+        return Response({
+            'error': 'One or more files not found or access denied.'
+        }, status=status.HTTP_404_NOT_FOUND)
     
-    # Validate file status if file_ids are provided
-    if file_ids:
-        from apps.files.models import FileAsset
-        files = FileAsset.objects.filter(id__in=file_ids, user=request.user)
-        
-        if files.count() != len(file_ids):
-            logger.warning(f"[Chat View] Some files not found or not owned by user. Requested: {file_ids}, Found: {list(files.values_list('id', flat=True))}")
+    # Check if any files are still processing
+    processing_files = files.filter(status='processing')
+    if processing_files.exists():
+        processing_names = list(processing_files.values_list('filename', flat=True))
+        logger.warning(f"[Chat View] Files still processing: {processing_names}")
+        return Response({
+            'error': f'File(s) still processing: {", ".join(processing_names)}. Please wait for processing to complete.',
+            'processing_files': processing_names
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Check if files are ready
+    ready_files = files.filter(status__in=['ready', 'partial'])
+    if ready_files.count() == 0:
+        failed_files = files.filter(status='failed')
+        if failed_files.exists():
+            failed_names = list(failed_files.values_list('filename', flat=True))
+            logger.warning(f"[Chat View] Files failed: {failed_names}")
             return Response({
-                'error': 'One or more files not found or access denied.'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Check if any files are still processing
-        processing_files = files.filter(status='processing')
-        if processing_files.exists():
-            processing_names = list(processing_files.values_list('filename', flat=True))
-            logger.warning(f"[Chat View] Files still processing: {processing_names}")
+                'error': f'File(s) processing failed: {", ".join(failed_names)}. Please re-upload or retry processing.',
+                'failed_files': failed_names
+            }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            logger.warning(f"[Chat View] Files not ready: {list(files.values_list('status', flat=True))}")
             return Response({
-                'error': f'File(s) still processing: {", ".join(processing_names)}. Please wait for processing to complete.',
-                'processing_files': processing_names
+                'error': 'Files are not ready for chat. Please wait for processing to complete.'
             }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check if files are ready
-        ready_files = files.filter(status__in=['ready', 'partial'])
-        if ready_files.count() == 0:
-            failed_files = files.filter(status='failed')
-            if failed_files.exists():
-                failed_names = list(failed_files.values_list('filename', flat=True))
-                logger.warning(f"[Chat View] Files failed: {failed_names}")
-                return Response({
-                    'error': f'File(s) processing failed: {", ".join(failed_names)}. Please re-upload or retry processing.',
-                    'failed_files': failed_names
-                }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                logger.warning(f"[Chat View] Files not ready: {list(files.values_list('status', flat=True))}")
-                return Response({
-                    'error': 'Files are not ready for chat. Please wait for processing to complete.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        
-        logger.info(f"[Chat View] File validation passed. {ready_files.count()} file(s) ready for chat.")
     
+    logger.info(f"[Chat View] File validation passed. {ready_files.count()} file(s) ready for chat.")
+    return None
+
+
+def _start_turn(request, conversation_id, user_message, file_ids):
+    """Get or create the conversation, save the user message and return (conversation, message, history)."""
     # Get or create conversation
     if conversation_id:
         conversation = get_object_or_404(Conversation, id=conversation_id, user=request.user)
@@ -90,6 +87,45 @@ def chat(request):
         for msg in history
     ]
     logger.info(f"[Chat View] Conversation history: {len(conversation_history)} messages")
+    return conversation, user_msg, conversation_history
+
+
+def _citation_file_ids(citations, user_id):
+    """File IDs of the cited filenames."""
+    from apps.files.models import FileAsset
+    file_ids_from_citations = []
+    for citation in citations or []:
+        try:
+            file_asset = FileAsset.objects.get(
+                filename=citation.get('filename'),
+                user_id=user_id
+            )
+            file_ids_from_citations.append(file_asset.id)
+        except FileAsset.DoesNotExist:
+            pass
+    return file_ids_from_citations
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chat(request):
+    """Send message and get response with citations."""
+    serializer = ChatRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    user_message = data['message']
+    conversation_id = data.get('conversation_id')
+    file_ids = data.get('file_ids', [])
+    
+    logger.info(f"[Chat View] Received chat request from user {request.user.id}, file_ids: {file_ids}, message: {user_message[:50]}...")
+    
+    error_response = _validate_files(request, file_ids)
+    if error_response is not None:
+        return error_response
+    
+    conversation, user_msg, conversation_history = _start_turn(request, conversation_id, user_message, file_ids)
     
     # Generate response
     try:
@@ -102,27 +138,12 @@ def chat(request):
         )
         logger.info(f"[Chat View] Response generated: {len(result.get('response', ''))} chars, {len(result.get('citations', []))} citations")
         
-        # Extract file IDs from citations
-        file_ids_from_citations = []
-        if result.get('citations'):
-            # Get file IDs from chunk filenames
-            from apps.files.models import FileAsset
-            for citation in result.get('citations', []):
-                try:
-                    file_asset = FileAsset.objects.get(
-                        filename=citation.get('filename'),
-                        user_id=request.user.id
-                    )
-                    file_ids_from_citations.append(file_asset.id)
-                except FileAsset.DoesNotExist:
-                    pass
-        
         # Save assistant message
         assistant_msg = Message.objects.create(
             conversation=conversation,
             role='assistant',
             content=result['response'],
-            file_ids=file_ids_from_citations
+            file_ids=_citation_file_ids(result.get('citations'), request.user.id)
         )
         
         return Response({
@@ -130,6 +151,7 @@ def chat(request):
             'message': MessageSerializer(user_msg).data,
             'response': MessageSerializer(assistant_msg).data,
             'citations': result.get('citations', []),
+            'cached': result.get('cached', False),
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -140,6 +162,91 @@ def chat(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def chat_stream(request):
+    """Send a message and stream the answer as server-sent events.
+
+    Events, in order: `conversation` (conversation_id and the saved user message),
+    `citations`, `delta` (answer text as the LLM produces it), then `done` with the
+    saved assistant message. An `error` event reports a failure. The assistant
+    message is saved when the stream ends, with whatever text was produced.
+    """
+    serializer = ChatRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    user_message = data['message']
+    file_ids = data.get('file_ids', [])
+    
+    logger.info(f"[Chat View] Received streaming chat request from user {request.user.id}, file_ids: {file_ids}, message: {user_message[:50]}...")
+    
+    error_response = _validate_files(request, file_ids)
+    if error_response is not None:
+        return error_response
+    
+    conversation, user_msg, conversation_history = _start_turn(request, data.get('conversation_id'), user_message, file_ids)
+    user_id = request.user.id
+    
+    def format_event(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    def stream():
+        result = None
+        parts = []
+        try:
+            yield format_event('conversation', {
+                'conversation_id': conversation.id,
+                'message': MessageSerializer(user_msg).data,
+            })
+            for event, payload in stream_chat_response(
+                user_message=user_message,
+                user_id=user_id,
+                file_ids=file_ids if file_ids else None,
+                conversation_history=conversation_history,
+            ):
+                if event == 'done':
+                    result = payload
+                    continue
+                if event == 'citations':
+                    # Retrieval is done; don't hold a database connection while the LLM streams.
+                    # Saving the answer below opens a new one.
+                    connection.close()
+                if event == 'delta':
+                    parts.append(payload['text'])
+                yield format_event(event, payload)
+        except Exception as e:
+            logger.error(f"[Chat View] Chat stream error: {str(e)}", exc_info=True)
+            yield format_event('error', {'error': 'Failed to generate response'})
+        finally:
+            # Also runs when the client disconnects, so the partial answer is kept
+            if result is None:
+                result = {'response': ''.join(parts).strip(), 'citations': []}
+            assistant_msg = None
+            if result['response']:
+                assistant_msg = Message.objects.create(
+                    conversation=conversation,
+                    role='assistant',
+                    content=result['response'],
+                    file_ids=_citation_file_ids(result.get('citations'), user_id)
+                )
+                logger.info(f"[Chat View] Streamed response saved: {len(result['response'])} chars")
+        if assistant_msg is not None:
+            yield format_event('done', {
+                'conversation_id': conversation.id,
+                'response': MessageSerializer(assistant_msg).data,
+                'citations': result.get('citations', []),
+                'cached': result.get('cached', False),
+            })
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def chat_history(request, conversation_id):
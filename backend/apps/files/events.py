@@ -0,0 +1,112 @@
+"""
+In-process fan-out of file status changes for the SSE endpoint.
+
+One poller thread per process reads files whose `updated_at` moved since the
+last poll (a single indexed query, whatever the number of listeners) and
+hands each change to the queues of that file's owner. The thread only runs
+while someone is subscribed. Ingestion runs in the worker process, so
+polling the table is how its progress reaches web processes.
+"""
+import time
+import queue
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, List, Optional, Set
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import FileAsset
+
+logger = logging.getLogger(__name__)
+
+# Rows committed slightly after their updated_at was set are caught by re-reading this window
+LOOKBACK = timedelta(seconds=5)
+
+# Per-subscriber buffer; a dashboard that stops reading is dropped rather than buffered forever
+QUEUE_SIZE = 256
+
+EVENT_FIELDS = ('id', 'user_id', 'status', 'ingestion_status', 'updated_at', 'metadata__ingestion_progress')
+
+
+def serialize_change(row: dict) -> dict:
+    return {
+        'id': row['id'],
+        'status': row['status'],
+        'ingestion_status': row['ingestion_status'],
+        'progress': row['metadata__ingestion_progress'],
+        'updated_at': row['updated_at'].isoformat(),
+    }
+
+
+def changes_since(user_id: int, since) -> List[dict]:
+    """A user's file changes after `since`, oldest first (catch-up on reconnect)."""
+    rows = FileAsset.objects.filter(user_id=user_id, updated_at__gt=since).order_by('updated_at').values(*EVENT_FIELDS)
+    return [serialize_change(row) for row in rows]
+
+
+class FileEventHub:
+    def __init__(self):
+        self._subscribers: Dict[int, Set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cursor = None
+        self._seen: Dict[int, object] = {}  # file id -> last updated_at sent, within the lookback window
+
+    def subscribe(self, user_id: int) -> queue.Queue:
+        events = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(events)
+            if self._thread is None or not self._thread.is_alive():
+                self._cursor = timezone.now()
+                self._seen = {}
+                self._thread = threading.Thread(target=self._run, name='file-events', daemon=True)
+                self._thread.start()
+        return events
+
+    def unsubscribe(self, user_id: int, events: queue.Queue):
+        with self._lock:
+            listeners = self._subscribers.get(user_id)
+            if listeners is not None:
+                listeners.discard(events)
+                if not listeners:
+                    del self._subscribers[user_id]
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                try:
+                    self._poll()
+                except Exception as e:
+                    logger.warning(f"[FileEvents] Poll failed: {str(e)}")
+                    connection.close()  # Reconnect on the next poll
+                time.sleep(settings.FILE_EVENTS_POLL_INTERVAL)
+        finally:
+            connection.close()
+
+    def _poll(self):
+        now = timezone.now()
+        rows = list(
+            FileAsset.objects.filter(updated_at__gt=self._cursor - LOOKBACK).order_by('updated_at').values(*EVENT_FIELDS)
+        )
+        with self._lock:
+            for row in rows:
+                if self._seen.get(row['id']) == row['updated_at']:
+                    continue
+                self._seen[row['id']] = row['updated_at']
+                for events in self._subscribers.get(row['user_id'], ()):
+                    try:
+                        events.put_nowait(serialize_change(row))
+                    except queue.Full:
+                        # The stream ends and the client catches up from its last event id
+                        events.overflowed = True
+            self._cursor = now
+            horizon = now - LOOKBACK * 2
+            self._seen = {file_id: updated_at for file_id, updated_at in self._seen.items() if updated_at > horizon}
+
+
+hub = FileEventHub()
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileasset',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name='fileasset',
+            index=models.Index(fields=['user', 'content_hash'], name='files_filea_user_id_a8dcb6_idx'),
+        ),
+    ]
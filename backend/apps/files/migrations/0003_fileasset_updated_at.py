@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0002_fileasset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileasset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
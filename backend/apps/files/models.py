@@ -30,12 +30,15 @@ class FileAsset(models.Model):
     ingestion_status = models.CharField(max_length=20, choices=INGESTION_STATUS_CHOICES, default='not_started')
     deletion_failed = models.BooleanField(default=False)
     metadata = models.JSONField(default=dict)  # Store error messages, retry counts, etc.
+    content_hash = models.CharField(max_length=128, blank=True, default='')  # S3 ETag, set during ingestion
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Drives the file event stream
     
     class Meta:
         ordering = ['-uploaded_at']
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['user', 'ingestion_status']),
+            models.Index(fields=['user', 'content_hash']),
         ]
     
     def __str__(self):
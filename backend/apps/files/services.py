@@ -1,8 +1,10 @@
-import boto3
+import codecs
 import uuid
+import tempfile
 from datetime import timedelta
 from django.conf import settings
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
+from config.aws_clients import get_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,11 +14,12 @@ class S3Service:
     """Service for S3 operations."""
     
     def __init__(self):
-        self.s3_client = boto3.client(
+        # Shared per process; S3Service instances are cheap
+        self.s3_client = get_client(
             's3',
+            region=settings.AWS_S3_REGION_NAME,
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME
         )
         self.bucket = settings.AWS_STORAGE_BUCKET_NAME
     
@@ -88,4 +91,87 @@ class S3Service:
         except ClientError as e:
             logger.error(f"Error getting S3 object {s3_key}: {str(e)}")
             raise
+    
+    def iter_chunks(self, s3_key, range_size=None, chunk_size=None):
+        """Yield an object's bytes in order without holding the whole object in memory.
+
+        The object is fetched with sequential ranged GETs of `S3_RANGE_SIZE` bytes,
+        each streamed in `S3_READ_CHUNK_SIZE` pieces. If a body stream breaks, only
+        the rest of the current range is requested again. Later ranges are pinned to
+        the first response's ETag, so an object replaced mid-read fails instead of
+        mixing versions.
+        """
+        range_size = range_size or settings.S3_RANGE_SIZE
+        chunk_size = chunk_size or settings.S3_READ_CHUNK_SIZE
+        position, total, etag = 0, None, None
+        attempts = 0
+        
+        while total is None or position < total:
+            request = {'Bucket': self.bucket, 'Key': s3_key, 'Range': f"bytes={position}-{position + range_size - 1}"}
+            if etag:
+                request['IfMatch'] = etag
+            try:
+                response = self.s3_client.get_object(**request)
+            except ClientError as e:
+                if total is None and e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                    return  # Empty object
+                logger.error(f"Error getting S3 object {s3_key} at byte {position}: {str(e)}")
+                raise
+            
+            if total is None:
+                total = int(response['ContentRange'].rsplit('/', 1)[1])
+                etag = response.get('ETag')
+            try:
+                for chunk in response['Body'].iter_chunks(chunk_size):
+                    position += len(chunk)
+                    yield chunk
+                attempts = 0
+            except (BotoCoreError, OSError) as e:
+                # Connection dropped mid-range: resume from the last byte received
+                attempts += 1
+                if attempts >= 3:
+                    raise
+                logger.warning(f"S3 read of {s3_key} interrupted at byte {position}, resuming: {str(e)}")
+    
+    def download_to_file(self, s3_key, fileobj):
+        """Stream an object into a writable binary file object. Returns the byte count."""
+        size = 0
+        for chunk in self.iter_chunks(s3_key):
+            fileobj.write(chunk)
+            size += len(chunk)
+        fileobj.seek(0)
+        return size
+    
+    def open_spooled(self, s3_key):
+        """Download an object into a SpooledTemporaryFile, rewound and ready to read.
 
+        Objects up to `S3_SPOOL_MAX_MEMORY` bytes stay in memory; larger ones spill
+        to disk, so concurrent ingestions of large files don't multiply RSS.
+        The caller closes the file (use it as a context manager).
+        """
+        spooled = tempfile.SpooledTemporaryFile(max_size=settings.S3_SPOOL_MAX_MEMORY)
+        try:
+            self.download_to_file(s3_key, spooled)
+        except Exception:
+            spooled.close()
+            raise
+        return spooled
+    
+    def iter_text(self, s3_key, encoding='utf-8'):
+        """Yield an object's text in decoded pieces; multi-byte characters split across chunks are kept whole."""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for chunk in self.iter_chunks(s3_key):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+    
+    def head_object(self, s3_key):
+        """Get object metadata (size, ETag) without downloading it."""
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket, Key=s3_key)
+        except ClientError as e:
+            logger.error(f"Error getting S3 object metadata {s3_key}: {str(e)}")
+            raise
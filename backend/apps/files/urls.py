@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.list_files, name='list_files'),
+    path('events/', views.file_events, name='file_events'),
     path('presign/', views.presign_upload, name='presign_upload'),
     path('finalize/', views.finalize_upload, name='finalize_upload'),
     path('<int:file_id>/', views.delete_file, name='delete_file'),
@@ -10,5 +11,6 @@ urlpatterns = [
     path('<int:file_id>/retry-finalize/', views.retry_finalize, name='retry_finalize'),
     path('<int:file_id>/retry-chunks/', views.retry_chunks, name='retry_chunks'),
     path('deletion-failed/', views.deletion_failed_files, name='deletion_failed_files'),
+    path('ingestion-stats/', views.ingestion_stats, name='ingestion_stats'),
 ]
 
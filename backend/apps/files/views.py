@@ -1,9 +1,16 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+import json
+import time
+import queue
 import logging
 
 from .models import FileAsset
@@ -14,6 +21,8 @@ from .serializers import (
     FileUpdateSerializer,
 )
 from .services import S3Service
+from .renderers import EventStreamRenderer
+from . import events
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +52,50 @@ def list_files(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def file_events(request):
+    """Server-sent events with status and ingestion progress changes for the user's files.
+
+    Each `file` event carries id, status, ingestion_status, progress and updated_at.
+    The stream closes after `FILE_EVENTS_STREAM_SECONDS`; clients reconnect with
+    `Last-Event-ID` (or `?since=`) to receive changes they missed.
+    """
+    user_id = request.user.id
+    since = parse_datetime(request.headers.get('Last-Event-ID') or request.query_params.get('since') or '')
+    
+    def format_event(change):
+        return f"id: {change['updated_at']}\nevent: file\ndata: {json.dumps(change)}\n\n"
+    
+    def stream():
+        # Subscribe before the catch-up query so no change falls in between
+        subscription = events.hub.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            if since:
+                for change in events.changes_since(user_id, since - events.LOOKBACK):
+                    yield format_event(change)
+            # Don't hold a database connection while waiting; the hub polls on its own
+            connection.close()
+            deadline = time.monotonic() + settings.FILE_EVENTS_STREAM_SECONDS
+            while time.monotonic() < deadline and not getattr(subscription, 'overflowed', False):
+                timeout = min(settings.FILE_EVENTS_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0.1))
+                try:
+                    change = subscription.get(timeout=timeout)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(change)
+        finally:
+            events.hub.unsubscribe(user_id, subscription)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
 def update_file(request, file_id):
@@ -113,37 +166,10 @@ def finalize_upload(request):
         ingestion_status='not_started',
     )
     
-    # Trigger async ingestion
+    # Queue ingestion for the worker process
     try:
-        from apps.rag.services import ingest_file_async
-        import threading
-        
-        # Run ingestion in background thread
-        def run_ingestion():
-            try:
-                ingest_file_async(file_asset.id)
-                # Update status after successful ingestion
-                file_asset.refresh_from_db()
-                if file_asset.ingestion_status == 'complete':
-                    file_asset.status = 'ready'
-                    file_asset.save()
-            except Exception as e:
-                logger.error(f"Background ingestion failed for file {file_asset.id}: {str(e)}")
-                file_asset.refresh_from_db()
-                file_asset.status = 'failed'
-                file_asset.ingestion_status = 'failed'
-                file_asset.metadata['finalize_error'] = str(e)
-                file_asset.save()
-        
-        # Start background thread
-        thread = threading.Thread(target=run_ingestion, daemon=True)
-        thread.start()
-        
-        # Set initial processing status
-        file_asset.status = 'processing'
-        file_asset.ingestion_status = 'in_progress'
-        file_asset.save()
-        
+        from apps.rag.jobs import enqueue_ingestion
+        enqueue_ingestion(file_asset)
     except Exception as e:
         # Upload succeeded but finalize setup failed
         logger.error(f"Finalize setup failed for file {file_asset.id}: {str(e)}")
@@ -208,35 +234,8 @@ def retry_finalize(request, file_id):
         return Response({'error': 'File is not in a retryable state'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        from apps.rag.services import ingest_file_async
-        import threading
-        
-        # Run ingestion in background thread
-        def run_retry_ingestion():
-            try:
-                ingest_file_async(file_asset.id)
-                # Update status after successful ingestion
-                file_asset.refresh_from_db()
-                if file_asset.ingestion_status == 'complete':
-                    file_asset.status = 'ready'
-                    file_asset.save()
-            except Exception as e:
-                logger.error(f"Retry ingestion failed for file {file_asset.id}: {str(e)}")
-                file_asset.refresh_from_db()
-                file_asset.status = 'failed'
-                file_asset.ingestion_status = 'failed'
-                file_asset.metadata['finalize_error'] = str(e)
-                file_asset.save()
-        
-        # Start background thread
-        thread = threading.Thread(target=run_retry_ingestion, daemon=True)
-        thread.start()
-        
-        # Set processing status immediately
-        file_asset.status = 'processing'
-        file_asset.ingestion_status = 'in_progress'
-        file_asset.metadata.pop('finalize_error', None)
-        file_asset.save()
+        from apps.rag.jobs import enqueue_ingestion
+        enqueue_ingestion(file_asset)
         
         return Response({'message': 'Processing restarted'}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -259,8 +258,8 @@ def retry_chunks(request, file_id):
         return Response({'error': 'File does not have partial ingestion'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        from apps.rag.services import ingest_file_async
-        ingest_file_async(file_asset.id, retry_failed=True)
+        from apps.rag.jobs import enqueue_ingestion
+        enqueue_ingestion(file_asset, retry_failed=True)
         return Response({'message': 'Chunk retry initiated'}, status=status.HTTP_200_OK)
     except Exception as e:
         logger.error(f"Retry chunks failed for file {file_id}: {str(e)}")
@@ -278,3 +277,36 @@ def deletion_failed_files(request):
     serializer = FileAssetSerializer(files, many=True)
     return Response(serializer.data)
 
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ingestion_stats(request):
+    """Ingestion stage timing percentiles per file type and size bucket (admin only).
+
+    Query params: `mode` (full, resume, retry_failed, clone; default full),
+    `file_type`, and `limit` (most recent files considered, default 1000).
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    
+    from apps.rag.instrumentation import aggregate_timings
+    
+    try:
+        limit = min(int(request.query_params.get('limit', 1000)), 10000)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit <= 0:
+        return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+    mode = request.query_params.get('mode', 'full')
+    
+    files = FileAsset.objects.filter(metadata__has_key='ingestion_timings')
+    if request.query_params.get('file_type'):
+        files = files.filter(file_type__iexact=request.query_params['file_type'])
+    rows = files.values_list('file_type', 'size', 'metadata__ingestion_timings')[:limit]
+    
+    groups = aggregate_timings(
+        (file_type, size, timings) for file_type, size, timings in rows
+        if timings and timings.get('mode', 'full') == mode
+    )
+    return Response({'mode': mode, 'groups': groups})
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import IngestionJob
+
+
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'file', 'status', 'attempts', 'max_attempts', 'retry_failed', 'worker_id', 'run_after', 'updated_at')
+    list_filter = ('status', 'retry_failed')
+    search_fields = ('file__filename', 'worker_id')
+    readonly_fields = ('created_at', 'updated_at', 'last_error')
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('file')
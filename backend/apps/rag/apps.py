@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class RagConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.rag'
+    
+    def ready(self):
+        from . import checks  # noqa: F401
 
@@ -0,0 +1,147 @@
+"""
+Bulk loading of DocumentChunk rows with PostgreSQL binary COPY.
+
+`bulk_create` sends each embedding as a text literal of `EMBEDDING_DIMENSION` floats that both
+Python and PostgreSQL have to format and parse. On PostgreSQL (psycopg2 +
+pgvector) chunks are instead streamed with `COPY ... FROM STDIN (FORMAT
+binary)`, where an embedding is 4 + 4 * dim bytes of big-endian float32 in
+pgvector's binary format. Other backends fall back to `bulk_create`.
+
+The column list and encoders are derived from the model's concrete fields, so
+new columns are picked up automatically; a field type without a binary encoder
+makes the writer fall back to `bulk_create`.
+"""
+import io
+import json
+import struct
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from .models import DocumentChunk, USE_VECTOR_FIELD
+
+logger = logging.getLogger(__name__)
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+POSTGRES_EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+_INT_FORMATS = {
+    'AutoField': '>i',
+    'IntegerField': '>i',
+    'PositiveIntegerField': '>i',
+    'SmallIntegerField': '>h',
+    'BigAutoField': '>q',
+    'BigIntegerField': '>q',
+}
+
+
+def _encode_int(fmt: str) -> Callable:
+    return struct.Struct(fmt).pack
+
+
+def _encode_text(value) -> bytes:
+    return str(value).encode('utf-8')
+
+
+def _encode_jsonb(value) -> bytes:
+    return b'\x01' + json.dumps(value).encode('utf-8')  # jsonb binary format version 1
+
+
+def _encode_timestamptz(value) -> bytes:
+    return struct.pack('>q', (value - POSTGRES_EPOCH) // MICROSECOND)
+
+
+def _encode_bool(value) -> bytes:
+    return b'\x01' if value else b'\x00'
+
+
+def _encode_vector(value) -> bytes:
+    from pgvector.utils import to_db_binary
+    return to_db_binary(value)
+
+
+def _encoder_for(field) -> Optional[Callable]:
+    internal_type = field.get_internal_type()
+    if field.is_relation:
+        internal_type = field.target_field.get_internal_type()
+    if internal_type in _INT_FORMATS:
+        return _encode_int(_INT_FORMATS[internal_type])
+    if internal_type in ('TextField', 'CharField'):
+        return _encode_text
+    if internal_type == 'JSONField':
+        return _encode_jsonb
+    if internal_type == 'DateTimeField':
+        return _encode_timestamptz
+    if internal_type == 'BooleanField':
+        return _encode_bool
+    if field.name == 'embedding' and USE_VECTOR_FIELD:
+        return _encode_vector
+    return None
+
+
+def _copy_plan() -> Optional[List[Tuple[object, Callable]]]:
+    """(field, encoder) for every inserted column, or None if a column can't be binary-encoded."""
+    plan = []
+    for field in DocumentChunk._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        encoder = _encoder_for(field)
+        if encoder is None:
+            logger.warning(f"[RAG] No binary COPY encoder for DocumentChunk.{field.name}; using bulk_create")
+            return None
+        plan.append((field, encoder))
+    return plan
+
+
+def uses_copy() -> bool:
+    """Whether `bulk_insert_chunks` will use COPY on the current connection."""
+    if not (USE_VECTOR_FIELD and connection.vendor == 'postgresql') or _copy_plan() is None:
+        return False
+    with connection.cursor() as cursor:
+        return hasattr(cursor, 'copy_expert')  # psycopg2
+
+
+def encode_copy_batch(chunks: List[DocumentChunk], plan) -> bytes:
+    """Encode rows in PostgreSQL's binary COPY format."""
+    buffer = io.BytesIO()
+    buffer.write(PGCOPY_HEADER)
+    field_count = struct.pack('>h', len(plan))
+    null = struct.pack('>i', -1)
+    for chunk in chunks:
+        buffer.write(field_count)
+        for field, encoder in plan:
+            value = field.pre_save(chunk, add=True)  # Fills auto_now_add timestamps
+            if value is None:
+                buffer.write(null)
+                continue
+            data = encoder(value)
+            buffer.write(struct.pack('>i', len(data)))
+            buffer.write(data)
+    buffer.write(PGCOPY_TRAILER)
+    return buffer.getvalue()
+
+
+def bulk_insert_chunks(chunks: List[DocumentChunk], batch_size: Optional[int] = None) -> int:
+    """Insert chunks with binary COPY on PostgreSQL, `bulk_create` elsewhere. Returns rows written.
+
+    Unlike `bulk_create`, the COPY path does not set primary keys on the instances.
+    """
+    if not chunks:
+        return 0
+    batch_size = batch_size or settings.CHUNK_COPY_BATCH_SIZE
+    if not uses_copy():
+        DocumentChunk.objects.bulk_create(chunks, batch_size=batch_size)
+        return len(chunks)
+
+    plan = _copy_plan()
+    with connection.cursor() as cursor:
+        table = connection.ops.quote_name(DocumentChunk._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field, _ in plan)
+        sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT binary)"
+        for start in range(0, len(chunks), batch_size):
+            payload = encode_copy_batch(chunks[start:start + batch_size], plan)
+            cursor.copy_expert(sql, io.BytesIO(payload))
+    return len(chunks)
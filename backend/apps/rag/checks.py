@@ -0,0 +1,53 @@
+"""
+System checks for the RAG app.
+
+`EMBEDDING_DIMENSION` decides the size of the vectors Bedrock returns, the
+model field and the width migration 0016 gives the pgvector column. A database
+migrated past 0016 with another dimension keeps its old `vector(n)` column, and
+every insert would then fail, so the declared width is compared with the setting.
+The check needs the database, so it runs with `migrate` and
+`check --database default`.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import connections
+
+EMBEDDING_TABLE = 'rag_documentchunk'
+
+
+def _declared_dimension(connection):
+    """The `n` of the embedding column's `vector(n)`, or None if there is no such column yet."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT a.atttypmod FROM pg_attribute a
+            JOIN pg_type t ON t.oid = a.atttypid
+            WHERE a.attrelid = to_regclass(%s) AND a.attname = 'embedding'
+              AND NOT a.attisdropped AND t.typname = 'vector'
+            """,
+            [EMBEDDING_TABLE],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] > 0 else None
+
+
+@register(Tags.database)
+def check_embedding_dimension(app_configs, databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            continue  # SQLite stores raw float32 bytes of any length
+        declared = _declared_dimension(connection)
+        if declared is not None and declared != settings.EMBEDDING_DIMENSION:
+            errors.append(Error(
+                f"{EMBEDDING_TABLE}.embedding is vector({declared}) in database '{alias}', "
+                f"but EMBEDDING_DIMENSION is {settings.EMBEDDING_DIMENSION}.",
+                hint=(
+                    f"Set EMBEDDING_DIMENSION={declared}, or change the column to "
+                    f"vector({settings.EMBEDDING_DIMENSION}) and re-ingest every file "
+                    "(stored embeddings can't be converted between dimensions)."
+                ),
+                id='rag.E001',
+            ))
+    return errors
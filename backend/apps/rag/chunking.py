@@ -0,0 +1,230 @@
+"""
+Token-aware text chunking.
+
+The text is scanned once for sentence, line and paragraph boundaries, each
+segment's token count is computed once, and segments are packed greedily up to
+a token budget with token-based overlap. Every chunk starts at a later segment
+than the previous one, so chunking always makes forward progress whatever the
+overlap setting.
+
+Token counts use tiktoken's cl100k_base encoding (a requirement; the Docker
+image downloads the encoding at build time). If it can't be loaded, a warning
+is logged and every word run and punctuation mark counts as one token instead,
+which is close to BPE counts for English. Boundary detection, the fallback
+token counts and chunk packing are vectorized, so the Python-level work is
+proportional to the number of chunks, not segments or characters (tiktoken
+still encodes each segment).
+"""
+import string
+import logging
+from typing import Iterator, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('cl100k_base')
+except Exception as e:
+    _ENCODING = None
+    logger.warning(
+        f"[RAG] tiktoken cl100k_base unavailable ({type(e).__name__}: {e}); "
+        "chunk sizes are estimated with the regex tokenizer"
+    )
+
+TOKENIZER_NAME = 'cl100k_base' if _ENCODING else 'regex'
+
+# Character classes; sentence ends and closing quotes/brackets are punctuation too
+_WORD, _SPACE, _PUNCT, _SENTENCE_END, _CLOSER = range(5)
+
+
+def _char_class(char: str) -> int:
+    if char.isspace():
+        return _SPACE
+    if char in '.!?':
+        return _SENTENCE_END
+    if char in '"\')]':
+        return _CLOSER
+    return _PUNCT if char in string.punctuation else _WORD
+
+
+# By code point; nothing above U+3000 is whitespace or ASCII punctuation
+_CHAR_CLASSES = np.array([_char_class(chr(code)) for code in range(0x3002)], dtype=np.uint8)
+_ASCII_CLASS_TABLE = _CHAR_CLASSES[:256].tobytes()  # For bytes.translate
+
+
+def _classify(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Code points and character classes, one element per character.
+
+    ASCII text is classified with `bytes.translate`, several times faster than
+    a numpy table lookup; other text goes through its UTF-32 code units.
+    """
+    if text.isascii():
+        data = text.encode('ascii')
+        return np.frombuffer(data, dtype=np.uint8), np.frombuffer(data.translate(_ASCII_CLASS_TABLE), dtype=np.uint8)
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    return codes, np.take(_CHAR_CLASSES, codes, mode='clip')
+
+
+def _token_start_mask(classes: np.ndarray) -> np.ndarray:
+    """Boolean mask of characters that start a token (word run or punctuation mark)."""
+    is_word = classes == _WORD
+    starts = classes >= _PUNCT
+    starts[:1] |= is_word[:1]
+    starts[1:] |= is_word[1:] & ~is_word[:-1]
+    return starts
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode_ordinary(text))
+    return int(np.count_nonzero(_token_start_mask(_classify(text)[1])))
+
+
+def _skip(positions: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """First index at or after each position where `mask` is False (or len(mask))."""
+    positions = positions.copy()
+    pending = np.arange(len(positions))
+    for _ in range(32):  # Runs are short in practice; longer ones are finished below
+        pending = pending[positions[pending] < len(mask)]
+        pending = pending[mask[positions[pending]]]
+        if not len(pending):
+            return positions
+        positions[pending] += 1
+    for index in pending.tolist():
+        start = int(positions[index])
+        rest = mask[start:]
+        offset = int(np.argmin(rest))
+        positions[index] = start + offset if not rest[offset] else len(mask)
+    return positions
+
+
+def _boundaries(codes: np.ndarray, classes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """End offsets of the segment boundaries and whether each ends a paragraph.
+
+    A boundary is a sentence end (`.`, `!` or `?`, then any closing quotes or
+    brackets) followed by whitespace, or a line break, and it ends where that
+    whitespace run ends. Only those candidate positions are visited. A boundary
+    ends a paragraph when its run holds two or more line breaks.
+    """
+    is_space = classes == _SPACE
+    candidates = np.flatnonzero((classes == _SENTENCE_END) | (codes == ord('\n')))
+    is_newline = codes[candidates] == ord('\n')
+    # A sentence end's run starts after its closers; a line break starts its own run.
+    # Closers are never line breaks, so the run starts stay in order.
+    run_starts = np.where(is_newline, candidates, _skip(candidates + 1, classes == _CLOSER))
+    followed_by_space = is_space[np.minimum(run_starts, len(codes) - 1)] & (run_starts < len(codes))
+    run_starts = run_starts[is_newline | followed_by_space]
+
+    run_ends = _skip(run_starts, is_space)
+    # Several candidates can share a run; keep the first, which holds all of its line breaks
+    first = np.ones(len(run_ends), dtype=bool)
+    first[1:] = run_ends[1:] != run_ends[:-1]
+    run_starts, run_ends = run_starts[first], run_ends[first]
+    # Two or more line breaks: the second line break at or after the run start is inside the run
+    newlines = np.append(candidates[is_newline], [len(codes), len(codes)])
+    second_line_break = newlines[np.searchsorted(newlines, run_starts) + 1]
+    return run_ends, second_line_break < run_ends
+
+
+def _segments(text: str, max_tokens: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split text into segments in one pass.
+
+    Returns parallel arrays of start offsets, end offsets, token counts and
+    whether the segment ends a paragraph. Segments longer than `max_tokens`
+    are cut at token boundaries.
+    """
+    codes, classes = _classify(text)
+    ends, paragraph_flags = _boundaries(codes, classes)
+    if not len(ends) or ends[-1] < len(text):
+        ends = np.append(ends, len(text))
+        paragraph_flags = np.append(paragraph_flags, True)
+    raw_starts = np.concatenate(([0], ends[:-1]))
+
+    token_starts = None
+    if _ENCODING is not None:
+        raw_tokens = np.array(
+            [len(_ENCODING.encode_ordinary(text[start:end])) for start, end in zip(raw_starts.tolist(), ends.tolist())],
+            dtype=np.int64,
+        )
+    else:
+        token_starts = _token_start_mask(classes)
+        raw_tokens = np.diff(np.flatnonzero(token_starts).searchsorted(np.append(raw_starts, len(text))))
+
+    if raw_tokens.max(initial=0) <= max_tokens:
+        return raw_starts, ends, raw_tokens, paragraph_flags
+
+    # Rare: oversized segments (e.g. text without punctuation) are cut every max_tokens tokens
+    if token_starts is None:
+        token_starts = _token_start_mask(classes)
+    starts, cut_ends, tokens, paragraph_ends = [], [], [], []
+    for start, end, segment_tokens, is_paragraph_end in zip(
+        raw_starts.tolist(), ends.tolist(), raw_tokens.tolist(), paragraph_flags.tolist()
+    ):
+        if segment_tokens <= max_tokens:
+            bounds = [start, end]
+        else:
+            offsets = (np.flatnonzero(token_starts[start:end]) + start).tolist()
+            bounds = [start] + offsets[max_tokens::max_tokens] + [end]
+        for piece_start, piece_end in zip(bounds, bounds[1:]):
+            starts.append(piece_start)
+            cut_ends.append(piece_end)
+            tokens.append(segment_tokens if len(bounds) == 2 else count_tokens(text[piece_start:piece_end]))
+            paragraph_ends.append(is_paragraph_end and piece_end == end)
+    return np.array(starts), np.array(cut_ends), np.array(tokens, dtype=np.int64), np.array(paragraph_ends, dtype=bool)
+
+
+def iter_chunk_spans(text: str, chunk_tokens: int, overlap_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    """Yield (start, end, token_count) spans of `text` packed to `chunk_tokens`.
+
+    Consecutive chunks share up to `overlap_tokens` tokens of whole segments.
+    A chunk ends at a paragraph break when one falls in its second half.
+
+    Where a chunk starting at each segment would end, and where the next one
+    would start, are computed for all segments at once; the loop then only
+    follows that chain from the first segment.
+    """
+    chunk_tokens = max(1, chunk_tokens)
+    overlap_tokens = max(0, overlap_tokens)
+    starts, ends, tokens, paragraph_ends = _segments(text, chunk_tokens)
+    count = len(starts)
+    if not count:
+        return
+
+    cumulative = np.concatenate(([0], np.cumsum(tokens)))  # cumulative[i] = tokens before segment i
+    first = np.arange(count)
+    base = cumulative[:-1]
+    # Greedily take segments up to the budget (always at least one)
+    last = np.maximum(first, np.searchsorted(cumulative, base + chunk_tokens, side='right') - 2)
+
+    # Prefer ending on the last paragraph break before `last`, if the chunk
+    # stays over half the budget there and just after it
+    half = chunk_tokens // 2
+    paragraph_breaks = np.flatnonzero(paragraph_ends)
+    if len(paragraph_breaks):
+        position = np.searchsorted(paragraph_breaks, last - 1, side='right') - 1
+        cut = paragraph_breaks[np.maximum(position, 0)]
+        movable = (last + 1 < count) & ~paragraph_ends[last] & (position >= 0) & (cut >= first)
+        after_cut = cumulative[np.minimum(cut + 2, count)]
+        movable &= (cumulative[np.minimum(cut + 1, count)] - base >= half) & (after_cut - base > half)
+        last = np.where(movable, cut, last)
+    totals = cumulative[last + 1] - base
+
+    # Step back over whole segments for the overlap, but always move forward
+    following = np.maximum(first + 1, np.searchsorted(cumulative, cumulative[last + 1] - overlap_tokens, side='left'))
+
+    # Follow the chain of chunk starts from the first segment
+    last_list, following = last.tolist(), following.tolist()
+    chain, index = [], 0
+    while True:
+        chain.append(index)
+        if last_list[index] + 1 >= count:
+            break
+        index = following[index]
+    chain = np.array(chain)
+    spans = zip(starts[chain].tolist(), ends[last[chain]].tolist(), totals[chain].tolist())
+    start, end, total = next(spans)
+    # Only the first segment can start with whitespace, so only the first chunk can be blank
+    if text[start:end].strip():
+        yield start, end, total
+    yield from spans
@@ -0,0 +1,161 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Entries are keyed by sha256(chunk text) + model id + dimension, so re-ingesting
+a file or uploading a duplicate only sends unseen chunks to Bedrock. The table
+is bounded by `EMBEDDING_CACHE_MAX_ENTRIES` with least-recently-used eviction,
+checked at most every `EMBEDDING_CACHE_EVICT_INTERVAL` seconds per process, so
+the table can briefly exceed its bound between checks.
+
+Hit/miss counters are kept per process and added to `EmbeddingCacheCounter`
+rows at most every `EMBEDDING_CACHE_STATS_FLUSH_INTERVAL` seconds, so the
+admin endpoint in the web process can report lookups made by ingestion workers.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import EmbeddingCache, EmbeddingCacheCounter
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_BATCH_SIZE = 500
+
+STAT_NAMES = ('hits', 'misses', 'stores', 'evictions')
+
+_stats = dict.fromkeys(STAT_NAMES, 0)
+_unflushed = dict.fromkeys(STAT_NAMES, 0)  # Counts not yet added to the counter rows
+_stats_lock = threading.Lock()
+_next_eviction_check = 0.0  # time.monotonic() deadline
+_next_flush = 0.0  # time.monotonic() deadline
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _record(**counts):
+    with _stats_lock:
+        for key, value in counts.items():
+            _stats[key] += value
+            _unflushed[key] += value
+        due = time.monotonic() >= _next_flush
+    if due:
+        flush_stats()
+
+
+def flush_stats():
+    """Add this process's new counts to the shared counter rows and restart the flush interval."""
+    global _next_flush
+    with _stats_lock:
+        counts = {name: value for name, value in _unflushed.items() if value}
+        _unflushed.update(dict.fromkeys(STAT_NAMES, 0))
+        _next_flush = time.monotonic() + settings.EMBEDDING_CACHE_STATS_FLUSH_INTERVAL
+    try:
+        for name, value in counts.items():
+            EmbeddingCacheCounter.objects.get_or_create(name=name)
+            EmbeddingCacheCounter.objects.filter(name=name).update(value=F('value') + value)
+    except Exception as e:
+        logger.warning(f"[RAG] Could not flush embedding cache counters: {str(e)}")
+
+
+def _with_rate(stats: dict) -> dict:
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def get_cache_stats() -> dict:
+    """Counters for this process since startup and for all processes together.
+    
+    The totals include every process's counts up to its last flush.
+    """
+    flush_stats()
+    with _stats_lock:
+        process = dict(_stats)
+    totals = dict.fromkeys(STAT_NAMES, 0)
+    try:
+        totals.update(EmbeddingCacheCounter.objects.filter(name__in=STAT_NAMES).values_list('name', 'value'))
+    except Exception as e:
+        logger.warning(f"[RAG] Could not read embedding cache counters: {str(e)}")
+    return {'process': _with_rate(process), 'all_workers': _with_rate(totals)}
+
+
+def lookup(hashes: Iterable[str], model_id: str, dimension: int) -> Dict[str, List[float]]:
+    """Return cached embeddings for the given text hashes and refresh their LRU stamp."""
+    wanted = list(set(hashes))
+    found = {}
+    for start in range(0, len(wanted), LOOKUP_BATCH_SIZE):
+        batch = wanted[start:start + LOOKUP_BATCH_SIZE]
+        rows = EmbeddingCache.objects.filter(
+            model_id=model_id, dimension=dimension, text_hash__in=batch
+        ).values_list('id', 'text_hash', 'embedding')
+        hit_ids = []
+        for row_id, key, blob in rows:
+            found[key] = np.frombuffer(bytes(blob), dtype='<f4').tolist()
+            hit_ids.append(row_id)
+        if hit_ids:
+            EmbeddingCache.objects.filter(id__in=hit_ids).update(last_used_at=timezone.now())
+    _record(hits=len(found), misses=len(wanted) - len(found))
+    return found
+
+
+def store(entries: List[Tuple[str, List[float]]], model_id: str, dimension: int):
+    """Insert (text hash, embedding) pairs, then evict if an eviction check is due."""
+    if not entries:
+        return
+    EmbeddingCache.objects.bulk_create(
+        [
+            EmbeddingCache(
+                text_hash=key,
+                model_id=model_id,
+                dimension=dimension,
+                embedding=np.asarray(embedding, dtype='<f4').tobytes(),
+            )
+            for key, embedding in entries
+        ],
+        ignore_conflicts=True,
+        batch_size=LOOKUP_BATCH_SIZE,
+    )
+    _record(stores=len(entries))
+    _maybe_evict()
+
+
+def _maybe_evict():
+    """Run `evict` if this process hasn't checked within `EMBEDDING_CACHE_EVICT_INTERVAL`."""
+    global _next_eviction_check
+    now = time.monotonic()
+    with _stats_lock:
+        if now < _next_eviction_check:
+            return
+        _next_eviction_check = now + settings.EMBEDDING_CACHE_EVICT_INTERVAL
+    try:
+        evict()
+    except Exception as e:
+        logger.warning(f"[RAG] Embedding cache eviction failed: {str(e)}")
+
+
+def evict() -> int:
+    """Drop least recently used entries beyond `EMBEDDING_CACHE_MAX_ENTRIES`.
+
+    Evicts an extra 10% so the next few stores don't trigger another pass.
+    """
+    max_entries = settings.EMBEDDING_CACHE_MAX_ENTRIES
+    excess = EmbeddingCache.objects.count() - max_entries
+    if excess <= 0:
+        return 0
+    excess += max_entries // 10
+    stale_ids = list(
+        EmbeddingCache.objects.order_by('last_used_at', 'id').values_list('id', flat=True)[:excess]
+    )
+    deleted = 0
+    for start in range(0, len(stale_ids), LOOKUP_BATCH_SIZE):
+        deleted += EmbeddingCache.objects.filter(id__in=stale_ids[start:start + LOOKUP_BATCH_SIZE]).delete()[0]
+    _record(evictions=deleted)
+    logger.info(f"[RAG] Evicted {deleted} embedding cache entries")
+    return deleted
@@ -0,0 +1,198 @@
+"""
+Bounded-concurrency embedding engine for Amazon Nova 2 Multimodal Embeddings.
+
+Chunks are embedded on a thread pool, every request first takes a token from a
+process-wide token bucket, and throttled requests shrink the bucket's rate so
+all threads back off together. Results come back in input order.
+"""
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+NOVA_EMBEDDING_MODEL_ID = "amazon.nova-2-multimodal-embeddings-v1:0"
+
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket with additive-increase / multiplicative-decrease rate."""
+
+    def __init__(self, rate: float, capacity: float, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self):
+        """Halve the rate and drain the bucket so every thread slows down."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            logger.warning(f"[Embeddings] Throttled by Bedrock, rate lowered to {self.rate:.2f} req/s")
+
+    def on_success(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Process-wide limiter shared by ingestion and chat queries."""
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                _bucket = TokenBucket(
+                    rate=settings.EMBEDDING_REQUESTS_PER_SECOND,
+                    capacity=settings.EMBEDDING_RATE_BURST,
+                )
+    return _bucket
+
+
+def is_throttling_error(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+    return False
+
+
+def invoke_embedding(bedrock_client, text: str, dimension: int) -> List[float]:
+    """Embed a single text with one Bedrock call."""
+    # Nova 2 Multimodal Embeddings API format
+    request_body = {
+        'taskType': 'SINGLE_EMBEDDING',
+        'singleEmbeddingParams': {
+            'embeddingPurpose': 'GENERIC_INDEX',
+            'embeddingDimension': dimension,
+            'text': {
+                'truncationMode': 'END',
+                'value': text
+            }
+        }
+    }
+
+    response = bedrock_client.invoke_model(
+        modelId=NOVA_EMBEDDING_MODEL_ID,
+        body=json.dumps(request_body),
+        contentType='application/json'
+    )
+
+    result = json.loads(response['body'].read())
+
+    # Nova 2 returns embedding in nested structure: {'embeddings': [{'embeddingType': 'TEXT', 'embedding': [...]}]}
+    if 'embeddings' in result and len(result['embeddings']) > 0:
+        embedding_obj = result['embeddings'][0]
+        if 'embedding' in embedding_obj:
+            return embedding_obj['embedding']
+        raise ValueError("No 'embedding' field in embeddings array item")
+    elif 'embedding' in result:
+        # Direct embedding field (fallback)
+        return result['embedding']
+
+    logger.error(f"[RAG] Unexpected response format: {list(result.keys())}")
+    raise ValueError(f"No embedding in response. Response keys: {list(result.keys())}")
+
+
+def _embed_with_retry(bedrock_client, text: str, dimension: int, max_retries: int, timer=None) -> List[float]:
+    limiter = get_rate_limiter()
+    for attempt in range(max_retries):
+        limiter.acquire()
+        try:
+            embedding = invoke_embedding(bedrock_client, text, dimension)
+            limiter.on_success()
+            return embedding
+        except Exception as e:
+            if is_throttling_error(e):
+                limiter.on_throttle()
+                if timer is not None:
+                    timer.record('embed', throttles=1)
+            if attempt == max_retries - 1:
+                raise
+            if timer is not None:
+                timer.record('embed', retries=1)
+            # Exponential backoff with full jitter
+            cap = min(settings.EMBEDDING_RETRY_MAX_DELAY, settings.EMBEDDING_RETRY_BASE_DELAY * (2 ** attempt))
+            wait_time = random.uniform(0, cap)
+            logger.warning(f"Embedding attempt {attempt + 1} failed, retrying in {wait_time:.2f}s: {str(e)}")
+            time.sleep(wait_time)
+
+
+def embed_texts(
+    bedrock_client,
+    texts: List[str],
+    dimension: int,
+    max_retries: int = 3,
+    allow_failures: bool = False,
+) -> List[Optional[List[float]]]:
+    """Embed texts concurrently, returning embeddings in input order.
+
+    A chunk that still fails after `max_retries` raises, or becomes None in the
+    result when `allow_failures` is set.
+    """
+    if not texts:
+        return []
+
+    # Pool threads report retries to the caller's ingestion timer, if any
+    timer = instrumentation.current()
+
+    def embed_one(text):
+        try:
+            return _embed_with_retry(bedrock_client, text, dimension, max_retries, timer)
+        except Exception as e:
+            if not allow_failures:
+                raise
+            logger.error(f"[Embeddings] Giving up on chunk after {max_retries} attempts: {str(e)}")
+            return None
+
+    if len(texts) == 1:
+        return [embed_one(texts[0])]
+
+    workers = min(settings.EMBEDDING_MAX_CONCURRENCY, len(texts))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='embed')
+    futures = [executor.submit(embed_one, text) for text in texts]
+    try:
+        return [future.result() for future in futures]
+    except Exception:
+        # Don't keep spending API calls on a batch that already failed
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True)
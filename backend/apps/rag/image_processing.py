@@ -0,0 +1,98 @@
+"""
+Image preprocessing and vision result caching.
+
+Images are downscaled to `IMAGE_MAX_DIMENSION` and re-encoded as JPEG before
+they are base64-encoded for the vision models, which keeps phone photos to a
+few hundred KB. Vision output is cached by the sha256 of the original image
+bytes, so re-processing or uploading the same image skips the API call.
+Pillow is optional; without it images are sent unchanged.
+"""
+import io
+import hashlib
+import logging
+from typing import BinaryIO, Optional, Tuple
+from django.conf import settings
+from .models import VisionResult
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the vision prompt changes so cached results are not reused
+PROMPT_VERSION = 1
+
+
+def image_hash(image_file: BinaryIO) -> str:
+    """sha256 of a binary file's full contents, read in chunks."""
+    image_file.seek(0)
+    return hashlib.file_digest(image_file, 'sha256').hexdigest()
+
+
+def cache_variant() -> str:
+    return f"v{PROMPT_VERSION}:{settings.IMAGE_MAX_DIMENSION}:{settings.IMAGE_JPEG_QUALITY}"
+
+
+def _original(image_file: BinaryIO) -> bytes:
+    image_file.seek(0)
+    return image_file.read()
+
+
+def preprocess_image(image_file: BinaryIO, media_type: str) -> Tuple[bytes, str]:
+    """Downscale and re-encode an image file for upload, returning (bytes, media type).
+
+    The original bytes are kept when Pillow is missing, the image can't be
+    decoded, or re-encoding would not make it smaller.
+    """
+    if Image is None:
+        return _original(image_file), media_type
+    
+    try:
+        original_length = image_file.seek(0, io.SEEK_END)
+        image_file.seek(0)
+        with Image.open(image_file) as image:
+            image = ImageOps.exif_transpose(image)  # Phone photos are often stored rotated
+            original_size = image.size
+            max_dimension = settings.IMAGE_MAX_DIMENSION
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            
+            if image.mode in ('RGBA', 'LA', 'P'):
+                # JPEG has no alpha channel: flatten onto white
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            
+            output = io.BytesIO()
+            image.save(output, format='JPEG', quality=settings.IMAGE_JPEG_QUALITY, optimize=True)
+            resized = image.size != original_size
+    except Exception as e:
+        logger.warning(f"[Image] Preprocessing failed, sending original: {str(e)}")
+        return _original(image_file), media_type
+    
+    processed = output.getvalue()
+    if not resized and len(processed) >= original_length:
+        return _original(image_file), media_type
+    logger.info(
+        f"[Image] Preprocessed {original_size[0]}x{original_size[1]} {original_length} bytes "
+        f"-> {image.size[0]}x{image.size[1]} {len(processed)} bytes"
+    )
+    return processed, 'image/jpeg'
+
+
+def lookup_result(key: str) -> Optional[str]:
+    result = VisionResult.objects.filter(image_hash=key, variant=cache_variant()).values_list('text', flat=True).first()
+    if result is not None:
+        logger.info(f"[Image] Vision cache hit for {key[:12]}")
+    return result
+
+
+def store_result(key: str, text: str, model_id: str):
+    VisionResult.objects.bulk_create(
+        [VisionResult(image_hash=key, variant=cache_variant(), text=text, model_id=model_id)],
+        ignore_conflicts=True,
+    )
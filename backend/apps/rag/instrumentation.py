@@ -0,0 +1,179 @@
+"""
+Per-stage ingestion timing.
+
+`ingest_file_async` activates an `IngestionTimer` for its thread; pipeline code
+wraps its work in `stage(name)` and reports counts with `record(name, ...)`,
+which are no-ops when no timer is active. Stages nest: a stage's time excludes
+the stages inside it, so an extraction step that triggers the S3 download
+doesn't count the download twice. The summary is stored in
+`FileAsset.metadata['ingestion_timings']` and aggregated by
+`aggregate_timings()` for the staff stats endpoint.
+
+CPU time is the ingestion thread's own (`time.thread_time`); work done on
+embedding threads or PDF worker processes shows up as wall time only.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from django.utils import timezone
+
+STAGES = ['download', 'extract', 'chunk', 'embed', 'store']
+
+# Upper bounds in bytes; files at or above the last bound fall in the final bucket
+SIZE_BUCKETS = [
+    (100 * 1024, '<100KB'),
+    (1024 * 1024, '100KB-1MB'),
+    (5 * 1024 * 1024, '1-5MB'),
+]
+LARGEST_SIZE_BUCKET = '>=5MB'
+
+PERCENTILES = (50, 90, 99)
+
+_local = threading.local()
+
+
+class IngestionTimer:
+    """Accumulates wall/CPU time and counters per pipeline stage for one ingestion."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.perf_counter()
+        self.started_cpu = time.thread_time()
+        self._stack = []  # [wall_start, cpu_start, child_wall, child_cpu] per open stage
+        self._lock = threading.Lock()  # record() may be called from embedding threads
+
+    def _stage(self, name: str) -> Dict[str, float]:
+        return self.stages.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0})
+
+    @contextmanager
+    def stage(self, name: str):
+        frame = [time.perf_counter(), time.thread_time(), 0.0, 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            wall = time.perf_counter() - frame[0]
+            cpu = time.thread_time() - frame[1]
+            with self._lock:
+                totals = self._stage(name)
+                totals['wall_s'] += wall - frame[2]
+                totals['cpu_s'] += cpu - frame[3]
+                totals['calls'] += 1
+            if self._stack:
+                self._stack[-1][2] += wall
+                self._stack[-1][3] += cpu
+
+    def record(self, name: str, **counts):
+        with self._lock:
+            totals = self._stage(name)
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {key: round(value, 4) if isinstance(value, float) else value for key, value in totals.items()}
+                for name, totals in self.stages.items()
+            }
+        return {
+            'stages': stages,
+            'total_wall_s': round(time.perf_counter() - self.started_at, 4),
+            'total_cpu_s': round(time.thread_time() - self.started_cpu, 4),
+            'recorded_at': timezone.now().isoformat(),
+        }
+
+
+def current() -> Optional[IngestionTimer]:
+    return getattr(_local, 'timer', None)
+
+
+def activate(timer: IngestionTimer):
+    """Make `timer` the current thread's timer until `deactivate()`."""
+    _local.timer = timer
+
+
+def deactivate():
+    _local.timer = None
+
+
+@contextmanager
+def stage(name: str):
+    timer = current()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+def record(name: str, **counts):
+    timer = current()
+    if timer is not None:
+        timer.record(name, **counts)
+
+
+def timed_iter(name: str, iterable: Iterable) -> Iterator:
+    """Yield from `iterable`, timing each step as stage `name` (for lazy extraction)."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def size_bucket(size: int) -> str:
+    for bound, label in SIZE_BUCKETS:
+        if size < bound:
+            return label
+    return LARGEST_SIZE_BUCKET
+
+
+def _percentiles(values: List[float]) -> dict:
+    points = np.percentile(values, PERCENTILES)
+    return {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, points)}
+
+
+def aggregate_timings(rows: Iterable[tuple]) -> List[dict]:
+    """Percentiles per (file type, size bucket) from (file_type, size, timings) rows.
+
+    Each group reports per-stage wall/CPU percentiles and summed counters, and
+    names the stage with the highest median wall time as the bottleneck.
+    """
+    groups: Dict[tuple, List[dict]] = {}
+    for file_type, size, timings in rows:
+        if not timings or 'stages' not in timings:
+            continue
+        groups.setdefault((file_type.lower(), size_bucket(size)), []).append(timings)
+
+    results = []
+    for (file_type, bucket), samples in sorted(groups.items()):
+        stage_names = [name for name in STAGES if any(name in s['stages'] for s in samples)]
+        stage_names += sorted({name for s in samples for name in s['stages']} - set(stage_names))
+        stages = {}
+        for name in stage_names:
+            present = [s['stages'][name] for s in samples if name in s['stages']]
+            counters = {}
+            for totals in present:
+                for key, value in totals.items():
+                    if key not in ('wall_s', 'cpu_s'):
+                        counters[key] = counters.get(key, 0) + value
+            stages[name] = {
+                'wall_s': _percentiles([t['wall_s'] for t in present]),
+                'cpu_s': _percentiles([t['cpu_s'] for t in present]),
+                'totals': counters,
+            }
+        results.append({
+            'file_type': file_type,
+            'size_bucket': bucket,
+            'files': len(samples),
+            'total_wall_s': _percentiles([s['total_wall_s'] for s in samples]),
+            'bottleneck': max(stages, key=lambda name: stages[name]['wall_s']['p50']) if stages else None,
+            'stages': stages,
+        })
+    return results
@@ -0,0 +1,207 @@
+"""
+Database-backed ingestion job queue.
+
+Web requests only enqueue an `IngestionJob`; `manage.py run_ingestion_worker`
+claims jobs, keeps a lease alive with heartbeats while `ingest_file_async` runs,
+and retries failed jobs with backoff. A job whose lease expires (worker killed
+or recycled) becomes claimable again, so files no longer get stuck in
+`processing`.
+"""
+import time
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from apps.files.models import FileAsset
+from .models import IngestionJob
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def enqueue_ingestion(file_asset: FileAsset, retry_failed: bool = False) -> IngestionJob:
+    """Queue ingestion for a file and mark it as processing.
+
+    Returns the already active job instead of queueing a duplicate. Its mode is
+    kept: a full ingestion re-embeds failed chunks when it resumes, and turning it
+    into a retry would skip the chunks it has not written yet.
+    Concurrent callers are serialized on the file row; the one-active-job-per-file
+    constraint covers databases without row locks.
+    """
+    with transaction.atomic():
+        FileAsset.objects.select_for_update().filter(id=file_asset.id).exists()
+        job = IngestionJob.objects.filter(file=file_asset, status__in=ACTIVE_STATUSES).first()
+        if job is None:
+            try:
+                with transaction.atomic():
+                    job = IngestionJob.objects.create(
+                        file=file_asset,
+                        retry_failed=retry_failed,
+                        max_attempts=settings.INGESTION_JOB_MAX_ATTEMPTS,
+                    )
+                logger.info(f"[Jobs] Queued job {job.id} for file {file_asset.id} (retry_failed={retry_failed})")
+            except IntegrityError:
+                # Another request queued one between the check and the insert
+                job = IngestionJob.objects.get(file=file_asset, status__in=ACTIVE_STATUSES)
+                logger.info(f"[Jobs] File {file_asset.id} already has active job {job.id}")
+        else:
+            logger.info(f"[Jobs] File {file_asset.id} already has active job {job.id}")
+
+        file_asset.status = 'processing'
+        file_asset.ingestion_status = 'in_progress'
+        file_asset.metadata.pop('finalize_error', None)
+        file_asset.save()
+    return job
+
+
+def _lease_deadline():
+    return timezone.now() + timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+
+
+def _mark_file_failed(file_id: int, error: str):
+    file_asset = FileAsset.objects.filter(id=file_id).first()
+    if not file_asset:
+        return
+    file_asset.status = 'failed'
+    file_asset.ingestion_status = 'failed'
+    file_asset.metadata['finalize_error'] = error
+    file_asset.save()
+
+
+def claim_next_job(worker_id: str) -> Optional[IngestionJob]:
+    """Claim the next runnable job, recovering jobs whose lease has expired.
+
+    Claims are compare-and-swap updates on (status, attempts), so two workers
+    can never run the same attempt, on PostgreSQL and SQLite alike.
+    """
+    now = timezone.now()
+    candidates = IngestionJob.objects.filter(
+        Q(status='queued', run_after__lte=now) | Q(status='running', lease_expires_at__lt=now)
+    ).order_by('run_after', 'id')[:10]
+
+    for candidate in candidates:
+        if candidate.status == 'running':
+            logger.warning(
+                f"[Jobs] Lease expired for job {candidate.id} (worker {candidate.worker_id}, "
+                f"attempt {candidate.attempts}/{candidate.max_attempts})"
+            )
+            if candidate.attempts >= candidate.max_attempts:
+                error = 'Ingestion worker stopped responding'
+                exhausted = IngestionJob.objects.filter(
+                    id=candidate.id, status='running', attempts=candidate.attempts
+                ).update(status='failed', last_error=error, lease_expires_at=None, updated_at=now)
+                if exhausted:
+                    _mark_file_failed(candidate.file_id, error)
+                continue
+
+        claimed = IngestionJob.objects.filter(
+            id=candidate.id, status=candidate.status, attempts=candidate.attempts
+        ).update(
+            status='running',
+            attempts=F('attempts') + 1,
+            worker_id=worker_id,
+            lease_expires_at=_lease_deadline(),
+            updated_at=now,
+        )
+        if claimed:
+            candidate.refresh_from_db()
+            logger.info(f"[Jobs] {worker_id} claimed job {candidate.id} (attempt {candidate.attempts})")
+            return candidate
+    return None
+
+
+def heartbeat(job: IngestionJob, worker_id: str) -> bool:
+    """Extend the lease of a running job. Returns False if the lease was lost."""
+    return bool(IngestionJob.objects.filter(
+        id=job.id, status='running', worker_id=worker_id, attempts=job.attempts
+    ).update(lease_expires_at=_lease_deadline(), updated_at=timezone.now()))
+
+
+def complete_job(job: IngestionJob, worker_id: str) -> bool:
+    """Mark the attempt succeeded. Returns False if the lease was lost."""
+    return bool(IngestionJob.objects.filter(
+        id=job.id, status='running', worker_id=worker_id, attempts=job.attempts
+    ).update(status='succeeded', lease_expires_at=None, last_error='', updated_at=timezone.now()))
+
+
+def fail_job(job: IngestionJob, worker_id: str, error: str):
+    """Requeue a failed attempt with exponential backoff, or fail it for good."""
+    now = timezone.now()
+    owned = IngestionJob.objects.filter(id=job.id, status='running', worker_id=worker_id, attempts=job.attempts)
+
+    if job.attempts < job.max_attempts:
+        delay = settings.INGESTION_JOB_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+        if owned.update(
+            status='queued',
+            run_after=now + timedelta(seconds=delay),
+            lease_expires_at=None,
+            last_error=error,
+            updated_at=now,
+        ):
+            logger.warning(f"[Jobs] Job {job.id} attempt {job.attempts} failed, retrying in {delay}s: {error}")
+            # ingest_file_async marks the file failed; it is still being worked on
+            FileAsset.objects.filter(id=job.file_id).update(
+                status='processing', ingestion_status='in_progress', updated_at=now
+            )
+    elif owned.update(status='failed', lease_expires_at=None, last_error=error, updated_at=now):
+        logger.error(f"[Jobs] Job {job.id} failed after {job.attempts} attempts: {error}")
+        _mark_file_failed(job.file_id, error)
+
+
+def run_job(job: IngestionJob, worker_id: str):
+    """Run a claimed job while a background thread keeps its lease alive.
+    
+    Heartbeat errors are retried until the lease would have expired. A lost
+    lease sets `lease_lost`, and ingestion stops before its next commit, since
+    another worker may have claimed the job by then.
+    """
+    from .services import IngestionCancelled, ingest_file_async
+
+    stop = threading.Event()
+    lease_lost = threading.Event()
+
+    def keep_alive():
+        interval = max(1, settings.INGESTION_JOB_LEASE_SECONDS // 3)
+        lease_ends = time.monotonic() + settings.INGESTION_JOB_LEASE_SECONDS
+        try:
+            while not stop.wait(interval):
+                try:
+                    renewed = heartbeat(job, worker_id)
+                except Exception as e:
+                    logger.warning(f"[Jobs] Heartbeat for job {job.id} failed: {str(e)}")
+                    connection.close()  # Reconnect on the next attempt
+                    if time.monotonic() + interval < lease_ends:
+                        continue
+                    renewed = False
+                if not renewed:
+                    logger.warning(f"[Jobs] {worker_id} lost the lease on job {job.id}, stopping ingestion")
+                    lease_lost.set()
+                    return
+                lease_ends = time.monotonic() + settings.INGESTION_JOB_LEASE_SECONDS
+        finally:
+            connection.close()
+
+    heartbeat_thread = threading.Thread(target=keep_alive, name=f'heartbeat-{job.id}', daemon=True)
+    heartbeat_thread.start()
+    try:
+        ingest_file_async(job.file_id, retry_failed=job.retry_failed, cancelled=lease_lost)
+        if complete_job(job, worker_id):
+            logger.info(f"[Jobs] Job {job.id} for file {job.file_id} succeeded")
+        else:
+            logger.warning(f"[Jobs] Job {job.id} finished after {worker_id} lost its lease")
+    except IngestionCancelled:
+        logger.warning(f"[Jobs] Abandoned job {job.id} attempt {job.attempts} after losing the lease")
+    except FileAsset.DoesNotExist:
+        # File deleted while queued; the job row is gone with it via cascade
+        logger.info(f"[Jobs] File {job.file_id} no longer exists, dropping job {job.id}")
+    except Exception as e:
+        fail_job(job, worker_id, str(e))
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+        close_old_connections()
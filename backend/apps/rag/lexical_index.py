@@ -0,0 +1,309 @@
+"""
+Per-user BM25 inverted index for keyword retrieval without PostgreSQL full-text search.
+
+Each file's chunks form one segment, stored on local disk as an `.npz` of flat
+arrays: the vocabulary as one UTF-8 blob plus offsets, postings in CSR layout
+(per-term offsets into int32 chunk positions and uint16 term frequencies), and
+per-chunk ids and lengths. Ingestion writes a file's segment once its chunks
+are stored and `delete_vectors` removes it, so the index is maintained
+incrementally. Loaded segments are combined into a `UserIndex` whose corpus
+statistics (chunk count, average length, document frequency) span all of them.
+
+A user's directory is built from the database the first time it is searched,
+and marked complete afterwards. Builds hold an exclusive `flock` on the user's
+lock file, so only one process builds a directory at a time, and they replace
+segments in place rather than clearing the directory, so concurrent readers
+always find a full set. Segments are cached per process, keyed by file
+modification time, so a segment rewritten by another process is reloaded.
+"""
+import os
+import re
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from django.conf import settings
+from .models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+COMPLETE_MARKER = '.complete'
+BUILD_LOCK_STRIPES = 64
+
+_loaded: 'OrderedDict[int, tuple]' = OrderedDict()  # user id -> (segment mtimes, {file id: (mtime, segment)}, UserIndex)
+_lock = threading.Lock()
+_build_locks = [threading.Lock() for _ in range(BUILD_LOCK_STRIPES)]  # By user id modulo the stripe count
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) > 1]
+
+
+def enabled() -> bool:
+    """The index is only kept where PostgreSQL full-text search is unavailable."""
+    return settings.DATABASES['default']['ENGINE'] != 'django.db.backends.postgresql'
+
+
+class Segment:
+    """One file's postings, loaded from its `.npz`."""
+
+    __slots__ = ('vocabulary', 'term_offsets', 'positions', 'frequencies', 'chunk_ids', 'lengths')
+
+    def __init__(self, arrays):
+        blob = arrays['terms'].tobytes().decode('utf-8')
+        bounds = arrays['term_bounds']
+        self.vocabulary = {blob[bounds[i]:bounds[i + 1]]: i for i in range(len(bounds) - 1)}
+        self.term_offsets = arrays['term_offsets']
+        self.positions = arrays['positions']
+        self.frequencies = arrays['frequencies']
+        self.chunk_ids = arrays['chunk_ids']
+        self.lengths = arrays['lengths']
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        index = self.vocabulary.get(term)
+        if index is None:
+            return None
+        start, end = self.term_offsets[index], self.term_offsets[index + 1]
+        return self.positions[start:end], self.frequencies[start:end]
+
+
+def _directory(user_id: int) -> str:
+    return os.path.join(settings.LEXICAL_INDEX_DIR, f"user_{user_id}")
+
+
+def _segment_path(user_id: int, file_id: int) -> str:
+    return os.path.join(_directory(user_id), f"file_{file_id}.npz")
+
+
+def _encode(chunks: Iterable[Tuple[int, str]]) -> dict:
+    """Flat arrays for one segment from (chunk id, text) pairs."""
+    chunk_ids, lengths, postings = [], [], {}
+    for position, (chunk_id, text) in enumerate(chunks):
+        counts = Counter(tokenize(text or ''))
+        chunk_ids.append(chunk_id)
+        lengths.append(sum(counts.values()))
+        for term, frequency in counts.items():
+            postings.setdefault(term, []).append((position, min(frequency, MAX_TERM_FREQUENCY)))
+
+    terms = sorted(postings)
+    encoded = [term.encode('utf-8') for term in terms]
+    term_bounds = np.zeros(len(terms) + 1, dtype=np.int64)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    total = sum(len(postings[term]) for term in terms)
+    positions = np.empty(total, dtype=np.int32)
+    frequencies = np.empty(total, dtype=np.uint16)
+    offset, char_offset = 0, 0
+    for index, term in enumerate(terms):
+        entries = postings[term]
+        positions[offset:offset + len(entries)] = [entry[0] for entry in entries]
+        frequencies[offset:offset + len(entries)] = [entry[1] for entry in entries]
+        offset += len(entries)
+        char_offset += len(term)
+        term_offsets[index + 1] = offset
+        term_bounds[index + 1] = char_offset
+    return {
+        'terms': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'term_bounds': term_bounds,  # Character offsets into the decoded blob
+        'term_offsets': term_offsets,
+        'positions': positions,
+        'frequencies': frequencies,
+        'chunk_ids': np.asarray(chunk_ids, dtype=np.int64),
+        'lengths': np.asarray(lengths, dtype=np.int32),
+    }
+
+
+def _write_segment(user_id: int, file_id: int):
+    chunks = DocumentChunk.objects.filter(file_id=file_id).order_by('chunk_index').values_list('id', 'chunk_text')
+    arrays = _encode(chunks.iterator())
+    path = _segment_path(user_id, file_id)
+    if not len(arrays['chunk_ids']):
+        _remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written under a unique name and renamed, so readers never see a partial file
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporary, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def add_file(user_id: int, file_id: int):
+    """(Re)write a file's segment from its stored chunks."""
+    if enabled():
+        _write_segment(user_id, file_id)
+
+
+def remove_file(user_id: int, file_id: int):
+    if enabled():
+        _remove(_segment_path(user_id, file_id))
+
+
+@contextmanager
+def _process_lock(user_id: int):
+    """Exclusive lock on the user's index across processes (held until the block exits)."""
+    os.makedirs(settings.LEXICAL_INDEX_DIR, exist_ok=True)
+    with open(os.path.join(settings.LEXICAL_INDEX_DIR, f"user_{user_id}.lock"), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _build(user_id: int, force: bool = False):
+    """Rewrite every segment of a user from the database and mark the index complete.
+    
+    Unless `force` is set, a directory another process completed while this
+    one waited for the lock is kept as is.
+    """
+    directory = _directory(user_id)
+    marker = os.path.join(directory, COMPLETE_MARKER)
+    with _process_lock(user_id):
+        if not force and os.path.exists(marker):
+            return
+        os.makedirs(directory, exist_ok=True)
+        file_ids = set(
+            DocumentChunk.objects.filter(user_id=user_id).order_by().values_list('file_id', flat=True).distinct()
+        )
+        for file_id in file_ids:
+            _write_segment(user_id, file_id)
+        # Segments of files that no longer have chunks are dropped after the new set is in place
+        for entry in os.scandir(directory):
+            if entry.name.startswith('file_') and entry.name.endswith('.npz') and int(entry.name[5:-4]) not in file_ids:
+                _remove(entry.path)
+        open(marker, 'w').close()
+    logger.info(f"[RAG] Built lexical index for user {user_id}")
+
+
+def rebuild(user_id: int):
+    """Rewrite every segment of a user from the database."""
+    with _lock:
+        _loaded.pop(user_id, None)
+    with _build_locks[user_id % BUILD_LOCK_STRIPES]:
+        _build(user_id, force=True)
+
+
+class UserIndex:
+    """All of a user's segments viewed as one index, with global BM25 statistics.
+    
+    Per-term postings are merged across segments and their BM25 term weights
+    computed on first use, then kept, so repeated terms cost one dict lookup.
+    """
+
+    def __init__(self, segments: Dict[int, Segment]):
+        self.offsets, start = {}, 0
+        for file_id, segment in segments.items():
+            self.offsets[file_id] = start
+            start += len(segment.chunk_ids)
+        self.segments = segments
+        self.size = start
+        self.chunk_ids = np.concatenate([s.chunk_ids for s in segments.values()]) if segments else np.zeros(0, np.int64)
+        self.file_ids = np.concatenate(
+            [np.full(len(s.chunk_ids), file_id, dtype=np.int64) for file_id, s in segments.items()]
+        ) if segments else np.zeros(0, np.int64)
+        lengths = np.concatenate([s.lengths for s in segments.values()]) if segments else np.zeros(0, np.int32)
+        k1, b = settings.BM25_K1, settings.BM25_B
+        average_length = float(lengths.mean()) if len(lengths) else 1.0
+        self.length_norm = (k1 * (1 - b + b * lengths / max(average_length, 1e-9))).astype(np.float32)
+        self.terms = {}  # term -> (positions, weights), or None when absent
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if term in self.terms:
+            return self.terms[term]
+        positions, frequencies = [], []
+        for file_id, segment in self.segments.items():
+            hit = segment.postings(term)
+            if hit is not None:
+                positions.append(hit[0] + self.offsets[file_id])
+                frequencies.append(hit[1])
+        entry = None
+        if positions:
+            positions = np.concatenate(positions)
+            tf = np.concatenate(frequencies).astype(np.float32)
+            document_frequency = len(positions)
+            idf = np.log(1 + (self.size - document_frequency + 0.5) / (document_frequency + 0.5))
+            k1 = settings.BM25_K1
+            entry = (positions, (idf * tf * (k1 + 1) / (tf + self.length_norm[positions])).astype(np.float32))
+        self.terms[term] = entry
+        return entry
+
+
+def _load(user_id: int) -> UserIndex:
+    """The user's current index, building it if it was never built and reloading changed segments."""
+    directory = _directory(user_id)
+    marker = os.path.join(directory, COMPLETE_MARKER)
+    if not os.path.exists(marker):
+        with _build_locks[user_id % BUILD_LOCK_STRIPES]:
+            if not os.path.exists(marker):
+                _build(user_id)
+
+    on_disk = {}
+    for entry in os.scandir(directory):
+        if entry.name.startswith('file_') and entry.name.endswith('.npz'):
+            on_disk[int(entry.name[5:-4])] = (entry.stat().st_mtime_ns, entry.path)
+    versions = {file_id: mtime for file_id, (mtime, _) in on_disk.items()}
+
+    with _lock:
+        cached = _loaded.get(user_id)
+        if cached is not None and cached[0] == versions:
+            _loaded.move_to_end(user_id)
+            return cached[2]
+    segments = dict(cached[1]) if cached is not None else {}  # file id -> (mtime, segment)
+
+    current = {}
+    for file_id, (mtime, path) in on_disk.items():
+        entry = segments.get(file_id)
+        if entry is None or entry[0] != mtime:
+            try:
+                with np.load(path, allow_pickle=False) as arrays:
+                    entry = (mtime, Segment(arrays))
+            except FileNotFoundError:
+                continue  # Removed since the directory was listed
+        current[file_id] = entry
+    index = UserIndex({file_id: entry[1] for file_id, entry in current.items()})
+
+    with _lock:
+        _loaded[user_id] = (versions, current, index)
+        _loaded.move_to_end(user_id)
+        while len(_loaded) > settings.LEXICAL_INDEX_MAX_USERS:
+            _loaded.popitem(last=False)
+    return index
+
+
+def search(user_id: int, query_text: str, top_k: int, file_ids: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+    """(chunk id, BM25 score) of the user's top_k chunks, best first.
+    
+    Statistics cover all of the user's chunks; `file_ids` only filters results.
+    """
+    terms = set(tokenize(query_text))
+    index = _load(user_id)
+    if not terms or not index.size:
+        return []
+
+    scores = np.zeros(index.size, dtype=np.float32)
+    for term in terms:
+        postings = index.postings(term)
+        if postings is not None:
+            scores[postings[0]] += postings[1]
+    if file_ids:
+        scores[~np.isin(index.file_ids, file_ids)] = 0
+
+    matched = np.flatnonzero(scores)
+    k = min(top_k, len(matched))
+    if k <= 0:
+        return []
+    top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+    top = top[np.argsort(-scores[top])]
+    return [(int(index.chunk_ids[position]), float(scores[position])) for position in top]
@@ -0,0 +1,77 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.files.models import FileAsset
+from apps.rag.bulk_writer import bulk_insert_chunks, uses_copy
+from apps.rag.models import DocumentChunk
+from apps.rag.services import _embedding_db_value
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare chunk insert throughput (rows/sec) of bulk_create and the binary COPY writer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=settings.CHUNK_COPY_BATCH_SIZE)
+        parser.add_argument('--dimension', type=int, default=settings.EMBEDDING_DIMENSION)
+
+    def _chunks(self, user, file_asset, embeddings):
+        return [
+            DocumentChunk(
+                user=user,
+                file=file_asset,
+                chunk_text=f"Benchmark chunk {index} " * 40,
+                embedding=_embedding_db_value(embedding.tolist()),
+                embedding_status='embedded',
+                metadata={'chunk_index': index, 'page_number': index // 4 + 1},
+                page_number=index // 4 + 1,
+                token_count=160,
+                chunk_index=index,
+                extraction_method='txt',
+            )
+            for index, embedding in enumerate(embeddings)
+        ]
+
+    def _run(self, label, writer, embeddings):
+        """Time one writer inside a transaction that is rolled back afterwards."""
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username=f"chunk-write-benchmark-{time.time_ns()}")
+                file_asset = FileAsset.objects.create(
+                    user=user, filename='benchmark.txt', file_type='txt',
+                    s3_key=f"benchmark/{user.username}.txt", size=0,
+                )
+                chunks = self._chunks(user, file_asset, embeddings)
+                started = time.perf_counter()
+                writer(chunks)
+                elapsed = time.perf_counter() - started
+                written = DocumentChunk.objects.filter(file=file_asset).count()
+                raise _Rollback()
+        except _Rollback:
+            pass
+        rows = len(embeddings)
+        self.stdout.write(f"{label:<24} {elapsed:>9.2f} {rows / elapsed:>10.0f} {written:>8}")
+        return elapsed
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        embeddings = np.random.default_rng(0).standard_normal((rows, options['dimension']), dtype=np.float32)
+        self.stdout.write(f"{rows} rows, batch size {batch_size}, database: {connection.vendor}")
+        self.stdout.write(f"{'writer':<24} {'seconds':>9} {'rows/s':>10} {'written':>8}")
+
+        baseline = self._run(
+            'bulk_create', lambda chunks: DocumentChunk.objects.bulk_create(chunks, batch_size=batch_size), embeddings
+        )
+        if not uses_copy():
+            self.stdout.write('Binary COPY needs PostgreSQL with pgvector and psycopg2; only bulk_create was measured.')
+            return
+        elapsed = self._run('binary COPY', lambda chunks: bulk_insert_chunks(chunks, batch_size=batch_size), embeddings)
+        self.stdout.write(f"Speedup: {baseline / elapsed:.2f}x")
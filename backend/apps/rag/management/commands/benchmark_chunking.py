@@ -0,0 +1,105 @@
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.rag.chunking import TOKENIZER_NAME, iter_chunk_spans
+
+WORDS = (
+    "the of and to in a is that for it as was with be by on not he this are or his from at which "
+    "document retrieval embedding vector chunk budget sentence paragraph overlap throughput"
+).split()
+
+
+def legacy_chunk_text(text, chunk_size=800, chunk_overlap=200):
+    """The previous fixed 800-character splitter, kept here as the baseline."""
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+        chunk = text[start:end]
+        last_period = chunk.rfind('. ')
+        last_newline = chunk.rfind('\n\n')
+        split_point = max(last_period, last_newline)
+        if split_point > chunk_size * 0.5:
+            end = start + split_point + 1
+            chunk = text[start:end]
+        chunks.append(chunk)
+        start = end - chunk_overlap
+    return chunks
+
+
+def synthetic_text(size_bytes, seed=0):
+    """Prose-like text: sentences of 5-30 words, paragraphs of 1-8 sentences."""
+    rng = random.Random(seed)
+    paragraphs, length = [], 0
+    while length < size_bytes:
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            words = rng.choices(WORDS, k=rng.randint(5, 30))
+            sentences.append(' '.join(words).capitalize() + '.')
+        paragraph = ' '.join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return '\n\n'.join(paragraphs)[:size_bytes]
+
+
+class Command(BaseCommand):
+    help = 'Compare chunking throughput against the old character splitter and check forward progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='UTF-8 text file to chunk instead of synthetic text.')
+        parser.add_argument('--size-mb', type=float, default=4.0, help='Size of the synthetic text.')
+        parser.add_argument('--chunk-tokens', type=int, default=settings.CHUNK_SIZE_TOKENS)
+        parser.add_argument('--overlap-tokens', type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per chunker; the fastest is reported.')
+
+    def handle(self, *args, **options):
+        if options['path']:
+            with open(options['path'], encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = synthetic_text(int(options['size_mb'] * 1024 * 1024))
+        size_mb = len(text.encode('utf-8')) / (1024 * 1024)
+        chunk_tokens = options['chunk_tokens']
+        self.stdout.write(f"Text: {size_mb:.2f} MB, tokenizer: {TOKENIZER_NAME}")
+
+        legacy, legacy_seconds = self._best_of(options['repeat'], lambda: legacy_chunk_text(text))
+        spans, new_seconds = self._best_of(
+            options['repeat'], lambda: list(iter_chunk_spans(text, chunk_tokens, options['overlap_tokens']))
+        )
+
+        self.stdout.write(f"{'chunker':<28} {'seconds':>8} {'MB/s':>8} {'chunks':>8}")
+        self.stdout.write(f"{'legacy (800 chars)':<28} {legacy_seconds:>8.2f} {size_mb / legacy_seconds:>8.2f} {len(legacy):>8}")
+        self.stdout.write(
+            f"{f'token ({chunk_tokens} tokens)':<28} {new_seconds:>8.2f} {size_mb / new_seconds:>8.2f} {len(spans):>8}"
+        )
+        self.stdout.write(f"Token chunker time / legacy time: {new_seconds / legacy_seconds:.1f}x")
+        over_budget = sum(1 for _, _, tokens in spans if tokens > chunk_tokens)
+        self.stdout.write(f"Chunks over the token budget: {over_budget}")
+
+        # Forward progress for every overlap setting, up to and beyond the chunk size
+        sample = text[:256 * 1024]
+        for overlap in (0, chunk_tokens // 4, chunk_tokens // 2, chunk_tokens - 1, chunk_tokens, chunk_tokens * 2):
+            previous_start, covered = -1, 0
+            for start, end, _ in iter_chunk_spans(sample, chunk_tokens, overlap):
+                if start <= previous_start:
+                    raise CommandError(f"No forward progress with overlap {overlap} at offset {start}")
+                previous_start, covered = start, max(covered, end)
+            if sample[covered:].strip():
+                raise CommandError(f"Text after offset {covered} was dropped with overlap {overlap}")
+            self.stdout.write(f"overlap {overlap:>4} tokens: forward progress OK")
+
+    def _best_of(self, repeat, run):
+        best = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            result = run()
+            seconds = time.perf_counter() - started
+            best = seconds if best is None else min(best, seconds)
+        return result, best
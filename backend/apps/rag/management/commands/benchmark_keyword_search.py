@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+import time
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from apps.files.models import FileAsset
+from apps.rag import lexical_index
+from apps.rag.models import DocumentChunk
+from apps.rag.services import _bm25_search, _substring_search
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare BM25 index query latency with the substring-matching loop on a synthetic corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunks', type=int, default=20000)
+        parser.add_argument('--files', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--top-k', type=int, default=settings.TOP_K_CHUNKS)
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words in the synthetic corpus.')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        words = [f"w{index}x" for index in range(options['vocabulary'])]
+        # Zipf-like word frequencies, like natural text
+        weights = 1 / np.arange(1, len(words) + 1)
+        weights /= weights.sum()
+        queries = [' '.join(rng.choice(words, size=3, p=weights)) for _ in range(options['queries'])]
+
+        index_dir = tempfile.mkdtemp(prefix='rag-lexical-benchmark-')
+        try:
+            with override_settings(LEXICAL_INDEX_DIR=index_dir), transaction.atomic():
+                self._run(rng, words, weights, queries, options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    def _run(self, rng, words, weights, queries, options):
+        user = User.objects.create(username=f"keyword-benchmark-{time.time_ns()}")
+        files = [
+            FileAsset.objects.create(
+                user=user, filename=f"benchmark-{index}.txt", file_type='txt',
+                s3_key=f"benchmark/{user.username}/{index}.txt", size=0,
+            )
+            for index in range(options['files'])
+        ]
+        chunks = [
+            DocumentChunk(
+                user=user,
+                file=files[index % len(files)],
+                chunk_text=' '.join(rng.choice(words, size=120, p=weights)),
+                embedding_status='embedded',
+                metadata={},
+                chunk_index=index,
+                token_count=120,
+                extraction_method='txt',
+            )
+            for index in range(options['chunks'])
+        ]
+        DocumentChunk.objects.bulk_create(chunks, batch_size=1000)
+
+        started = time.perf_counter()
+        lexical_index.rebuild(user.id)
+        build_seconds = time.perf_counter() - started
+        _bm25_search(DocumentChunk.objects.filter(user=user), queries[0], user.id, None, 1)  # Load segments
+
+        query = DocumentChunk.objects.filter(user=user)
+        top_k = options['top_k']
+        index_seconds, search_seconds, loop_seconds, overlaps = [], [], [], []
+        for text in queries:
+            started = time.perf_counter()
+            hits = lexical_index.search(user.id, text, top_k)
+            index_seconds.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            bm25 = _bm25_search(query, text, user.id, None, top_k)
+            search_seconds.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            loop = _substring_search(query, text, top_k)
+            loop_seconds.append(time.perf_counter() - started)
+            if loop:
+                overlaps.append(len({chunk.chunk_id for chunk in bm25} & {chunk.chunk_id for chunk in loop}) / len(loop))
+
+        self.stdout.write(
+            f"{options['chunks']} chunks in {options['files']} files, {len(queries)} queries, top {top_k}; "
+            f"index built in {build_seconds:.2f}s"
+        )
+        self.stdout.write(f"{'method':<22} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, seconds in (
+            ('BM25 index lookup', index_seconds),
+            ('BM25 + row fetch', search_seconds),
+            ('substring loop', loop_seconds),
+        ):
+            self.stdout.write(
+                f"{label:<22} {np.percentile(seconds, 50) * 1000:>8.3f} {np.percentile(seconds, 95) * 1000:>8.3f}"
+            )
+        self.stdout.write(f"Speedup (p50, with row fetch): {np.percentile(loop_seconds, 50) / np.percentile(search_seconds, 50):.0f}x")
+        if overlaps:
+            self.stdout.write(f"Top-{top_k} overlap with the substring loop: {np.mean(overlaps):.2f} (rankings differ by design)")
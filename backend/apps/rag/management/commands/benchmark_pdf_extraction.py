@@ -0,0 +1,48 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PyPDF2 import PdfReader
+
+from apps.rag.pdf_extraction import iter_pages_parallel, iter_pages_sequential
+
+
+class Command(BaseCommand):
+    help = 'Measure PDF text extraction throughput (pages/sec) for different worker counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Local PDF file to extract.')
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+            help='Worker process counts to compare; 1 means sequential extraction.',
+        )
+        parser.add_argument('--pages-per-task', type=int, default=settings.PDF_PAGES_PER_TASK)
+        parser.add_argument('--repeat', type=int, default=1, help='Runs per worker count; the best is reported.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            page_count = len(PdfReader(path).pages)
+        except Exception as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        self.stdout.write(f"{path}: {page_count} pages")
+        self.stdout.write(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+
+        baseline = None
+        for workers in options['workers']:
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                if workers <= 1:
+                    pages = list(iter_pages_sequential(PdfReader(path)))
+                else:
+                    pages = list(iter_pages_parallel(path, page_count, workers, options['pages_per_task']))
+                elapsed = time.perf_counter() - started
+                if [number for number, _ in pages] != list(range(1, page_count + 1)):
+                    raise CommandError(f"Page order broken with {workers} workers")
+                best = elapsed if best is None else min(best, elapsed)
+
+            baseline = baseline or best
+            self.stdout.write(
+                f"{workers:>8} {best:>9.2f} {page_count / best:>9.1f} {baseline / best:>7.2f}x"
+            )
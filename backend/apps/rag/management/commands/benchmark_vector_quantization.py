@@ -0,0 +1,132 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.rag.models import DocumentChunk
+from apps.rag.vector_search import _approximate, _exact, _quantized
+
+MODES = ('none', 'halfvec', 'binary', 'prefix')
+
+# (must contain, must not contain) in pg_indexes.indexdef for each mode's index
+INDEX_PATTERNS = {
+    'none': ('%vector_cosine_ops%', '%subvector%'),
+    'halfvec': ('%halfvec_cosine_ops%', ''),
+    'binary': ('%bit_hamming_ops%', ''),
+    'prefix': ('%subvector%', ''),
+}
+
+
+def _bytes_per_vector(mode: str, dimensions: int) -> int:
+    # Data size of one indexed value, without tuple and graph overhead
+    prefix = settings.EMBEDDING_PREFIX_DIMENSION
+    return {'none': 4 * dimensions, 'halfvec': 2 * dimensions, 'binary': dimensions // 8, 'prefix': 4 * prefix}[mode] + 8
+
+
+class Command(BaseCommand):
+    help = 'Compare recall, latency and index size of full-precision, halfvec, binary and prefix ANN search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50, help='Number of sampled chunk embeddings used as queries.')
+        parser.add_argument('--top-k', type=int, default=settings.TOP_K_CHUNKS)
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument(
+            '--build-missing', action='store_true',
+            help='Temporarily build the index of modes that have none (dropped afterwards).',
+        )
+
+    def _index_for(self, cursor, mode):
+        required, excluded = INDEX_PATTERNS[mode]
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexdef LIKE %s AND indexdef NOT LIKE %s",
+            [DocumentChunk._meta.db_table, required, excluded],
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _build(self, cursor, mode):
+        dimensions = int(settings.EMBEDDING_DIMENSION)
+        prefix = int(settings.EMBEDDING_PREFIX_DIMENSION)
+        expression = {
+            'none': 'embedding vector_cosine_ops',
+            'halfvec': f"(embedding::halfvec({dimensions})) halfvec_cosine_ops",
+            'binary': f"(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops",
+            'prefix': f"(subvector(embedding, 1, {prefix})::vector({prefix})) vector_cosine_ops",
+        }[mode]
+        name = f"rag_chunk_embedding_bench_{mode}"
+        self.stdout.write(f"Building temporary {mode} index...")
+        started = time.perf_counter()
+        cursor.execute(f"CREATE INDEX {name} ON {DocumentChunk._meta.db_table} USING hnsw ({expression})")
+        self.stdout.write(f"  built in {time.perf_counter() - started:.1f}s")
+        return name
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Quantized vector search needs PostgreSQL with pgvector >= 0.7.')
+        top_k = options['top_k']
+        samples = list(
+            DocumentChunk.objects.filter(embedding_status='embedded')
+            .order_by('?').values_list('user_id', 'embedding')[:options['queries']]
+        )
+        if not samples:
+            raise CommandError('No embedded chunks to sample queries from.')
+
+        built = []
+        with connection.cursor() as cursor:
+            indexes = {}
+            for mode in options['modes']:
+                indexes[mode] = self._index_for(cursor, mode)
+                if indexes[mode] is None and options['build_missing']:
+                    indexes[mode] = self._build(cursor, mode)
+                    built.append(indexes[mode])
+
+        try:
+            self._report(samples, top_k, options['modes'], indexes)
+        finally:
+            with connection.cursor() as cursor:
+                for name in built:
+                    cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def _report(self, samples, top_k, modes, indexes):
+        truths, exact_seconds = [], []
+        for user_id, embedding in samples:
+            queryset = DocumentChunk.objects.filter(user_id=user_id, embedding_status='embedded')
+            query = np.asarray(embedding, dtype=np.float32).tolist()
+            started = time.perf_counter()
+            truths.append({row[0] for row in _exact(queryset, query, top_k, ('id',))})
+            exact_seconds.append(time.perf_counter() - started)
+
+        dimensions = int(settings.EMBEDDING_DIMENSION)
+        self.stdout.write(f"{len(samples)} queries, top {top_k}, {dimensions} dimensions")
+        self.stdout.write(
+            f"{'mode':<10} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'index MB':>9} {'bytes/vector':>13}"
+        )
+        self.stdout.write(
+            f"{'exact':<10} {1.0:>7.3f} {np.percentile(exact_seconds, 50) * 1000:>8.1f} "
+            f"{np.percentile(exact_seconds, 95) * 1000:>8.1f} {'-':>9} {4 * dimensions + 8:>13}"
+        )
+
+        for mode in modes:
+            index = indexes.get(mode)
+            if index is None:
+                self.stdout.write(f"{mode:<10} skipped: no index (see VECTOR_QUANTIZATION or --build-missing)")
+                continue
+            recalls, seconds = [], []
+            for (user_id, embedding), truth in zip(samples, truths):
+                queryset = DocumentChunk.objects.filter(user_id=user_id, embedding_status='embedded')
+                query = np.asarray(embedding, dtype=np.float32).tolist()
+                started = time.perf_counter()
+                if mode == 'none':
+                    rows, _ = _approximate(queryset, query, top_k, ('id',))
+                else:
+                    rows, _ = _quantized(queryset, query, top_k, mode, ('id',))
+                seconds.append(time.perf_counter() - started)
+                recalls.append(len(truth & {row[0] for row in rows}) / len(truth) if truth else 1.0)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_relation_size(%s::regclass)", [index])
+                index_mb = cursor.fetchone()[0] / (1024 * 1024)
+            self.stdout.write(
+                f"{mode:<10} {np.mean(recalls):>7.3f} {np.percentile(seconds, 50) * 1000:>8.1f} "
+                f"{np.percentile(seconds, 95) * 1000:>8.1f} {index_mb:>9.1f} {_bytes_per_vector(mode, dimensions):>13}"
+            )
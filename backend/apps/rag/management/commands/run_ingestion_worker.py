@@ -0,0 +1,80 @@
+import os
+import signal
+import socket
+import threading
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from apps.rag import embedding_cache
+from apps.rag.jobs import claim_next_job, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process queued file ingestion jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.INGESTION_WORKER_CONCURRENCY,
+            help='Number of jobs processed in parallel by this process.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.INGESTION_WORKER_POLL_INTERVAL,
+            help='Seconds to wait before polling again when the queue is empty.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once the queue is empty instead of polling forever.',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            logger.info(f"[Worker] Received signal {signum}, finishing current jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        def work(slot):
+            worker_id = f"{socket.gethostname()}:{os.getpid()}:{slot}"
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    try:
+                        job = claim_next_job(worker_id)
+                    except Exception as e:
+                        # Database hiccup: back off instead of killing the slot
+                        logger.error(f"[Worker] {worker_id} failed to claim a job: {str(e)}", exc_info=True)
+                        stop.wait(poll_interval)
+                        continue
+                    if job:
+                        run_job(job, worker_id)
+                    elif burst:
+                        return
+                    else:
+                        stop.wait(poll_interval)
+            finally:
+                connection.close()
+
+        self.stdout.write(f"Starting ingestion worker with concurrency {concurrency}")
+        threads = [
+            threading.Thread(target=work, args=(slot,), name=f'ingestion-{slot}')
+            for slot in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        # Join with a timeout so the main thread keeps handling signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+        embedding_cache.flush_stats()
+        connection.close()
+        self.stdout.write("Ingestion worker stopped")
@@ -0,0 +1,168 @@
+"""
+Per-user embedding matrices for retrieval without pgvector.
+
+A user's embedded chunks are stored once as a row-normalized float32 matrix in
+a `.npy` file on local disk, next to an int64 array of (chunk id, file id) per
+row, and memory-mapped for queries. A query is then one matrix-vector product
+and an `argpartition` for the top k, instead of loading every chunk.
+
+Files are named after the user's (embedded chunk count, max chunk id), which
+`search()` checks with one indexed query, so a matrix built before chunks were
+added or removed is never used, whichever process changed them. Ingestion and
+`delete_vectors` also call `invalidate()` to remove stale files right away.
+A user whose matrix falls out of a process's LRU has its files removed too, so
+the directory only holds matrices some process used recently; a process that
+still maps them keeps its mapping, and the next query elsewhere rebuilds them.
+"""
+import os
+import glob
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from .models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+BUILD_BATCH_SIZE = 2000
+BUILD_LOCK_STRIPES = 64
+
+_mapped: 'OrderedDict[int, Tuple[tuple, np.ndarray, np.ndarray]]' = OrderedDict()  # user id -> (signature, matrix, rows)
+_lock = threading.Lock()
+_build_locks = [threading.Lock() for _ in range(BUILD_LOCK_STRIPES)]  # By user id modulo the stripe count
+
+
+def _directory() -> str:
+    return settings.EMBEDDING_MATRIX_CACHE_DIR
+
+
+def _paths(user_id: int, signature: tuple) -> Tuple[str, str]:
+    base = os.path.join(_directory(), f"user_{user_id}_{signature[0]}_{signature[1]}")
+    return f"{base}.npy", f"{base}.rows.npy"
+
+
+def _signature(user_id: int) -> tuple:
+    totals = DocumentChunk.objects.filter(user_id=user_id, embedding_status='embedded').aggregate(
+        count=Count('id'), max_id=Max('id'),
+    )
+    return totals['count'], totals['max_id'] or 0
+
+
+def _remove_files(user_id: int, keep: Sequence[str] = ()):
+    for path in glob.glob(os.path.join(_directory(), f"user_{user_id}_*.npy")):
+        if path not in keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def invalidate(user_id: int):
+    """Drop a user's matrix from this process and remove its files."""
+    with _lock:
+        _mapped.pop(user_id, None)
+    _remove_files(user_id)
+
+
+def _save(path: str, array: np.ndarray):
+    # Written under a unique name and renamed, so readers never see a partial file
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'wb') as f:
+        np.save(f, array)
+    os.replace(temporary, path)
+
+
+def _build(user_id: int, signature: tuple):
+    """Write the user's normalized matrix and row map, then remove older versions."""
+    queryset = (
+        DocumentChunk.objects.filter(user_id=user_id, embedding_status='embedded')
+        .order_by('id').values_list('id', 'file_id', 'embedding')
+    )
+    matrix, rows, dimension = None, np.empty((signature[0], 2), dtype=np.int64), None
+    count = 0
+    for chunk_id, file_id, embedding in queryset.iterator(chunk_size=BUILD_BATCH_SIZE):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if matrix is None:
+            dimension = vector.shape
+            matrix = np.empty((signature[0],) + dimension, dtype=np.float32)
+        if vector.shape != dimension:
+            logger.warning(f"[RAG] Skipping chunk {chunk_id}: embedding shape {vector.shape} != {dimension}")
+            continue
+        if count == len(matrix):
+            break  # Chunks added since the signature was read belong to the next build
+        matrix[count] = vector
+        rows[count] = (chunk_id, file_id)
+        count += 1
+
+    matrix = matrix[:count] if matrix is not None else np.zeros((0, 0), dtype=np.float32)
+    rows = rows[:count]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    os.makedirs(_directory(), exist_ok=True)
+    matrix_path, rows_path = _paths(user_id, signature)
+    _save(rows_path, rows)
+    _save(matrix_path, matrix)
+    _remove_files(user_id, keep=(matrix_path, rows_path))
+    logger.info(f"[RAG] Built embedding matrix for user {user_id}: {count} rows")
+
+
+def _load(user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The user's current memory-mapped (matrix, rows), building them if missing or stale."""
+    signature = _signature(user_id)
+    with _lock:
+        entry = _mapped.get(user_id)
+        if entry is not None and entry[0] == signature:
+            _mapped.move_to_end(user_id)
+            return entry[1], entry[2]
+
+    with _build_locks[user_id % BUILD_LOCK_STRIPES]:
+        matrix_path, rows_path = _paths(user_id, signature)
+        if not (os.path.exists(matrix_path) and os.path.exists(rows_path)):
+            _build(user_id, signature)
+        matrix = np.load(matrix_path, mmap_mode='r')
+        rows = np.load(rows_path, mmap_mode='r')
+
+    evicted = []
+    with _lock:
+        _mapped[user_id] = (signature, matrix, rows)
+        _mapped.move_to_end(user_id)
+        while len(_mapped) > settings.EMBEDDING_MATRIX_CACHE_MAX_USERS:
+            evicted.append(_mapped.popitem(last=False)[0])
+    for evicted_user_id in evicted:
+        _remove_files(evicted_user_id)
+    return matrix, rows
+
+
+def search(
+    user_id: int, query_embedding: Sequence[float], top_k: int, file_ids: Optional[List[int]] = None
+) -> List[Tuple[int, float]]:
+    """(chunk id, cosine similarity) of the user's top_k chunks, best first."""
+    matrix, rows = _load(user_id)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    if matrix.shape[0] == 0:
+        return []
+    if matrix.shape[1] != query.shape[0]:
+        logger.warning(f"[RAG] Query dimension {query.shape[0]} != stored dimension {matrix.shape[1]}")
+        return []
+    norm = np.linalg.norm(query)
+    if norm > 0:
+        query = query / norm
+
+    if file_ids:
+        selected = np.flatnonzero(np.isin(rows[:, 1], file_ids))
+        scores = matrix[selected] @ query
+    else:
+        selected = None
+        scores = matrix @ query
+
+    k = min(top_k, scores.shape[0])
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    positions = top if selected is None else selected[top]
+    return [(int(rows[position, 0]), float(scores[index])) for position, index in zip(positions, top)]
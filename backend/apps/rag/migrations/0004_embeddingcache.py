@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0003_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=64)),
+                ('model_id', models.CharField(max_length=100)),
+                ('dimension', models.IntegerField()),
+                ('embedding', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='rag_embeddi_last_us_3df058_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='embeddingcache',
+            constraint=models.UniqueConstraint(fields=('text_hash', 'model_id', 'dimension'), name='rag_embedding_cache_key'),
+        ),
+    ]
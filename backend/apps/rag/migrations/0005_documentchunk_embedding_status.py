@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:36
+
+from django.db import migrations, models
+import pgvector.django
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0004_embeddingcache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='embedding',
+            field=pgvector.django.VectorField(blank=True, dimensions=1024, null=True),
+        ),
+        # Chunks written before per-chunk state existed were all embedded
+        migrations.AddField(
+            model_name='documentchunk',
+            name='embedding_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('embedded', 'Embedded'), ('failed', 'Failed')], default='embedded', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='embedding_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('embedded', 'Embedded'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=models.Index(fields=['file', 'embedding_status'], name='rag_documen_file_id_294e84_idx'),
+        ),
+    ]
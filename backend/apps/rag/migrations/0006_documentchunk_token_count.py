@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0005_documentchunk_embedding_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='token_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0006_documentchunk_token_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_hash', models.CharField(max_length=64)),
+                ('variant', models.CharField(max_length=100)),
+                ('text', models.TextField()),
+                ('model_id', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='visionresult',
+            constraint=models.UniqueConstraint(fields=('image_hash', 'variant'), name='rag_vision_result_key'),
+        ),
+    ]
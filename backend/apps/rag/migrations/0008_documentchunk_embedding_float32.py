@@ -0,0 +1,48 @@
+import json
+import numpy as np
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def _convert(schema_editor, select_type, convert):
+    """Rewrite `embedding` values of the given SQLite storage type, one batch at a time."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return  # PostgreSQL stores embeddings as pgvector columns
+    table = connection.ops.quote_name('rag_documentchunk')
+    last_id = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f"SELECT id, embedding FROM {table} WHERE id > %s AND typeof(embedding) = %s ORDER BY id LIMIT %s",
+                [last_id, select_type, BATCH_SIZE],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            cursor.executemany(
+                f"UPDATE {table} SET embedding = %s WHERE id = %s",
+                [(convert(value), row_id) for row_id, value in rows],
+            )
+            last_id = rows[-1][0]
+
+
+def json_to_float32(apps, schema_editor):
+    _convert(schema_editor, 'text', lambda value: np.asarray(json.loads(value), dtype='<f4').tobytes())
+
+
+def float32_to_json(apps, schema_editor):
+    _convert(schema_editor, 'blob', lambda value: json.dumps(np.frombuffer(value, dtype='<f4').tolist()))
+
+
+class Migration(migrations.Migration):
+    """Convert SQLite embeddings from JSON text to little-endian float32 bytes."""
+
+    dependencies = [
+        ('rag', '0007_visionresult'),
+    ]
+
+    operations = [
+        migrations.RunPython(json_to_float32, float32_to_json),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0008_documentchunk_embedding_float32'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=models.Index(fields=['user', 'embedding_status'], name='rag_documen_user_id_bf901b_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'rag_chunk_embedding_ann_idx'
+
+
+def create_ann_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return  # SQLite searches the cached embedding matrices instead
+    if settings.VECTOR_INDEX_TYPE == 'ivfflat':
+        method = 'ivfflat'
+        options = f"lists = {int(settings.VECTOR_INDEX_IVFFLAT_LISTS)}"
+    else:
+        method = 'hnsw'
+        options = (
+            f"m = {int(settings.VECTOR_INDEX_HNSW_M)}, "
+            f"ef_construction = {int(settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION)}"
+        )
+    # CONCURRENTLY keeps ingestion writing while a large table is indexed
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON rag_documentchunk "
+        f"USING {method} (embedding vector_cosine_ops) WITH ({options})"
+    )
+
+
+def drop_ann_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    """Cosine ANN index on DocumentChunk.embedding (PostgreSQL only), built from VECTOR_INDEX_* settings."""
+
+    atomic = False
+
+    dependencies = [
+        ('rag', '0009_documentchunk_user_embedding_status_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_ann_index, drop_ann_index, atomic=False),
+    ]
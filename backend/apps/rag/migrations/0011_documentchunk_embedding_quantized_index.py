@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations
+
+FULL_INDEX_NAME = 'rag_chunk_embedding_ann_idx'  # Created by 0010
+QUANTIZED_INDEX_NAME = 'rag_chunk_embedding_quantized_idx'
+
+
+def _index_options() -> str:
+    if settings.VECTOR_INDEX_TYPE == 'ivfflat':
+        return f"lists = {int(settings.VECTOR_INDEX_IVFFLAT_LISTS)}"
+    return (
+        f"m = {int(settings.VECTOR_INDEX_HNSW_M)}, "
+        f"ef_construction = {int(settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION)}"
+    )
+
+
+def _method() -> str:
+    return 'ivfflat' if settings.VECTOR_INDEX_TYPE == 'ivfflat' else 'hnsw'
+
+
+def create_quantized_index(apps, schema_editor):
+    """Index the quantized expression and drop the full-precision index it replaces."""
+    if schema_editor.connection.vendor != 'postgresql' or settings.VECTOR_QUANTIZATION not in ('halfvec', 'binary'):
+        return
+    dimensions = int(settings.EMBEDDING_DIMENSION)
+    if settings.VECTOR_QUANTIZATION == 'binary':
+        expression = f"(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops"
+    else:
+        expression = f"(embedding::halfvec({dimensions})) halfvec_cosine_ops"
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {QUANTIZED_INDEX_NAME} ON rag_documentchunk "
+        f"USING {_method()} ({expression}) WITH ({_index_options()})"
+    )
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {FULL_INDEX_NAME}")
+
+
+def drop_quantized_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {FULL_INDEX_NAME} ON rag_documentchunk "
+        f"USING {_method()} (embedding vector_cosine_ops) WITH ({_index_options()})"
+    )
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {QUANTIZED_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    """halfvec or binary-quantized ANN index when VECTOR_QUANTIZATION is set (PostgreSQL, pgvector >= 0.7)."""
+
+    atomic = False
+
+    dependencies = [
+        ('rag', '0010_documentchunk_embedding_ann_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_quantized_index, drop_quantized_index, atomic=False),
+    ]
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db import migrations
+
+FULL_INDEX_NAME = 'rag_chunk_embedding_ann_idx'  # Created by 0010
+PREFIX_INDEX_NAME = 'rag_chunk_embedding_prefix_idx'
+
+
+def _index_options() -> str:
+    if settings.VECTOR_INDEX_TYPE == 'ivfflat':
+        return f"lists = {int(settings.VECTOR_INDEX_IVFFLAT_LISTS)}"
+    return (
+        f"m = {int(settings.VECTOR_INDEX_HNSW_M)}, "
+        f"ef_construction = {int(settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION)}"
+    )
+
+
+def _method() -> str:
+    return 'ivfflat' if settings.VECTOR_INDEX_TYPE == 'ivfflat' else 'hnsw'
+
+
+def create_prefix_index(apps, schema_editor):
+    """Index the leading embedding dimensions and drop the full-precision index they replace."""
+    if schema_editor.connection.vendor != 'postgresql' or settings.VECTOR_QUANTIZATION != 'prefix':
+        return
+    prefix = int(settings.EMBEDDING_PREFIX_DIMENSION)
+    if not 0 < prefix < settings.EMBEDDING_DIMENSION:
+        raise ValueError(
+            f"EMBEDDING_PREFIX_DIMENSION ({prefix}) must be below EMBEDDING_DIMENSION ({settings.EMBEDDING_DIMENSION})"
+        )
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {PREFIX_INDEX_NAME} ON rag_documentchunk "
+        f"USING {_method()} ((subvector(embedding, 1, {prefix})::vector({prefix})) vector_cosine_ops) "
+        f"WITH ({_index_options()})"
+    )
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {FULL_INDEX_NAME}")
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {FULL_INDEX_NAME} ON rag_documentchunk "
+        f"USING {_method()} (embedding vector_cosine_ops) WITH ({_index_options()})"
+    )
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {PREFIX_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    """First-stage ANN index on an embedding prefix when VECTOR_QUANTIZATION=prefix (PostgreSQL, pgvector >= 0.7)."""
+
+    atomic = False
+
+    dependencies = [
+        ('rag', '0011_documentchunk_embedding_quantized_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_index, drop_prefix_index, atomic=False),
+    ]
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_INDEX_NAME = 'rag_chunk_search_vector_idx'
+
+
+def add_search_vector(apps, schema_editor):
+    """Generated tsvector column over chunk_text with a GIN index; not on the model, so writes never touch it."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE rag_documentchunk ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector(%s::regconfig, coalesce(chunk_text, ''))) STORED",
+        [settings.SEARCH_TEXT_CONFIG],
+    )
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {SEARCH_INDEX_NAME} ON rag_documentchunk USING gin (search_vector)"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {SEARCH_INDEX_NAME}")
+    schema_editor.execute("ALTER TABLE rag_documentchunk DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+    """Full-text search column and index used by hybrid retrieval (PostgreSQL only)."""
+
+    atomic = False
+
+    dependencies = [
+        ('rag', '0012_documentchunk_embedding_prefix_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, drop_search_vector, atomic=False),
+    ]
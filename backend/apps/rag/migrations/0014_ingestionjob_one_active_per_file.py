@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:46
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Keep the oldest queued/running job of each file so the constraint can be added."""
+    IngestionJob = apps.get_model('rag', 'IngestionJob')
+    seen = set()
+    duplicates = []
+    for job_id, file_id in IngestionJob.objects.filter(status__in=['queued', 'running']).order_by('id').values_list('id', 'file_id'):
+        if file_id in seen:
+            duplicates.append(job_id)
+        seen.add(file_id)
+    IngestionJob.objects.filter(id__in=duplicates).update(
+        status='failed', lease_expires_at=None, last_error='Duplicate of an earlier active job'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0013_documentchunk_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingestionjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('file',), name='rag_ingestion_job_one_active_per_file'),
+        ),
+    ]
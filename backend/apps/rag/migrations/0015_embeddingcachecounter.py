@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag', '0014_ingestionjob_one_active_per_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCacheCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:30
+
+from django.conf import settings
+from django.db import migrations
+import pgvector.django
+
+
+class Migration(migrations.Migration):
+    """Resize the pgvector column to `EMBEDDING_DIMENSION` (0002 and 0005 created it as vector(1024)).
+
+    A no-op at the default 1024. The column can only change size while it holds no
+    embeddings; otherwise the cast fails and `migrate` stops, as the `rag.E001` check does.
+    """
+
+    dependencies = [
+        ('rag', '0015_embeddingcachecounter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='embedding',
+            field=pgvector.django.VectorField(blank=True, dimensions=settings.EMBEDDING_DIMENSION, null=True),
+        ),
+    ]
@@ -1,6 +1,9 @@
+import json
+import numpy as np
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
 from apps.files.models import FileAsset
 
 # Conditionally import VectorField based on database backend
@@ -10,11 +13,36 @@ try:
 except:
     USE_VECTOR_FIELD = False
 
+
+class Float32VectorField(models.BinaryField):
+    """Embedding stored as little-endian float32 bytes, read back as a read-only numpy array.
+
+    Used instead of pgvector on SQLite. Accepts lists, arrays or raw bytes; rows
+    still holding the old JSON text are parsed on read.
+    """
+    
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+    
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, str):
+            return np.array(json.loads(value), dtype=np.float32)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return np.frombuffer(value, dtype='<f4')
+        return np.asarray(value, dtype=np.float32)
+    
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, bytearray, memoryview)):
+            return value
+        return np.asarray(value, dtype='<f4').tobytes()
+
+
 if USE_VECTOR_FIELD:
-    EmbeddingField = lambda **kwargs: VectorField(dimensions=1024, **kwargs)
+    EmbeddingField = lambda **kwargs: VectorField(dimensions=settings.EMBEDDING_DIMENSION, **kwargs)
 else:
-    # Use TextField for SQLite (store as JSON string)
-    EmbeddingField = lambda **kwargs: models.TextField(**kwargs)
+    EmbeddingField = lambda **kwargs: Float32VectorField(**kwargs)
 
 
 class DocumentChunk(models.Model):
@@ -26,12 +54,20 @@ class DocumentChunk(models.Model):
         ('image_vision_failed', 'Image Vision Failed'),
     ]
     
+    EMBEDDING_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('embedded', 'Embedded'),
+        ('failed', 'Failed'),
+    ]
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunks')
     file = models.ForeignKey(FileAsset, on_delete=models.CASCADE, related_name='chunks')
     chunk_text = models.TextField()
-    embedding = EmbeddingField()  # VectorField for PostgreSQL, TextField for SQLite
+    embedding = EmbeddingField(null=True, blank=True)  # VectorField for PostgreSQL, float32 BLOB for SQLite; null until embedded
+    embedding_status = models.CharField(max_length=20, choices=EMBEDDING_STATUS_CHOICES, default='pending')
     metadata = models.JSONField(default=dict)
     page_number = models.IntegerField(null=True, blank=True)
+    token_count = models.IntegerField(null=True, blank=True)  # Tokenizer in apps.rag.chunking
     chunk_index = models.IntegerField()  # Order within file
     extraction_method = models.CharField(max_length=50, choices=EXTRACTION_METHOD_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -41,8 +77,98 @@ class DocumentChunk(models.Model):
         indexes = [
             models.Index(fields=['user', 'file']),
             models.Index(fields=['file', 'chunk_index']),
+            models.Index(fields=['file', 'embedding_status']),
+            models.Index(fields=['user', 'embedding_status']),  # Covers the embedding matrix freshness check
         ]
     
     def __str__(self):
         return f"Chunk {self.chunk_index} of {self.file.filename}"
 
+
+
+class IngestionJob(models.Model):
+    """Durable ingestion work item claimed by `manage.py run_ingestion_worker`."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    file = models.ForeignKey(FileAsset, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    retry_failed = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # Not claimable before this (retry backoff)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)  # Extended by worker heartbeats
+    worker_id = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'lease_expires_at']),
+            models.Index(fields=['file', 'status']),
+        ]
+        constraints = [
+            # At most one queued or running job per file
+            models.UniqueConstraint(
+                fields=['file'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='rag_ingestion_job_one_active_per_file',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Ingestion job {self.id} for file {self.file_id} ({self.status})"
+
+
+class EmbeddingCache(models.Model):
+    """Embeddings keyed by chunk content so retries and duplicate uploads skip Bedrock."""
+    text_hash = models.CharField(max_length=64)  # sha256 hex of the chunk text
+    model_id = models.CharField(max_length=100)
+    dimension = models.IntegerField()
+    embedding = models.BinaryField()  # little-endian float32
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)  # LRU eviction order
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['text_hash', 'model_id', 'dimension'], name='rag_embedding_cache_key'),
+        ]
+        indexes = [
+            models.Index(fields=['last_used_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.model_id}/{self.dimension}/{self.text_hash[:12]}"
+
+
+class EmbeddingCacheCounter(models.Model):
+    """Embedding cache hit/miss totals summed over every process (see `embedding_cache.flush_stats`)."""
+    name = models.CharField(max_length=20, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class VisionResult(models.Model):
+    """Vision-model output keyed by image content, so re-processing and duplicate images skip the API."""
+    image_hash = models.CharField(max_length=64)  # sha256 hex of the original image bytes
+    variant = models.CharField(max_length=100)  # Preprocessing settings and prompt version
+    text = models.TextField()
+    model_id = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['image_hash', 'variant'], name='rag_vision_result_key'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model_id}/{self.image_hash[:12]}"
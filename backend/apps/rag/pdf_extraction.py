@@ -0,0 +1,55 @@
+"""
+PDF text extraction, optionally spread over a process pool.
+
+`extract_text()` is pure Python and holds the GIL, so large PDFs are split into
+page ranges that worker processes extract independently. This module only
+imports PyPDF2 so spawned workers start without loading Django.
+"""
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+from PyPDF2 import PdfReader
+
+
+# Per-worker-process reader, so a worker parses the PDF once for all its ranges
+_worker_reader = (None, None)
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Worker entry point: extract pages [start, stop) of the PDF at `path`."""
+    global _worker_reader
+    if _worker_reader[0] != path:
+        _worker_reader = (path, PdfReader(path))
+    reader = _worker_reader[1]
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def page_ranges(page_count: int, workers: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, small enough to keep every worker busy."""
+    size = max(1, min(pages_per_task, math.ceil(page_count / workers)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def iter_pages_sequential(reader: PdfReader) -> Iterator[Tuple[int, str]]:
+    for page_number, page in enumerate(reader.pages, start=1):
+        yield page_number, page.extract_text() or ''
+
+
+def iter_pages_parallel(path: str, page_count: int, workers: int, pages_per_task: int) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) in page order while worker processes extract ahead.
+
+    Workers are spawned rather than forked because the caller may be a
+    multi-threaded ingestion worker or web process.
+    """
+    ranges = page_ranges(page_count, workers, pages_per_task)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as executor:
+        futures = [executor.submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+        try:
+            for (start, _), future in zip(ranges, futures):
+                for offset, text in enumerate(future.result()):
+                    yield start + offset + 1, text
+        finally:
+            for future in futures:
+                future.cancel()
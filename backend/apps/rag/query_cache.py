@@ -0,0 +1,145 @@
+"""
+Two-tier cache of chat query embeddings.
+
+Keys are sha256(model id + dimension + normalized query text), where
+normalization is NFKC, case folding and collapsed whitespace, so "What is X?"
+and " what is  x? " share an entry. The first tier is a small per-process LRU;
+the second is the `query_embeddings` Django cache (file-based by default), so
+every gunicorn worker reuses embeddings computed by the others. Entries expire
+after `QUERY_EMBEDDING_CACHE_TTL` in both tiers.
+
+Hit/miss counters are kept per process. Each process adds its new counts to
+one shared totals entry at most every `QUERY_EMBEDDING_STATS_FLUSH_INTERVAL`
+seconds, so lookups don't write to the shared cache (a file backend `set` also
+culls). The totals are approximate: concurrent flushes can overwrite each
+other, and the backend may cull the entry.
+"""
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .embeddings import NOVA_EMBEDDING_MODEL_ID
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'query_embeddings'
+STATS_KEY = 'query-embedding-stats'
+STAT_NAMES = ('local_hits', 'shared_hits', 'misses', 'stores')
+
+_local: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires at, embedding)
+_lock = threading.Lock()
+_stats = dict.fromkeys(STAT_NAMES, 0)
+_unflushed = dict.fromkeys(STAT_NAMES, 0)  # Counts not yet added to the shared totals
+_next_flush = 0.0  # time.monotonic() deadline
+
+
+def normalize(text: str) -> str:
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def cache_key(text: str) -> str:
+    identity = f"{NOVA_EMBEDDING_MODEL_ID}:{settings.EMBEDDING_DIMENSION}:{normalize(text)}"
+    return 'query-embedding:' + hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def _record(name: str):
+    with _lock:
+        _stats[name] += 1
+        _unflushed[name] += 1
+        due = time.monotonic() >= _next_flush
+    if due:
+        _flush_stats()
+
+
+def _flush_stats():
+    """Add this process's new counts to the shared totals and restart the flush interval."""
+    global _next_flush
+    with _lock:
+        counts = dict(_unflushed)
+        _unflushed.update(dict.fromkeys(STAT_NAMES, 0))
+        _next_flush = time.monotonic() + settings.QUERY_EMBEDDING_STATS_FLUSH_INTERVAL
+    if not any(counts.values()):
+        return
+    try:
+        shared = caches[CACHE_ALIAS]
+        totals = shared.get(STATS_KEY) or {}
+        shared.set(STATS_KEY, {name: totals.get(name, 0) + counts[name] for name in STAT_NAMES}, timeout=None)
+    except Exception:
+        pass  # Counters are best effort
+
+
+def _remember(key: str, embedding: List[float]):
+    with _lock:
+        _local[key] = (time.monotonic() + settings.QUERY_EMBEDDING_CACHE_TTL, embedding)
+        _local.move_to_end(key)
+        while len(_local) > settings.QUERY_EMBEDDING_LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def lookup(text: str) -> Optional[List[float]]:
+    """The cached embedding of a query, or None."""
+    key = cache_key(text)
+    with _lock:
+        entry = _local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _local.move_to_end(key)
+            embedding = entry[1]
+        else:
+            embedding = None
+    if embedding is not None:
+        _record('local_hits')
+        return embedding
+
+    try:
+        blob = caches[CACHE_ALIAS].get(key)
+    except Exception as e:
+        logger.warning(f"[RAG] Query embedding cache read failed: {str(e)}")
+        blob = None
+    if blob is None:
+        _record('misses')
+        return None
+    embedding = np.frombuffer(blob, dtype='<f4').tolist()
+    _remember(key, embedding)
+    _record('shared_hits')
+    return embedding
+
+
+def store(text: str, embedding: List[float]):
+    key = cache_key(text)
+    _remember(key, embedding)
+    try:
+        caches[CACHE_ALIAS].set(key, np.asarray(embedding, dtype='<f4').tobytes(), settings.QUERY_EMBEDDING_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"[RAG] Query embedding cache write failed: {str(e)}")
+        return
+    _record('stores')
+
+
+def _with_rates(counts: dict) -> dict:
+    lookups = counts['local_hits'] + counts['shared_hits'] + counts['misses']
+    counts['hit_rate'] = (counts['local_hits'] + counts['shared_hits']) / lookups if lookups else 0.0
+    return counts
+
+
+def get_stats() -> dict:
+    """Counters for this process and, approximately, for all workers sharing the cache.
+    
+    The shared totals include every process's counts up to its last flush.
+    """
+    _flush_stats()
+    with _lock:
+        process = dict(_stats, local_entries=len(_local))
+    try:
+        totals = caches[CACHE_ALIAS].get(STATS_KEY) or {}
+        shared = {name: totals.get(name, 0) for name in STAT_NAMES}
+    except Exception as e:
+        logger.warning(f"[RAG] Could not read shared query embedding cache counters: {str(e)}")
+        shared = dict.fromkeys(STAT_NAMES, 0)
+    return {'process': _with_rates(process), 'all_workers': _with_rates(shared)}
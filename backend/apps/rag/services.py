@@ -1,10 +1,10 @@
 import io
 import base64
 import json
-import time
-import boto3
 import logging
-from typing import List, Tuple, Optional
+import tempfile
+import threading
+from typing import Iterable, Iterator, List, Tuple, Optional
 from PyPDF2 import PdfReader
 from docx import Document
 from django.conf import settings
@@ -12,32 +12,82 @@ from django.db import transaction
 # Using simple text splitter instead of langchain to avoid Python 3.14 compatibility issues
 from apps.files.models import FileAsset
 from apps.files.services import S3Service
+from config.aws_clients import get_client
 from .models import DocumentChunk
+from .embeddings import NOVA_EMBEDDING_MODEL_ID, embed_texts
+from . import embedding_cache, image_processing, instrumentation, lexical_index, matrix_cache, vector_search
+from .chunking import TOKENIZER_NAME, iter_chunk_spans
+from .pdf_extraction import iter_pages_parallel, iter_pages_sequential
+from .bulk_writer import bulk_insert_chunks
 
 logger = logging.getLogger(__name__)
 
 
-def extract_text_from_s3(s3_key: str, file_type: str) -> str:
-    """Extract text from S3 object using in-memory processing."""
+def _iter_text_blocks(pieces: Iterable[str], page_number: Optional[int] = None) -> Iterator[Tuple[Optional[int], str]]:
+    """Regroup streamed text into blocks, preferring paragraph and line breaks."""
+    block_size = settings.INGESTION_TEXT_BLOCK_CHARS
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) > block_size:
+            end = block_size
+            split_point = max(buffer.rfind('\n\n', 0, end), buffer.rfind('\n', 0, end))
+            if split_point > block_size // 2:
+                end = split_point + 1
+            yield page_number, buffer[:end]
+            buffer = buffer[end:]
+    if buffer:
+        yield page_number, buffer
+
+
+def iter_pages_from_s3(s3_key: str, file_type: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Yield (page_number, text) for a document in S3, one page or block at a time.
+
+    PDFs yield real 1-based page numbers; DOCX and TXT have no pages and yield
+    blocks of about `INGESTION_TEXT_BLOCK_CHARS` with a page number of None.
+    Objects are streamed from S3 and never held in memory whole.
+    """
     s3_service = S3Service()
-    
-    # Read S3 object body directly into memory
-    response = s3_service.get_object(s3_key)
-    file_bytes = response['Body'].read()
-    
-    # Process in memory using BytesIO
-    if file_type.lower() == 'pdf':
-        pdf_reader = PdfReader(io.BytesIO(file_bytes))
-        text = "\n".join([page.extract_text() for page in pdf_reader.pages])
-    elif file_type.lower() in ['docx', 'doc']:
-        doc = Document(io.BytesIO(file_bytes))
-        text = "\n".join([para.text for para in doc.paragraphs])
-    elif file_type.lower() == 'txt':
-        text = file_bytes.decode('utf-8')
+    file_type = file_type.lower()
+    
+    if file_type == 'pdf':
+        # PdfReader reads the file lazily, and worker processes can open it by name
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as tmp:
+            with instrumentation.stage('download'):
+                size = s3_service.download_to_file(s3_key, tmp)
+            instrumentation.record('download', bytes=size)
+            pdf_reader = PdfReader(tmp)
+            page_count = len(pdf_reader.pages)
+            workers = settings.PDF_EXTRACTION_WORKERS
+            if workers > 1 and page_count >= settings.PDF_PARALLEL_PAGE_THRESHOLD:
+                logger.info(f"[RAG] Extracting {page_count} PDF pages with {workers} worker processes")
+                yield from iter_pages_parallel(tmp.name, page_count, workers, settings.PDF_PAGES_PER_TASK)
+            else:
+                yield from iter_pages_sequential(pdf_reader)
+    elif file_type in ['docx', 'doc']:
+        with instrumentation.stage('download'):
+            spooled = s3_service.open_spooled(s3_key)
+        with spooled:
+            doc = Document(spooled)
+            block, block_len = [], 0
+            for para in doc.paragraphs:
+                block.append(para.text)
+                block_len += len(para.text) + 1
+                if block_len >= settings.INGESTION_TEXT_BLOCK_CHARS:
+                    yield None, "\n".join(block)
+                    block, block_len = [], 0
+            if block:
+                yield None, "\n".join(block)
+    elif file_type == 'txt':
+        # Decoded incrementally; at most one block of text is held at a time
+        yield from _iter_text_blocks(instrumentation.timed_iter('download', s3_service.iter_text(s3_key)))
     else:
         raise ValueError(f"Unsupported file type: {file_type}")
-    
-    return text
+
+
+def extract_text_from_s3(s3_key: str, file_type: str) -> str:
+    """Extract the full text of an S3 document as one string."""
+    return "\n".join(text for _, text in iter_pages_from_s3(s3_key, file_type))
 
 
 def extract_text_from_image(s3_key: str) -> Tuple[str, str]:
@@ -52,15 +102,6 @@ def extract_text_from_image(s3_key: str) -> Tuple[str, str]:
     
     s3_service = S3Service()
     
-    # Read image from S3
-    try:
-        response = s3_service.get_object(s3_key)
-        image_bytes = response['Body'].read()
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-    except Exception as e:
-        logger.error(f"Failed to read image from S3: {str(e)}")
-        return "[Image processing failed: Could not read file from storage]", 'image_vision_failed'
-    
     # Determine media type from file extension
     if s3_key.lower().endswith('.png'):
         media_type = 'image/png'
@@ -71,6 +112,28 @@ def extract_text_from_image(s3_key: str) -> Tuple[str, str]:
     else:
         media_type = 'image/jpeg'
     
+    # Stream image from S3 (spills to disk if large)
+    try:
+        with instrumentation.stage('download'):
+            image_file = s3_service.open_spooled(s3_key)
+    except Exception as e:
+        logger.error(f"Failed to read image from S3: {str(e)}")
+        return "[Image processing failed: Could not read file from storage]", 'image_vision_failed'
+    
+    with image_file:
+        instrumentation.record('download', bytes=image_file.seek(0, io.SEEK_END))
+        
+        # Same image already processed (re-run or duplicate upload): reuse the result
+        cache_key = image_processing.image_hash(image_file)
+        cached_text = image_processing.lookup_result(cache_key)
+        if cached_text is not None:
+            return cached_text, 'image_vision'
+        
+        # Downscale and re-encode before upload to keep the payload small
+        image_bytes, media_type = image_processing.preprocess_image(image_file, media_type)
+    image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+    del image_bytes
+    
     # Structured prompt for Markdown output
     prompt = """Analyze this image and extract all text, tables, and structural information.
 
@@ -140,6 +203,10 @@ If the image contains no text, describe the scene, objects, and context in struc
                         
                         if markdown_text and len(markdown_text) > 10:
                             logger.info(f"[Image] Successfully processed with {model_id}, extracted {len(markdown_text)} chars")
+                            try:
+                                image_processing.store_result(cache_key, markdown_text, model_id)
+                            except Exception as e:
+                                logger.warning(f"[Image] Could not cache vision result: {str(e)}")
                             return markdown_text, 'image_vision'
                         else:
                             logger.warning(f"[Image] {model_id} returned empty/short response, trying next model...")
@@ -170,325 +237,332 @@ If the image contains no text, describe the scene, objects, and context in struc
 
 
 def chunk_text(text: str, metadata: dict = None) -> List[dict]:
-    """Chunk text using recursive character splitting."""
-    chunk_size = settings.CHUNK_SIZE
-    chunk_overlap = settings.CHUNK_OVERLAP
-    
-    # Simple recursive text splitter implementation
-    if len(text) <= chunk_size:
-        chunks = [text]
-    else:
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            if end >= len(text):
-                chunks.append(text[start:])
-                break
-            
-            # Try to split at sentence boundary
-            chunk = text[start:end]
-            # Look for sentence endings
-            last_period = chunk.rfind('. ')
-            last_newline = chunk.rfind('\n\n')
-            split_point = max(last_period, last_newline)
-            
-            if split_point > chunk_size * 0.5:  # Only use if not too early
-                end = start + split_point + 1
-                chunk = text[start:end]
-            
-            chunks.append(chunk)
-            start = end - chunk_overlap  # Overlap for context
-    
-    # Handle edge cases: empty chunks, single-character chunks
+    """Chunk text on sentence and paragraph boundaries to a token budget.
+
+    Chunks hold up to `CHUNK_SIZE_TOKENS` tokens and overlap by up to `CHUNK_OVERLAP_TOKENS`.
+    """
     processed_chunks = []
-    for i, chunk in enumerate(chunks):
-        if not chunk or len(chunk.strip()) == 0:
-            # Merge with previous if exists
-            if processed_chunks:
-                processed_chunks[-1]['text'] += '\n' + chunk
-            continue
-        
-        if len(chunk.strip()) == 1 and processed_chunks:
-            # Merge single-character chunks with previous
-            processed_chunks[-1]['text'] += chunk
-            continue
-        
+    for i, (start, end, token_count) in enumerate(
+        iter_chunk_spans(text, settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+    ):
         chunk_meta = (metadata or {}).copy()
         chunk_meta['chunk_index'] = i
+        chunk_meta['token_count'] = token_count
         processed_chunks.append({
-            'text': chunk,
+            'text': text[start:end],
             'metadata': chunk_meta,
         })
     
     return processed_chunks
 
 
-def generate_embeddings(text_chunks: List[str], max_retries: int = 3) -> List[List[float]]:
-    """Generate embeddings using Amazon Nova 2 Multimodal Embeddings with retry logic."""
-    try:
-        bedrock_client = boto3.client('bedrock-runtime', region_name=settings.BEDROCK_REGION)
-    except Exception as e:
-        logger.error(f"Failed to initialize Bedrock client: {str(e)}")
-        raise ValueError("Bedrock is not configured. Please set up AWS Bedrock access.")
-    
-    # Nova 2 embedding dimension (1024 to match current VectorField setup)
-    embedding_dimension = getattr(settings, 'NOVA_EMBEDDING_DIMENSION', 1024)
+def generate_embeddings(
+    text_chunks: List[str],
+    max_retries: int = 3,
+    use_cache: bool = True,
+    allow_failures: bool = False,
+) -> List[List[float]]:
+    """Generate embeddings using Amazon Nova 2 Multimodal Embeddings with retry logic.
+
+    Cached embeddings are reused and only cache misses (deduplicated) go to Bedrock,
+    where they are embedded concurrently under a shared rate limit. The result keeps input order.
+    With `allow_failures`, chunks that keep failing come back as None instead of raising.
+    """
+    embedding_dimension = settings.EMBEDDING_DIMENSION  # Must match the VectorField
+    
+    hashes = [embedding_cache.text_hash(text) for text in text_chunks]
+    cached = {}
+    if use_cache:
+        try:
+            cached = embedding_cache.lookup(hashes, NOVA_EMBEDDING_MODEL_ID, embedding_dimension)
+        except Exception as e:
+            logger.warning(f"[RAG] Embedding cache lookup failed, embedding everything: {str(e)}")
     
-    all_embeddings = []
+    # Embed each distinct uncached text once
+    missing = {}
+    for key, text in zip(hashes, text_chunks):
+        if key not in cached and key not in missing:
+            missing[key] = text
     
-    # Process each chunk individually
-    for text_chunk in text_chunks:
-        # Retry logic with exponential backoff
-        for attempt in range(max_retries):
+    if missing:
+        try:
+            bedrock_client = get_client('bedrock-runtime', region=settings.BEDROCK_REGION)
+        except Exception as e:
+            logger.error(f"Failed to initialize Bedrock client: {str(e)}")
+            raise ValueError("Bedrock is not configured. Please set up AWS Bedrock access.")
+        
+        try:
+            new_embeddings = embed_texts(
+                bedrock_client, list(missing.values()), embedding_dimension,
+                max_retries=max_retries, allow_failures=allow_failures,
+            )
+        except Exception as e:
+            logger.error(f"Embedding generation failed after {max_retries} attempts: {str(e)}")
+            raise
+        
+        fresh = dict(zip(missing.keys(), new_embeddings))
+        if use_cache:
             try:
-                # Nova 2 Multimodal Embeddings API format
-                request_body = {
-                    'taskType': 'SINGLE_EMBEDDING',
-                    'singleEmbeddingParams': {
-                        'embeddingPurpose': 'GENERIC_INDEX',
-                        'embeddingDimension': embedding_dimension,
-                        'text': {
-                            'truncationMode': 'END',
-                            'value': text_chunk
-                        }
-                    }
-                }
-                
-                response = bedrock_client.invoke_model(
-                    modelId="amazon.nova-2-multimodal-embeddings-v1:0",
-                    body=json.dumps(request_body),
-                    contentType='application/json'
+                embedding_cache.store(
+                    [(key, embedding) for key, embedding in fresh.items() if embedding is not None],
+                    NOVA_EMBEDDING_MODEL_ID, embedding_dimension,
                 )
-                
-                result = json.loads(response['body'].read())
-                
-                # Nova 2 returns embedding in nested structure: {'embeddings': [{'embeddingType': 'TEXT', 'embedding': [...]}]}
-                if 'embeddings' in result and len(result['embeddings']) > 0:
-                    embedding_obj = result['embeddings'][0]
-                    if 'embedding' in embedding_obj:
-                        embedding = embedding_obj['embedding']
-                        all_embeddings.append(embedding)
-                        logger.debug(f"[RAG] Generated embedding: {len(embedding)} dimensions")
-                        break  # Success, exit retry loop
-                    else:
-                        raise ValueError("No 'embedding' field in embeddings array item")
-                elif 'embedding' in result:
-                    # Direct embedding field (fallback)
-                    embedding = result['embedding']
-                    all_embeddings.append(embedding)
-                    logger.debug(f"[RAG] Generated embedding: {len(embedding)} dimensions")
-                    break  # Success, exit retry loop
-                else:
-                    logger.error(f"[RAG] Unexpected response format: {list(result.keys())}")
-                    raise ValueError(f"No embedding in response. Response keys: {list(result.keys())}")
-                
             except Exception as e:
-                if attempt == max_retries - 1:
-                    # All retries failed
-                    logger.error(f"Embedding generation failed after {max_retries} attempts: {str(e)}")
-                    raise
-                else:
-                    # Exponential backoff
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Embedding attempt {attempt + 1} failed, retrying in {wait_time}s: {str(e)}")
-                    time.sleep(wait_time)
-    
-    logger.info(f"[RAG] Generated {len(all_embeddings)} embeddings using Nova 2")
+                logger.warning(f"[RAG] Failed to store embeddings in cache: {str(e)}")
+        cached.update(fresh)
+    
+    all_embeddings = [cached[key] for key in hashes]
+    instrumentation.record(
+        'embed',
+        chunks=len(all_embeddings),
+        bedrock_requests=len(missing),
+        cache_hits=len(all_embeddings) - len(missing),
+        failures=sum(1 for embedding in all_embeddings if embedding is None),
+    )
+    logger.info(
+        f"[RAG] Generated {len(all_embeddings)} embeddings using Nova 2 "
+        f"({len(missing)} from Bedrock, {len(all_embeddings) - len(missing)} from cache)"
+    )
     return all_embeddings
 
 
-def retrieve_chunks(query_embedding: List[float], user_id: int, file_ids: Optional[List[int]] = None, top_k: int = None) -> List[dict]:
-    """Retrieve relevant chunks using vector similarity search."""
-    import json
+# Columns a retrieval result needs; the filename comes from a join in the same query
+RETRIEVAL_FIELDS = ('id', 'chunk_text', 'file_id', 'file__filename', 'page_number', 'chunk_index', 'metadata')
+
+
+class RetrievedChunk:
+    """One retrieval result, built from a `RETRIEVAL_FIELDS` row.
+    
+    `similarity` is the cosine similarity to the query embedding and
+    `keyword_score` the lexical rank (ts_rank_cd or BM25); each is None when the
+    chunk was not found by that retriever. `fusion_score` is set by hybrid retrieval.
+    """
+    __slots__ = (
+        'chunk_id', 'text', 'file_id', 'filename', 'page_number', 'chunk_index',
+        'similarity', 'keyword_score', 'fusion_score', 'metadata',
+    )
+    
+    def __init__(self, row: tuple, similarity: Optional[float] = None, keyword_score: Optional[float] = None):
+        self.chunk_id, self.text, self.file_id, self.filename, self.page_number, self.chunk_index, metadata = row[:7]
+        # Rows read through a raw cursor carry jsonb as text
+        self.metadata = json.loads(metadata) if isinstance(metadata, str) else metadata
+        self.similarity = similarity
+        self.keyword_score = keyword_score
+        self.fusion_score = None
+    
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _score_all_chunks(query, query_embedding: List[float], top_k: int) -> List[Tuple[int, float]]:
+    """(chunk id, cosine similarity) of the best chunks in `query`, scored in memory (used if the matrix cache fails)."""
     import numpy as np
-    from django.conf import settings
     
-    top_k = top_k or settings.TOP_K_CHUNKS
-    
-    # Build query with user_id filter (mandatory)
-    query = DocumentChunk.objects.filter(user_id=user_id)
-    
-    if file_ids:
-        query = query.filter(file_id__in=file_ids)
-    
-    # Check if using PostgreSQL with pgvector
-    use_pgvector = settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    query_vec = np.asarray(query_embedding, dtype=np.float32)
+    chunk_ids, vectors = [], []
+    for chunk_id, embedding in query.values_list('id', 'embedding').iterator():
+        chunk_vec = np.asarray(embedding, dtype=np.float32)
+        if chunk_vec.shape != query_vec.shape:
+            logger.warning(f"[RAG] Skipping chunk {chunk_id}: embedding shape {chunk_vec.shape} != {query_vec.shape}")
+            continue
+        chunk_ids.append(chunk_id)
+        vectors.append(chunk_vec)
+    logger.info(f"[RAG] Calculated similarity for {len(chunk_ids)} chunks in memory")
+    if not vectors:
+        return []
     
-    if use_pgvector:
-        # Use pgvector for PostgreSQL
+    matrix = np.vstack(vectors)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vec)
+    dots = matrix @ query_vec
+    scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+    best = np.argsort(-scores)[:top_k]
+    return [(chunk_ids[index], float(scores[index])) for index in best]
+
+
+def _pgvector_search(query, query_embedding: List[float], top_k: int) -> List[RetrievedChunk]:
+    """ANN index query (one round trip), with exact-scan fallback when the user/file filters leave too few rows."""
+    if not isinstance(query_embedding, list):
+        query_embedding = list(query_embedding)  # pgvector expects a list
+    rows = vector_search.nearest_chunks(query, query_embedding, top_k, RETRIEVAL_FIELDS)
+    return [RetrievedChunk(row, max(0.0, 1 - float(row[-1]))) for row in rows]
+
+
+def _matrix_search(query, query_embedding: List[float], user_id: int, file_ids, top_k: int) -> List[RetrievedChunk]:
+    """Search the cached per-user embedding matrix, then fetch only the winning rows."""
+    try:
+        hits = matrix_cache.search(user_id, query_embedding, top_k, file_ids)
+    except Exception as e:
+        logger.error(f"[RAG] Embedding matrix search failed: {str(e)}", exc_info=True)
+        hits = _score_all_chunks(query, query_embedding, top_k)
+    rows = {row[0]: row for row in query.filter(id__in=[chunk_id for chunk_id, _ in hits]).values_list(*RETRIEVAL_FIELDS)}
+    return [RetrievedChunk(rows[chunk_id], score) for chunk_id, score in hits if chunk_id in rows]
+
+
+def _full_text_search(query, query_text: str, limit: int) -> List[RetrievedChunk]:
+    """Rank chunks by `ts_rank_cd` on the generated `search_vector` column (GIN-indexed, migration 0013).
+    
+    Query lexemes are ORed, like BM25, so a chunk matching any of them is a
+    candidate and chunks matching more of them rank higher.
+    """
+    from django.db.models import BooleanField, FloatField
+    from django.db.models.expressions import RawSQL
+    
+    # plainto_tsquery ANDs the lexemes as 'a' & 'b'; lexemes never contain spaces
+    ts_query = "replace(plainto_tsquery(%s::regconfig, %s)::text, ' & ', ' | ')::tsquery"
+    params = [settings.SEARCH_TEXT_CONFIG, query_text]
+    column = '"rag_documentchunk"."search_vector"'
+    rows = (
+        query.alias(matched=RawSQL(f"{column} @@ {ts_query}", params, output_field=BooleanField()))
+        .filter(matched=True)
+        .annotate(rank=RawSQL(f"ts_rank_cd({column}, {ts_query})", params, output_field=FloatField()))
+        .order_by('-rank')
+        .values_list(*RETRIEVAL_FIELDS, 'rank')[:limit]
+    )
+    return [RetrievedChunk(row, keyword_score=float(row[-1])) for row in rows]
+
+
+def _substring_search(query, query_text: str, limit: int) -> List[RetrievedChunk]:
+    """Score chunks by the share of query words (longer than 2 characters) they contain (used if the BM25 index fails)."""
+    query_words = [word for word in query_text.lower().split() if len(word) > 2]
+    if not query_words:
+        return []
+    matches = []
+    for row in query.values_list(*RETRIEVAL_FIELDS).iterator():
+        text = row[1].lower()
+        score = sum(1 for word in query_words if word in text) / len(query_words)
+        if score > 0:
+            matches.append((score, row))
+    matches.sort(key=lambda match: match[0], reverse=True)
+    return [RetrievedChunk(row, keyword_score=score) for score, row in matches[:limit]]
+
+
+def _uses_full_text() -> bool:
+    return settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+
+
+def _bm25_search(query, query_text: str, user_id: int, file_ids, limit: int) -> List[RetrievedChunk]:
+    """Search the per-user BM25 index, then fetch only the winning rows."""
+    try:
+        hits = lexical_index.search(user_id, query_text, limit, file_ids)
+    except Exception as e:
+        logger.error(f"[RAG] BM25 index search failed: {str(e)}", exc_info=True)
+        return _substring_search(query, query_text, limit)
+    rows = {row[0]: row for row in query.filter(id__in=[chunk_id for chunk_id, _ in hits]).values_list(*RETRIEVAL_FIELDS)}
+    return [RetrievedChunk(rows[chunk_id], keyword_score=score) for chunk_id, score in hits if chunk_id in rows]
+
+
+def _keyword_candidates(query, query_text: str, user_id: int, file_ids, limit: int) -> List[RetrievedChunk]:
+    if _uses_full_text():
+        return _full_text_search(query, query_text, limit)
+    return _bm25_search(query, query_text, user_id, file_ids, limit)
+
+
+def _vector_candidates(query, query_embedding: List[float], user_id: int, file_ids, limit: int) -> List[RetrievedChunk]:
+    if settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
         try:
-            from pgvector.django import CosineDistance
-            logger.info(f"[RAG] Using pgvector for PostgreSQL, query_embedding type: {type(query_embedding)}, length: {len(query_embedding) if query_embedding else 0}")
-            
-            # Ensure query_embedding is a list (pgvector expects list)
-            if not isinstance(query_embedding, list):
-                query_embedding = list(query_embedding)
-            
-            # Execute pgvector query
-            chunks = query.annotate(
-                distance=CosineDistance('embedding', query_embedding)
-            ).order_by('distance')[:top_k]
-            
-            # Convert to list to evaluate query
-            chunks_list = list(chunks)
-            logger.info(f"[RAG] pgvector query returned {len(chunks_list)} chunks")
-            
-            results = []
-            for chunk in chunks_list:
-                try:
-                    distance = float(chunk.distance)
-                    similarity = max(0, 1 - distance)
-                    
-                    if similarity >= settings.SIMILARITY_THRESHOLD:
-                        results.append({
-                            'chunk_id': chunk.id,
-                            'text': chunk.chunk_text,
-                            'file_id': chunk.file_id,
-                            'filename': chunk.file.filename,
-                            'page_number': chunk.page_number,
-                            'chunk_index': chunk.chunk_index,
-                            'similarity': similarity,
-                            'metadata': chunk.metadata,
-                        })
-                except Exception as e:
-                    logger.warning(f"[RAG] Error processing chunk {chunk.id}: {str(e)}", exc_info=True)
-                    continue
-            
-            # RELIABLE FALLBACK: If no chunks above threshold, return top chunks anyway
-            if not results and chunks_list:
-                logger.info(
-                    f"[RAG] No chunks above threshold ({settings.SIMILARITY_THRESHOLD}) with pgvector, "
-                    f"but returning top {len(chunks_list)} chunks anyway (fallback mode)"
-                )
-                for chunk in chunks_list:
-                    try:
-                        distance = float(chunk.distance)
-                        similarity = max(0, 1 - distance)
-                        results.append({
-                            'chunk_id': chunk.id,
-                            'text': chunk.chunk_text,
-                            'file_id': chunk.file_id,
-                            'filename': chunk.file.filename,
-                            'page_number': chunk.page_number,
-                            'chunk_index': chunk.chunk_index,
-                            'similarity': similarity,
-                            'metadata': chunk.metadata,
-                        })
-                    except Exception as e:
-                        logger.warning(f"[RAG] Error processing chunk in fallback: {str(e)}")
-                        continue
-            
-            logger.info(f"[RAG] Returning {len(results)} chunks from pgvector search")
-            return results
+            candidates = _pgvector_search(query, query_embedding, limit)
+            logger.info(f"[RAG] pgvector query returned {len(candidates)} chunks")
+            return candidates
         except Exception as e:
             logger.error(f"[RAG] pgvector search failed: {str(e)}", exc_info=True)
             logger.warning(f"[RAG] Falling back to Python similarity calculation")
+    # Cached per-user embedding matrix (SQLite, or when the pgvector query fails)
+    return _matrix_search(query, query_embedding, user_id, file_ids, limit)
+
+
+def reciprocal_rank_fusion(ranked_lists: List[Tuple[List[RetrievedChunk], float]], k: int) -> List[RetrievedChunk]:
+    """Merge ranked lists by weighted reciprocal rank: score = sum(weight / (k + rank)).
+    
+    Each fused chunk gets its score in `fusion_score`, and keeps the
+    `similarity` and `keyword_score` of every list it appeared in.
+    """
+    fused = {}
+    for ranked, weight in ranked_lists:
+        for rank, chunk in enumerate(ranked, start=1):
+            entry = fused.setdefault(chunk.chunk_id, chunk)
+            if entry is not chunk:
+                entry.similarity = entry.similarity if chunk.similarity is None else chunk.similarity
+                entry.keyword_score = entry.keyword_score if chunk.keyword_score is None else chunk.keyword_score
+            entry.fusion_score = (entry.fusion_score or 0.0) + weight / (k + rank)
+    return sorted(fused.values(), key=lambda chunk: chunk.fusion_score, reverse=True)
+
+
+def keyword_search(query_text: str, user_id: int, file_ids: Optional[List[int]] = None, top_k: int = None) -> List[dict]:
+    """Lexical retrieval (PostgreSQL full-text search, the BM25 index elsewhere); used without an embedding."""
+    query = DocumentChunk.objects.filter(user_id=user_id)
+    if file_ids:
+        query = query.filter(file_id__in=file_ids)
+    return [chunk.as_dict() for chunk in _keyword_candidates(query, query_text, user_id, file_ids, top_k or settings.TOP_K_CHUNKS)]
+
+
+def retrieve_chunks(
+    query_embedding: List[float],
+    user_id: int,
+    file_ids: Optional[List[int]] = None,
+    top_k: int = None,
+    query_text: Optional[str] = None,
+) -> List[dict]:
+    """Retrieve relevant chunks using vector similarity search.
+    
+    Returns the top_k chunks above SIMILARITY_THRESHOLD, or the top_k chunks
+    regardless of score when none pass it, best first.
+    
+    With RETRIEVAL_MODE='hybrid' and `query_text`, vector candidates below
+    SIMILARITY_THRESHOLD are dropped and the rest are merged with keyword
+    candidates by reciprocal-rank fusion, ordered by `fusion_score`. The same
+    fallback applies when neither retriever leaves any candidates.
+    """
+    top_k = top_k or settings.TOP_K_CHUNKS
     
-    # Fallback: Python-based cosine similarity for SQLite
-    all_chunks = list(query.all())
-    logger.info(f"[RAG] Retrieved {len(all_chunks)} total chunks from database for user {user_id}, file_ids: {file_ids}")
+    # Build query with user_id filter (mandatory); chunks whose embedding failed can't be ranked
+    query = DocumentChunk.objects.filter(user_id=user_id, embedding_status='embedded')
+    if file_ids:
+        query = query.filter(file_id__in=file_ids)
     
-    if not all_chunks:
+    if query_text and settings.RETRIEVAL_MODE == 'hybrid':
+        limit = max(top_k, settings.HYBRID_CANDIDATES)
+        candidates = _vector_candidates(query, query_embedding, user_id, file_ids, limit)
+        vector_hits = [chunk for chunk in candidates if chunk.similarity >= settings.SIMILARITY_THRESHOLD]
+        keyword_hits = _keyword_candidates(query, query_text, user_id, file_ids, limit)
+        results = reciprocal_rank_fusion(
+            [(vector_hits, settings.HYBRID_VECTOR_WEIGHT), (keyword_hits, settings.HYBRID_KEYWORD_WEIGHT)],
+            settings.HYBRID_RRF_K,
+        )[:top_k]
+        if not results and candidates:
+            logger.info(f"[RAG] No hybrid candidates above threshold ({settings.SIMILARITY_THRESHOLD}), returning top vector chunks (fallback mode)")
+            results = candidates[:top_k]
+        logger.info(
+            f"[RAG] Hybrid retrieval: {len(vector_hits)} of {len(candidates)} vector candidates above threshold "
+            f"and {len(keyword_hits)} keyword candidates, returning {len(results)} chunks for user {user_id}"
+        )
+        return [chunk.as_dict() for chunk in results]
+    
+    candidates = _vector_candidates(query, query_embedding, user_id, file_ids, top_k)
+    if not candidates:
         logger.warning(f"[RAG] No chunks found in database for user {user_id}, file_ids: {file_ids}")
         return []
     
-    # Calculate cosine similarity for each chunk
-    query_vec = np.array(query_embedding)
-    similarities = []
-    
-    logger.info(f"[RAG] Calculating similarity for {len(all_chunks)} chunks...")
-    for chunk in all_chunks:
-        try:
-            # Parse embedding from TextField (stored as JSON string)
-            if isinstance(chunk.embedding, str):
-                chunk_embedding = json.loads(chunk.embedding)
-            else:
-                chunk_embedding = chunk.embedding
-            
-            chunk_vec = np.array(chunk_embedding)
-            
-            # Cosine similarity
-            dot_product = np.dot(query_vec, chunk_vec)
-            norm_query = np.linalg.norm(query_vec)
-            norm_chunk = np.linalg.norm(chunk_vec)
-            
-            if norm_query > 0 and norm_chunk > 0:
-                similarity = dot_product / (norm_query * norm_chunk)
-            else:
-                similarity = 0.0
-            
-            similarities.append({
-                'chunk': chunk,
-                'similarity': float(similarity)
-            })
-        except Exception as e:
-            logger.warning(f"[RAG] Error calculating similarity for chunk {chunk.id}: {str(e)}", exc_info=True)
-            continue
-    
-    # Sort by similarity and filter by threshold
-    similarities.sort(key=lambda x: x['similarity'], reverse=True)
-    
-    if similarities:
-        top_scores = [f"{s['similarity']:.3f}" for s in similarities[:5]]
-        logger.info(f"[RAG] Top similarity scores: {top_scores}")
-    
-    # Build results with threshold filtering
-    results = []
-    for item in similarities[:top_k]:
-        if item['similarity'] >= settings.SIMILARITY_THRESHOLD:
-            chunk = item['chunk']
-            results.append({
-                'chunk_id': chunk.id,
-                'text': chunk.chunk_text,
-                'file_id': chunk.file_id,
-                'filename': chunk.file.filename,
-                'page_number': chunk.page_number,
-                'chunk_index': chunk.chunk_index,
-                'similarity': item['similarity'],
-                'metadata': chunk.metadata,
-            })
-    
-    # RELIABLE FALLBACK: If no chunks above threshold, return top chunks anyway
-    # This ensures we always return something if chunks exist
-    if not results and similarities:
+    candidates = candidates[:top_k]
+    logger.info(f"[RAG] Top similarity scores: {[f'{chunk.similarity:.3f}' for chunk in candidates]}")
+    results = [chunk for chunk in candidates if chunk.similarity >= settings.SIMILARITY_THRESHOLD]
+    if not results:
+        # RELIABLE FALLBACK: always return something if chunks exist
         logger.info(
             f"[RAG] No chunks above threshold ({settings.SIMILARITY_THRESHOLD}), "
-            f"but returning top {min(top_k, len(similarities))} chunks anyway (fallback mode). "
-            f"Top similarity: {similarities[0]['similarity']:.3f}"
+            f"returning top {len(candidates)} chunks anyway (fallback mode)"
         )
-        # Return top chunks regardless of threshold
-        for item in similarities[:top_k]:
-            chunk = item['chunk']
-            results.append({
-                'chunk_id': chunk.id,
-                'text': chunk.chunk_text,
-                'file_id': chunk.file_id,
-                'filename': chunk.file.filename,
-                'page_number': chunk.page_number,
-                'chunk_index': chunk.chunk_index,
-                'similarity': item['similarity'],
-                'metadata': chunk.metadata,
-            })
+        results = candidates
     
-    if not results:
-        top_similarity = similarities[0]['similarity'] if similarities else 0.0
-        logger.warning(
-            f"[RAG] No chunks found for user {user_id}, file_ids: {file_ids}. "
-            f"Total chunks checked: {len(all_chunks)}, Top similarity: {top_similarity:.3f}"
-        )
-    else:
-        logger.info(f"[RAG] Returning {len(results)} chunks for user {user_id} (threshold: {settings.SIMILARITY_THRESHOLD})")
-        similarity_scores = [f"{r['similarity']:.3f}" for r in results]
-        logger.debug(f"[RAG] Similarity scores: {similarity_scores}")
-    
-    return results
+    logger.info(f"[RAG] Returning {len(results)} chunks for user {user_id} (threshold: {settings.SIMILARITY_THRESHOLD})")
+    return [chunk.as_dict() for chunk in results]
 
 
 def delete_vectors(file_id: int, user_id: int):
     """Delete all vectors associated with a file."""
     try:
         deleted_count = DocumentChunk.objects.filter(file_id=file_id, user_id=user_id).delete()[0]
+        matrix_cache.invalidate(user_id)
+        lexical_index.remove_file(user_id, file_id)
         logger.info(f"Deleted {deleted_count} chunks for file {file_id}")
         return deleted_count
     except Exception as e:
@@ -496,113 +570,305 @@ def delete_vectors(file_id: int, user_id: int):
         raise
 
 
-def ingest_file_async(file_id: int, retry_failed: bool = False):
-    """Async file ingestion - process file and create chunks."""
+def compute_content_hash(file_asset: FileAsset) -> str:
+    """Identify file content by its S3 ETag, without downloading the object.
+
+    Uploads use a single presigned POST, so the ETag is the MD5 of the content.
+    """
+    response = S3Service().head_object(file_asset.s3_key)
+    return response['ETag'].strip('"')
+
+
+def find_duplicate_file(file_asset: FileAsset) -> Optional[FileAsset]:
+    """Find another fully ingested file of the same user with identical content."""
+    if not file_asset.content_hash:
+        return None
+    return FileAsset.objects.filter(
+        user_id=file_asset.user_id,
+        content_hash=file_asset.content_hash,
+        size=file_asset.size,
+        status='ready',
+        ingestion_status='complete',
+    ).exclude(id=file_asset.id).order_by('uploaded_at').first()
+
+
+def clone_file_chunks(source_file_id: int, target_file_id: int) -> int:
+    """Copy every chunk of one file to another with a single INSERT ... SELECT."""
     from django.db import connection
+    from django.utils import timezone
+    
+    table = connection.ops.quote_name(DocumentChunk._meta.db_table)
+    columns, select, params = [], [], []
+    for field in DocumentChunk._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+        if field.name == 'file':
+            select.append('%s')
+            params.append(target_file_id)
+        elif field.name == 'created_at':
+            select.append('%s')
+            params.append(connection.ops.adapt_datetimefield_value(timezone.now()))
+        else:
+            select.append(connection.ops.quote_name(field.column))
+    params.append(source_file_id)
+    file_column = connection.ops.quote_name(DocumentChunk._meta.get_field('file').column)
+    
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT {', '.join(select)} FROM {table} WHERE {file_column} = %s"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _embedding_db_value(embedding: List[float]):
+    """Convert an embedding to the storage format of the active database backend."""
+    # pgvector's VectorField takes a list; the SQLite float32 field packs it to bytes on save
+    return [float(x) for x in embedding]  # Ensure all are floats
+
+
+def _chunking_signature() -> str:
+    """Chunking parameters a checkpoint was taken with; resuming under others would misalign chunks."""
+    return f"{TOKENIZER_NAME}:{settings.CHUNK_SIZE_TOKENS}:{settings.CHUNK_OVERLAP_TOKENS}"
+
+
+class IngestionCancelled(Exception):
+    """Raised between ingestion windows once the caller set the `cancelled` event."""
+
+
+def _check_cancelled(cancelled: Optional[threading.Event], file_id: int):
+    if cancelled is not None and cancelled.is_set():
+        raise IngestionCancelled(f"Ingestion of file {file_id} was cancelled")
+
+
+def _write_chunk_window(
+    file_asset: FileAsset,
+    window: List[dict],
+    first_index: int,
+    extraction_method: str,
+    pages_extracted: Optional[int] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> int:
+    """Embed one window of chunks and commit it together with the ingestion checkpoint.
+
+    Chunks whose embedding fails are stored with status `failed` so a retry only redoes them.
+    The commit also records `ingestion_progress`, which the file event stream reports.
+    Returns the number of chunks embedded.
+    """
+    with instrumentation.stage('embed'):
+        embeddings = generate_embeddings([chunk['text'] for chunk in window], allow_failures=True)
+    _check_cancelled(cancelled, file_asset.id)
+    
+    if len(embeddings) != len(window):
+        raise ValueError(f"Embedding count mismatch: {len(embeddings)} != {len(window)}")
+    
+    chunks_to_create = []
+    for offset, (chunk_data, embedding) in enumerate(zip(window, embeddings)):
+        chunk_index = first_index + offset
+        chunk_data['metadata']['chunk_index'] = chunk_index
+        chunks_to_create.append(DocumentChunk(
+            user_id=file_asset.user_id,
+            file=file_asset,
+            chunk_text=chunk_data['text'],
+            embedding=_embedding_db_value(embedding) if embedding is not None else None,
+            embedding_status='embedded' if embedding is not None else 'failed',
+            metadata=chunk_data['metadata'],
+            page_number=chunk_data['metadata'].get('page_number'),
+            token_count=chunk_data['metadata'].get('token_count'),
+            chunk_index=chunk_index,
+            extraction_method=extraction_method,
+        ))
+    
+    file_asset.metadata['ingestion_checkpoint'] = {
+        'next_chunk_index': first_index + len(window),
+        'chunking': _chunking_signature(),
+    }
+    file_asset.metadata['ingestion_progress'] = {
+        'chunks_committed': first_index + len(window),
+        'pages_extracted': pages_extracted,
+    }
+    with instrumentation.stage('store'), transaction.atomic():
+        bulk_insert_chunks(chunks_to_create)
+        file_asset.save(update_fields=['metadata', 'updated_at'])
+    instrumentation.record('store', rows=len(chunks_to_create))
+    return sum(1 for embedding in embeddings if embedding is not None)
+
+
+def reembed_failed_chunks(file_asset: FileAsset, cancelled: Optional[threading.Event] = None) -> int:
+    """Re-embed only the file's failed or pending chunks. Returns how many now succeeded."""
+    window_size = settings.INGESTION_WINDOW_SIZE
+    chunk_ids = list(
+        DocumentChunk.objects.filter(file=file_asset, embedding_status__in=['failed', 'pending'])
+        .order_by('chunk_index').values_list('id', flat=True)
+    )
+    recovered = 0
+    for start in range(0, len(chunk_ids), window_size):
+        window = list(DocumentChunk.objects.filter(id__in=chunk_ids[start:start + window_size]).only('id', 'chunk_text'))
+        DocumentChunk.objects.filter(id__in=[chunk.id for chunk in window]).update(embedding_status='pending')
+        with instrumentation.stage('embed'):
+            embeddings = generate_embeddings([chunk.chunk_text for chunk in window], allow_failures=True)
+        _check_cancelled(cancelled, file_asset.id)
+        with instrumentation.stage('store'), transaction.atomic():
+            for chunk, embedding in zip(window, embeddings):
+                if embedding is None:
+                    DocumentChunk.objects.filter(id=chunk.id).update(embedding_status='failed')
+                else:
+                    DocumentChunk.objects.filter(id=chunk.id).update(
+                        embedding=_embedding_db_value(embedding), embedding_status='embedded'
+                    )
+                    recovered += 1
+    logger.info(f"File {file_asset.id}: re-embedded {recovered} of {len(chunk_ids)} failed chunks")
+    return recovered
+
+
+def _finish_ingestion(file_asset: FileAsset):
+    """Set the file status from its per-chunk embedding state."""
+    from django.db.models import Count, Q
+    
+    counts = DocumentChunk.objects.filter(file=file_asset).aggregate(
+        succeeded=Count('id', filter=Q(embedding_status='embedded')),
+        failed=Count('id', filter=~Q(embedding_status='embedded')),
+    )
+    succeeded, failed = counts['succeeded'], counts['failed']
+    
+    if succeeded == 0 and failed == 0:
+        raise ValueError("No text extracted from file")
+    if succeeded == 0:
+        # Raise so the job queue retries; the next run only redoes failed chunks
+        raise ValueError(f"All {failed} chunks failed to embed")
+    
+    file_asset.ingestion_status = 'partial' if failed else 'complete'
+    file_asset.status = 'ready'
+    file_asset.metadata['chunks_succeeded'] = succeeded
+    file_asset.metadata['chunks_failed'] = failed
+    file_asset.metadata.pop('ingestion_checkpoint', None)
+    file_asset.metadata.pop('ingestion_progress', None)
+    file_asset.metadata.pop('error', None)
+    file_asset.save()
+    matrix_cache.invalidate(file_asset.user_id)
+    try:
+        lexical_index.add_file(file_asset.user_id, file_asset.id)
+    except Exception as e:
+        # Keyword search falls back to substring matching; the next rebuild picks the file up
+        logger.warning(f"Could not update the BM25 index for file {file_asset.id}: {str(e)}")
     
+    logger.info(f"File {file_asset.id} ingestion completed: {succeeded} succeeded, {failed} failed")
+
+
+def ingest_file_async(file_id: int, retry_failed: bool = False, cancelled: Optional[threading.Event] = None):
+    """Async file ingestion - stream pages through chunking, embedding and storage.
+
+    Pages are chunked as they are extracted and embedded and committed in windows of
+    `INGESTION_WINDOW_SIZE` chunks, so memory use doesn't grow with the document size.
+    Each window commits a checkpoint: a restarted run re-embeds failed chunks and resumes
+    after the last committed chunk. `retry_failed` only re-embeds failed chunks.
+    Once `cancelled` is set, the next commit raises `IngestionCancelled` instead and
+    the file is left to whoever cancelled the run.
+    Per-stage timings are stored in `metadata['ingestion_timings']`.
+    """
     file_asset = FileAsset.objects.get(id=file_id)
+    timer = instrumentation.IngestionTimer()
     
+    def save_timings(mode):
+        file_asset.metadata['ingestion_timings'] = dict(timer.summary(), mode=mode)
+    
+    mode = 'retry_failed' if retry_failed else 'full'
+    instrumentation.activate(timer)
     try:
         file_asset.ingestion_status = 'in_progress'
         file_asset.status = 'processing'
         file_asset.save()
         
-        # Delete existing chunks if retrying
         if retry_failed:
+            reembed_failed_chunks(file_asset, cancelled)
+            save_timings(mode)
+            _check_cancelled(cancelled, file_id)
+            _finish_ingestion(file_asset)
+            return
+        
+        checkpoint = file_asset.metadata.get('ingestion_checkpoint')
+        if checkpoint and checkpoint.get('chunking') == _chunking_signature():
+            mode = 'resume'
+            resume_from = checkpoint['next_chunk_index']
+            logger.info(f"File {file_id}: resuming ingestion at chunk {resume_from}")
+            reembed_failed_chunks(file_asset, cancelled)
+        else:
+            resume_from = 0
+            _check_cancelled(cancelled, file_id)
             DocumentChunk.objects.filter(file_id=file_id).delete()
+            
+            # Identical content already ingested for this user: clone its chunks instead
+            if not file_asset.content_hash:
+                try:
+                    file_asset.content_hash = compute_content_hash(file_asset)
+                    file_asset.save(update_fields=['content_hash'])
+                except Exception as e:
+                    logger.warning(f"Could not compute content hash for file {file_id}: {str(e)}")
+            with instrumentation.stage('clone'):
+                duplicate = find_duplicate_file(file_asset)
+                cloned = clone_file_chunks(duplicate.id, file_asset.id) if duplicate else 0
+            if cloned:
+                mode = 'clone'
+                instrumentation.record('clone', rows=cloned)
+                file_asset.metadata['deduplicated_from'] = duplicate.id
+                logger.info(f"File {file_id} is a duplicate of file {duplicate.id}: cloned {cloned} chunks")
+                save_timings(mode)
+                _check_cancelled(cancelled, file_id)
+                _finish_ingestion(file_asset)
+                return
         
         # Extract text based on file type
         if file_asset.file_type.lower() in ['png', 'jpeg', 'jpg']:
-            text, extraction_method = extract_text_from_image(file_asset.s3_key)
-            page_number = None
+            with instrumentation.stage('extract'):
+                text, extraction_method = extract_text_from_image(file_asset.s3_key)
+            pages = iter([(None, text)])
         else:
-            text = extract_text_from_s3(file_asset.s3_key, file_asset.file_type)
+            pages = instrumentation.timed_iter('extract', iter_pages_from_s3(file_asset.s3_key, file_asset.file_type))
             extraction_method = file_asset.file_type.lower()
-            page_number = None  # Could be extracted from PDF metadata
-        
-        if not text or len(text.strip()) == 0:
-            raise ValueError("No text extracted from file")
-        
-        # Chunk text
-        chunks_data = chunk_text(text, metadata={'page_number': page_number})
         
-        if not chunks_data:
-            raise ValueError("No chunks created from text")
+        window_size = settings.INGESTION_WINDOW_SIZE
+        window = []
+        next_index = 0  # Index of the next chunk produced, including skipped ones
+        pages_extracted = 0
         
-        # Generate embeddings
-        text_chunks = [chunk['text'] for chunk in chunks_data]
-        embeddings = generate_embeddings(text_chunks)
-        
-        if len(embeddings) != len(chunks_data):
-            raise ValueError(f"Embedding count mismatch: {len(embeddings)} != {len(chunks_data)}")
-        
-        # Store chunks in database
-        chunks_to_create = []
-        succeeded = 0
-        failed = 0
-        
-        # Check database backend for embedding storage format
-        use_sqlite = settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3'
-        use_postgresql = settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
-        
-        logger.info(f"[RAG] Storing embeddings: SQLite={use_sqlite}, PostgreSQL={use_postgresql}")
-        
-        for i, (chunk_data, embedding) in enumerate(zip(chunks_data, embeddings)):
-            try:
-                # For SQLite, store embedding as JSON string
-                # For PostgreSQL with pgvector, store as list (VectorField handles it)
-                if use_sqlite:
-                    embedding_value = json.dumps(embedding)
-                else:
-                    # PostgreSQL: VectorField accepts list directly
-                    # Ensure it's a list of floats
-                    if not isinstance(embedding, list):
-                        embedding = list(embedding)
-                    embedding_value = [float(x) for x in embedding]  # Ensure all are floats
-                
-                chunk = DocumentChunk(
-                    user=file_asset.user,
-                    file=file_asset,
-                    chunk_text=chunk_data['text'],
-                    embedding=embedding_value,
-                    metadata=chunk_data['metadata'],
-                    page_number=chunk_data['metadata'].get('page_number'),
-                    chunk_index=i,
-                    extraction_method=extraction_method,
-                )
-                chunks_to_create.append(chunk)
-                succeeded += 1
-            except Exception as e:
-                logger.error(f"Error creating chunk {i} for file {file_id}: {str(e)}")
-                failed += 1
-        
-        # Bulk create chunks
-        if chunks_to_create:
-            DocumentChunk.objects.bulk_create(chunks_to_create)
-        
-        # Update file status
-        if failed > 0 and succeeded > 0:
-            file_asset.ingestion_status = 'partial'
-            file_asset.status = 'ready'
-            file_asset.metadata['chunks_succeeded'] = succeeded
-            file_asset.metadata['chunks_failed'] = failed
-        elif failed == 0:
-            file_asset.ingestion_status = 'complete'
-            file_asset.status = 'ready'
-        else:
-            file_asset.ingestion_status = 'failed'
-            file_asset.status = 'failed'
-            file_asset.metadata['error'] = 'All chunks failed to process'
+        for page_number, page_text in pages:
+            pages_extracted += 1
+            instrumentation.record('extract', pages=1, chars=len(page_text or ''))
+            if not page_text or len(page_text.strip()) == 0:
+                continue
+            with instrumentation.stage('chunk'):
+                page_chunks = chunk_text(page_text, metadata={'page_number': page_number})
+            instrumentation.record('chunk', chunks=len(page_chunks))
+            for chunk_data in page_chunks:
+                next_index += 1
+                if next_index <= resume_from:
+                    continue  # Committed before the checkpoint
+                window.append(chunk_data)
+                if len(window) >= window_size:
+                    _write_chunk_window(
+                        file_asset, window, next_index - len(window), extraction_method, pages_extracted, cancelled
+                    )
+                    window = []
         
-        file_asset.save()
+        if window:
+            _write_chunk_window(file_asset, window, next_index - len(window), extraction_method, pages_extracted, cancelled)
         
-        logger.info(f"File {file_id} ingestion completed: {succeeded} succeeded, {failed} failed")
+        save_timings(mode)
+        _check_cancelled(cancelled, file_id)
+        _finish_ingestion(file_asset)
         
+    except IngestionCancelled:
+        logger.warning(f"File {file_id}: ingestion cancelled before its next commit")
+        raise
     except Exception as e:
         logger.error(f"File ingestion failed for {file_id}: {str(e)}")
         file_asset.ingestion_status = 'failed'
         file_asset.status = 'failed'
         file_asset.metadata['error'] = str(e)
+        save_timings(mode)
         file_asset.save()
         raise
-
+    finally:
+        instrumentation.deactivate()
@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.files.models import FileAsset
+from . import jobs, matrix_cache, services, vector_search
+from .models import DocumentChunk, IngestionJob
+
+QUESTION = 'what does the report say about revenue'
+QUERY_EMBEDDING = [1.0, 0.0, 0.0, 0.0]
+
+
+class RetrievalQueryCountTests(TestCase):
+    """Retrieval on SQLite: the cached embedding matrix and BM25 index rank chunks
+    in memory, and only the winning rows are read from the database.
+    
+    Warm caches cost one freshness check of the matrix (count and max id) plus
+    one row fetch per ranked list: 2 queries for vector retrieval, 3 for hybrid.
+    A cold call also builds the matrix (1 query) and the user's BM25 index
+    (1 query, plus 1 per file).
+    """
+    
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        overrides = override_settings(
+            EMBEDDING_MATRIX_CACHE_DIR=f"{self.cache_dir}/matrices",
+            LEXICAL_INDEX_DIR=f"{self.cache_dir}/lexical",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        
+        self.user = User.objects.create(username='retrieval')
+        self.file = FileAsset.objects.create(
+            user=self.user, filename='report.pdf', file_type='pdf', s3_key='tests/report.pdf', size=1,
+        )
+        chunks = [
+            ('Revenue grew in the third quarter.', [1.0, 0.0, 0.0, 0.0]),
+            ('The report covers staffing.', [0.9, 0.1, 0.0, 0.0]),
+            ('The weather was mild.', [0.0, 0.0, 1.0, 0.0]),
+            ('Revenue and profit rose.', [0.0, 1.0, 0.0, 0.0]),
+        ]
+        for index, (text, embedding) in enumerate(chunks):
+            DocumentChunk.objects.create(
+                user=self.user, file=self.file, chunk_text=text, embedding=embedding,
+                embedding_status='embedded', chunk_index=index, metadata={}, extraction_method='pdf',
+            )
+        # Row ids are reused across tests on SQLite; drop any matrix this process kept for the id
+        matrix_cache.invalidate(self.user.id)
+        self.addCleanup(matrix_cache.invalidate, self.user.id)
+    
+    def retrieve(self):
+        return services.retrieve_chunks(QUERY_EMBEDDING, self.user.id, query_text=QUESTION)
+    
+    @override_settings(RETRIEVAL_MODE='vector')
+    def test_vector_retrieval_runs_two_queries(self):
+        self.retrieve()  # Builds the matrix
+        with self.assertNumQueries(2):
+            results = self.retrieve()
+        self.assertEqual(results[0]['filename'], 'report.pdf')
+        self.assertNotIn('embedding', results[0])
+    
+    @override_settings(RETRIEVAL_MODE='hybrid')
+    def test_hybrid_retrieval_runs_three_queries(self):
+        self.retrieve()  # Builds the matrix and the BM25 index
+        with self.assertNumQueries(3):
+            results = self.retrieve()
+        self.assertEqual([result['chunk_index'] for result in results], [0, 1, 3, 2])
+        # Cosine similarity survives fusion; chunks below SIMILARITY_THRESHOLD are keyword-only hits
+        self.assertAlmostEqual(results[0]['similarity'], 1.0, places=5)
+        self.assertIsNone(results[2]['similarity'])
+        self.assertIsNotNone(results[2]['keyword_score'])
+        scores = [result['fusion_score'] for result in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+    
+    @override_settings(RETRIEVAL_MODE='hybrid')
+    def test_cold_hybrid_retrieval_builds_both_indexes(self):
+        with self.assertNumQueries(6):
+            self.retrieve()
+
+    
+    @override_settings(EMBEDDING_MATRIX_CACHE_MAX_USERS=1)
+    def test_evicted_matrix_files_are_removed(self):
+        other = User.objects.create(username='other')
+        self.addCleanup(matrix_cache.invalidate, other.id)
+        matrix_cache.search(self.user.id, QUERY_EMBEDDING, 1)
+        matrix_cache.search(other.id, QUERY_EMBEDDING, 1)
+        names = os.listdir(f"{self.cache_dir}/matrices")
+        self.assertTrue(names)
+        self.assertTrue(all(name.startswith(f'user_{other.id}_') for name in names))
+        # The evicted user's matrix is rebuilt on demand
+        self.assertEqual(len(matrix_cache.search(self.user.id, QUERY_EMBEDDING, 4)), 4)
+
+
+class PgvectorQueryTests(TestCase):
+    """The pgvector path is one round trip selecting only `RETRIEVAL_FIELDS` and the distance.
+    
+    The SQL is compiled without running it, so these tests need no PostgreSQL server.
+    """
+    
+    def test_single_lean_query(self):
+        query = DocumentChunk.objects.filter(user_id=1, embedding_status='embedded')
+        with mock.patch.object(vector_search, 'pgvector_version', return_value=(0, 8, 0)), \
+                mock.patch.object(vector_search, '_fetch', return_value=[]) as fetch:
+            services._pgvector_search(query, QUERY_EMBEDDING, 5)
+        fetch.assert_called_once()
+        
+        queryset = fetch.call_args[0][0]
+        compiler = queryset.query.get_compiler(using='default')
+        select, _, _ = compiler.get_select()
+        columns = [expression.target.column for expression, _, _ in select if hasattr(expression, 'target')]
+        self.assertNotIn('embedding', columns)
+        self.assertIn('filename', columns)
+        sql, _ = queryset.query.sql_with_params()
+        self.assertIn(f'JOIN "{FileAsset._meta.db_table}"', sql)
+
+
+class IngestionLeaseTests(TestCase):
+    """A worker whose lease expired must not finish a job another worker reclaimed."""
+    
+    def setUp(self):
+        self.user = User.objects.create(username='ingestion')
+        self.file = FileAsset.objects.create(
+            user=self.user, filename='report.pdf', file_type='pdf', s3_key='tests/lease.pdf', size=1,
+        )
+        self.job = jobs.enqueue_ingestion(self.file)
+    
+    def test_expired_lease_is_reclaimed(self):
+        first = jobs.claim_next_job('worker-a')
+        self.assertEqual((first.id, first.attempts), (self.job.id, 1))
+        self.assertIsNone(jobs.claim_next_job('worker-b'))
+        
+        IngestionJob.objects.filter(id=first.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        second = jobs.claim_next_job('worker-b')
+        self.assertEqual((second.id, second.attempts, second.worker_id), (self.job.id, 2, 'worker-b'))
+        
+        # The first worker can neither extend nor complete the attempt it lost
+        self.assertFalse(jobs.heartbeat(first, 'worker-a'))
+        self.assertFalse(jobs.complete_job(first, 'worker-a'))
+        self.assertTrue(jobs.complete_job(second, 'worker-b'))
+    
+    def test_retry_request_keeps_active_full_ingestion(self):
+        job = jobs.claim_next_job('worker-a')
+        self.assertEqual(jobs.enqueue_ingestion(self.file, retry_failed=True).id, job.id)
+        job.refresh_from_db()
+        self.assertFalse(job.retry_failed)
+        self.assertEqual(IngestionJob.objects.filter(file=self.file).count(), 1)
+    
+    @override_settings(INGESTION_JOB_LEASE_SECONDS=3)
+    def test_lost_lease_stops_ingestion(self):
+        job = jobs.claim_next_job('worker-a')
+        
+        def ingest(file_id, retry_failed, cancelled):
+            if not cancelled.wait(10):
+                self.fail('the lease loss was not signalled')
+            services._check_cancelled(cancelled, file_id)
+        
+        # A heartbeat error is retried; the next heartbeat finds the lease taken
+        outcomes = [Exception('connection reset'), False]
+        with mock.patch.object(jobs, 'heartbeat', side_effect=outcomes) as heartbeat, \
+                mock.patch.object(services, 'ingest_file_async', side_effect=ingest), \
+                mock.patch.object(jobs, 'complete_job') as complete, mock.patch.object(jobs, 'fail_job') as fail:
+            jobs.run_job(job, 'worker-a')
+        self.assertEqual(heartbeat.call_count, 2)
+        complete.assert_not_called()
+        fail.assert_not_called()
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.status, 'processing')
+    
+    def test_cancelled_ingestion_commits_nothing(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        DocumentChunk.objects.create(
+            user=self.user, file=self.file, chunk_text='Kept.', embedding_status='embedded', chunk_index=0, metadata={},
+        )
+        with self.assertRaises(services.IngestionCancelled):
+            services.ingest_file_async(self.file.id, cancelled=cancelled)
+        self.assertEqual(DocumentChunk.objects.filter(file=self.file).count(), 1)
+        self.file.refresh_from_db()
+        self.assertNotEqual(self.file.status, 'failed')
@@ -3,5 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.health_check, name='health_check'),
+    path('aws-clients/', views.aws_client_metrics, name='aws_client_metrics'),
+    path('embedding-cache/', views.embedding_cache_metrics, name='embedding_cache_metrics'),
 ]
 
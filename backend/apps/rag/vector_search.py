@@ -0,0 +1,179 @@
+"""
+Nearest-neighbour queries for the pgvector path.
+
+`DocumentChunk.embedding` has an HNSW (or IVFFlat) index using cosine ops,
+created by migration 0010 with the build parameters in settings. Every query
+is filtered by user (and optionally files), and an ANN index applies those
+filters after collecting its candidates, so a plain index scan can return
+fewer than `top_k` rows. `nearest_chunks` handles that:
+
+- The index is used with `ef_search` / `probes` set per query. On pgvector
+  0.8+ iterative scans keep searching until enough rows pass the filters; on
+  older versions `ef_search` is raised to over-fetch instead.
+- Without iterative scans, a result that comes back short is repeated as an
+  exact scan. For very selective filters the planner already prefers the
+  btree indexes and an exact sort on its own.
+
+Each search is a single round trip: the transaction-local settings are sent
+in the same statement batch as the query, which runs as one implicit
+transaction, and the query selects only the requested columns.
+
+With `VECTOR_QUANTIZATION` set to `halfvec` or `binary`, migration 0011
+replaces that index with one over a half-precision or binary-quantized
+expression of the embedding, 2x / 32x smaller. With `prefix`, migration 0012
+indexes the first `EMBEDDING_PREFIX_DIMENSION` dimensions instead (Nova
+embeddings are Matryoshka-trained; cosine distance renormalizes the prefix).
+In all three cases candidates are over-fetched from the compact index and
+re-ranked by exact cosine distance on the full-precision column.
+"""
+import re
+import logging
+from typing import List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Func, Value
+
+logger = logging.getLogger(__name__)
+
+HNSW_MAX_EF_SEARCH = 1000  # pgvector's upper bound
+
+_pgvector_version: Optional[Tuple[int, ...]] = None
+
+
+def pgvector_version() -> Tuple[int, ...]:
+    """Installed pgvector extension version, e.g. (0, 8, 0); cached per process."""
+    global _pgvector_version
+    if _pgvector_version is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cursor.fetchone()
+        _pgvector_version = tuple(int(part) for part in re.findall(r'\d+', row[0])) if row else ()
+    return _pgvector_version
+
+
+class QuantizedDistance(Func):
+    """Distance on the quantized embedding expression that migration 0011 indexes.
+
+    `halfvec`: cosine distance between half-precision casts. `binary`: Hamming
+    distance between sign bits, only meaningful for ranking candidates.
+    `prefix`: cosine distance between the leading `EMBEDDING_PREFIX_DIMENSION`
+    dimensions.
+    """
+    output_field = FloatField()
+
+    def __init__(self, expression, vector, quantization: str, dimensions: int, **extra):
+        from pgvector.utils import to_db
+        self.quantization = quantization
+        self.dimensions = int(dimensions)
+        super().__init__(expression, Value(to_db(vector)), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column_sql, column_params = compiler.compile(self.source_expressions[0])
+        vector_sql, vector_params = compiler.compile(self.source_expressions[1])
+        dimensions = self.dimensions
+        if self.quantization == 'binary':
+            sql = (
+                f"binary_quantize({column_sql})::bit({dimensions}) <~> "
+                f"binary_quantize({vector_sql}::vector({dimensions}))::bit({dimensions})"
+            )
+        elif self.quantization == 'prefix':
+            prefix = int(settings.EMBEDDING_PREFIX_DIMENSION)
+            sql = (
+                f"subvector({column_sql}, 1, {prefix})::vector({prefix}) <=> "
+                f"subvector({vector_sql}::vector({dimensions}), 1, {prefix})::vector({prefix})"
+            )
+        else:
+            sql = f"{column_sql}::halfvec({dimensions}) <=> {vector_sql}::halfvec({dimensions})"
+        return f"({sql})", (*column_params, *vector_params)
+
+
+def _fetch(queryset, local_settings: List[Tuple[str, object]]) -> List[tuple]:
+    """Run a sliced `values_list` queryset after `set_config(..., true)` calls, in one round trip.
+
+    psycopg2 sends the statements as one batch; outside an explicit transaction
+    they run in one implicit transaction, so the settings apply to the query
+    only and never leak into pooled connections.
+    """
+    sql, params = queryset.query.sql_with_params()
+    prefix = ''.join("SELECT set_config(%s, %s, true); " for _ in local_settings)
+    prefix_params = [str(value) for setting in local_settings for value in setting]
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, (*prefix_params, *params))
+        return cursor.fetchall()
+
+
+def _index_settings(limit: int) -> Tuple[List[Tuple[str, object]], bool]:
+    """Per-query index settings for fetching `limit` rows that pass the filters, and whether scans are iterative."""
+    iterative = pgvector_version() >= (0, 8, 0)
+    if settings.VECTOR_INDEX_TYPE == 'ivfflat':
+        local_settings = [('ivfflat.probes', settings.VECTOR_SEARCH_IVFFLAT_PROBES)]
+        if iterative:
+            local_settings.append(('ivfflat.iterative_scan', 'relaxed_order'))
+        return local_settings, iterative
+    ef_search = max(settings.VECTOR_SEARCH_HNSW_EF_SEARCH, limit)
+    local_settings = []
+    if iterative:
+        local_settings.append(('hnsw.iterative_scan', 'relaxed_order'))
+    else:
+        # Without iterative scans, filtered-out rows use up candidates: over-fetch
+        ef_search = max(ef_search, limit * settings.VECTOR_SEARCH_OVERFETCH)
+    local_settings.append(('hnsw.ef_search', min(ef_search, HNSW_MAX_EF_SEARCH)))
+    return local_settings, iterative
+
+
+def _by_distance(rows: List[tuple]) -> List[tuple]:
+    # Distance is the last column; relaxed-order iterative scans may return rows slightly out of order
+    return sorted(rows, key=lambda row: row[-1])
+
+
+def _approximate(queryset, query_embedding: List[float], top_k: int, fields: Sequence[str]) -> Tuple[List[tuple], bool]:
+    """Full-precision index scan; returns (rows, whether a short result is complete)."""
+    from pgvector.django import CosineDistance
+
+    ordered = queryset.annotate(distance=CosineDistance('embedding', query_embedding)).order_by('distance')
+    local_settings, iterative = _index_settings(top_k)
+    return _by_distance(_fetch(ordered.values_list(*fields, 'distance')[:top_k], local_settings)), iterative
+
+
+def _quantized(
+    queryset, query_embedding: List[float], top_k: int, quantization: str, fields: Sequence[str]
+) -> Tuple[List[tuple], bool]:
+    """Over-fetch candidates from the compact index, then re-rank them on full-precision distance."""
+    from pgvector.django import CosineDistance
+
+    candidates = queryset.annotate(
+        approximate_distance=QuantizedDistance('embedding', query_embedding, quantization, settings.EMBEDDING_DIMENSION),
+        distance=CosineDistance('embedding', query_embedding),  # Only computed for the fetched rows
+    ).order_by('approximate_distance')
+    fetch = top_k * settings.VECTOR_QUANTIZED_OVERFETCH
+    local_settings, iterative = _index_settings(fetch)
+    rows = _fetch(candidates.values_list(*fields, 'distance')[:fetch], local_settings)
+    return _by_distance(rows)[:top_k], iterative
+
+
+def _exact(queryset, query_embedding: List[float], top_k: int, fields: Sequence[str]) -> List[tuple]:
+    from pgvector.django import CosineDistance
+
+    ordered = queryset.annotate(distance=CosineDistance('embedding', query_embedding)).order_by('distance')
+    # Keeps the planner off the ANN index; the user filter still uses bitmap scans of the btree indexes
+    return _fetch(ordered.values_list(*fields, 'distance')[:top_k], [('enable_indexscan', 'off')])
+
+
+def nearest_chunks(
+    queryset, query_embedding: List[float], top_k: int, fields: Sequence[str], quantization: Optional[str] = None
+) -> List[tuple]:
+    """The `top_k` chunks of `queryset` closest to the query, best first.
+
+    Rows hold the values of `fields` (as for `values_list`) followed by the
+    cosine distance. `quantization` defaults to `VECTOR_QUANTIZATION`
+    ('none', 'halfvec', 'binary' or 'prefix').
+    """
+    quantization = quantization or settings.VECTOR_QUANTIZATION
+    if quantization in ('halfvec', 'binary', 'prefix'):
+        rows, complete = _quantized(queryset, query_embedding, top_k, quantization, fields)
+    else:
+        rows, complete = _approximate(queryset, query_embedding, top_k, fields)
+    if len(rows) < top_k and not complete:
+        logger.info(f"[RAG] Index scan returned {len(rows)} of {top_k} chunks after filtering; repeating as an exact scan")
+        return _exact(queryset, query_embedding, top_k, fields)
+    return rows
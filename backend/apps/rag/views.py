@@ -1,10 +1,13 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import connection
 import logging
 
+from config.aws_clients import get_client_metrics
+from . import embedding_cache, query_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,3 +48,23 @@ def health_check(request):
             'message': str(e)
         }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def aws_client_metrics(request):
+    """Shared AWS client creation and connection reuse counters for this process (admin only)."""
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(get_client_metrics())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def embedding_cache_metrics(request):
+    """Query and chunk embedding cache hit rates (admin only)."""
+    if not request.user.is_staff:
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    return Response({
+        'query_embeddings': query_cache.get_stats(),
+        'chunk_embeddings': embedding_cache.get_cache_stats(),
+    })
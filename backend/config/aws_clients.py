@@ -0,0 +1,141 @@
+"""
+Process-wide registry of shared boto3 clients.
+
+boto3 clients are thread-safe, so one client per (service, region, credentials)
+is built on first use and shared by every request, ingestion thread and chat
+query, keeping its connection pool (and TLS sessions) warm. Clients are built
+with a larger `max_pool_connections` and adaptive retries, except for services
+in `APP_RETRIED_SERVICES`: their callers retry with their own backoff and rate
+limiting, so botocore makes a single attempt there and throttling reaches the
+caller at once instead of after several hidden retries.
+
+Clients must not cross a fork: the registry is cleared in forked children
+(gunicorn workers, multiprocessing) and re-checked against the pid on access.
+
+This module is also used while settings load (Secrets Manager), so Django
+settings are read lazily with defaults.
+"""
+import os
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'AWS_MAX_POOL_CONNECTIONS': 32,
+    'AWS_RETRY_MAX_ATTEMPTS': 5,
+    'AWS_CONNECT_TIMEOUT': 5,
+    'AWS_READ_TIMEOUT': 60,
+}
+
+# Retried by the application (apps.rag.embeddings: token bucket + jittered backoff)
+APP_RETRIED_SERVICES = {'bedrock-runtime'}
+
+_clients: Dict[Tuple, object] = {}
+_metrics: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def _setting(name: str):
+    try:
+        from django.conf import settings
+        return getattr(settings, name, DEFAULTS[name])
+    except Exception:
+        # Settings not configured yet (called while they load)
+        return DEFAULTS[name]
+
+
+def _service_metrics(service: str) -> Dict[str, int]:
+    return _metrics.setdefault(service, {'clients_created': 0, 'client_reuses': 0, 'requests': 0})
+
+
+def _build_client(service: str, region: Optional[str], **credentials):
+    if service in APP_RETRIED_SERVICES:
+        retries = {'total_max_attempts': 1, 'mode': 'standard'}  # One attempt, no botocore retries
+    else:
+        retries = {'max_attempts': _setting('AWS_RETRY_MAX_ATTEMPTS'), 'mode': 'adaptive'}
+    config = Config(
+        max_pool_connections=_setting('AWS_MAX_POOL_CONNECTIONS'),
+        retries=retries,
+        connect_timeout=_setting('AWS_CONNECT_TIMEOUT'),
+        read_timeout=_setting('AWS_READ_TIMEOUT'),
+    )
+    # Sessions are not thread-safe; each client gets its own, built under the registry lock
+    return boto3.session.Session().client(service, region_name=region, config=config, **credentials)
+
+
+def _count_request(service: str):
+    def handler(**kwargs):
+        with _lock:
+            _service_metrics(service)['requests'] += 1
+    return handler
+
+
+def _reset_after_fork():
+    global _lock, _pid
+    _lock = threading.Lock()  # May have been held by another thread at fork time
+    _clients.clear()
+    _metrics.clear()
+    _pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(service: str, region: Optional[str] = None, **credentials):
+    """Shared client for `service`.
+
+    Extra keyword arguments (explicit credentials, `endpoint_url`) are passed to
+    the client and are part of the registry key.
+    """
+    if os.getpid() != _pid:
+        _reset_after_fork()
+    key = (service, region, tuple(sorted(credentials.items())))
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _service_metrics(service)['client_reuses'] += 1
+            return client
+        client = _build_client(service, region, **credentials)
+        client.meta.events.register('before-send', _count_request(service))
+        _clients[key] = client
+        _service_metrics(service)['clients_created'] += 1
+    logger.info(f"[AWS] Created shared {service} client (region {region or 'default'})")
+    return client
+
+
+def reset_clients():
+    """Drop all shared clients (tests, credential rotation)."""
+    with _lock:
+        _clients.clear()
+
+
+def _connection_counts(client) -> Tuple[int, int]:
+    """(connections opened, requests sent) from the client's urllib3 pools; (0, 0) if unavailable."""
+    try:
+        manager = client._endpoint.http_session._manager
+        pools = [manager.pools[key] for key in manager.pools.keys()]
+    except Exception:
+        return 0, 0
+    return sum(pool.num_connections for pool in pools), sum(pool.num_requests for pool in pools)
+
+
+def get_client_metrics() -> dict:
+    """Per-service client creation and connection reuse counters for this process."""
+    with _lock:
+        metrics = {service: dict(counts) for service, counts in _metrics.items()}
+        clients = list(_clients.items())
+    for (service, _, _), client in clients:
+        connections, pooled_requests = _connection_counts(client)
+        counts = metrics[service]
+        counts['connections_opened'] = counts.get('connections_opened', 0) + connections
+        counts['pooled_requests'] = counts.get('pooled_requests', 0) + pooled_requests
+    for counts in metrics.values():
+        pooled = counts.get('pooled_requests', 0)
+        counts['connection_reuse_rate'] = 1 - counts.get('connections_opened', 0) / pooled if pooled else 0.0
+    return {'pid': _pid, 'services': metrics}
@@ -2,8 +2,8 @@
 AWS Secrets Manager utility for retrieving RDS database credentials.
 """
 import json
-import boto3
 from botocore.exceptions import ClientError
+from config.aws_clients import get_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,11 +20,7 @@ def get_secret(secret_name: str, region_name: str = 'us-east-1') -> dict:
     Returns:
         dict: Secret value as a dictionary
     """
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
+    client = get_client('secretsmanager', region=region_name)
     
     try:
         get_secret_value_response = client.get_secret_value(
@@ -2,6 +2,7 @@
 Django settings for config project.
 """
 import os
+import tempfile
 from pathlib import Path
 import environ
 
@@ -192,6 +193,15 @@ AWS_S3_REGION_NAME = env('AWS_REGION', default='us-east-1')
 AWS_S3_SIGNATURE_VERSION = 's3v4'
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
+S3_RANGE_SIZE = env.int('S3_RANGE_SIZE', default=8 * 1024 * 1024)  # Bytes per ranged GET when streaming objects
+S3_READ_CHUNK_SIZE = 1024 * 1024
+S3_SPOOL_MAX_MEMORY = env.int('S3_SPOOL_MAX_MEMORY', default=4 * 1024 * 1024)  # Larger downloads spill to a temp file
+
+# Shared boto3 clients (config/aws_clients.py)
+AWS_MAX_POOL_CONNECTIONS = env.int('AWS_MAX_POOL_CONNECTIONS', default=32)  # Per client; covers embedding threads x worker slots
+AWS_RETRY_MAX_ATTEMPTS = env.int('AWS_RETRY_MAX_ATTEMPTS', default=5)  # botocore adaptive retry mode; Bedrock runtime is retried by the app instead
+AWS_CONNECT_TIMEOUT = 5  # seconds
+AWS_READ_TIMEOUT = 60
 
 # Bedrock Configuration
 BEDROCK_REGION = env('BEDROCK_REGION', default='us-east-1')
@@ -210,11 +220,98 @@ ALLOWED_MIME_TYPES = [
 ]
 
 # RAG Settings
-CHUNK_SIZE = 800
-CHUNK_OVERLAP = 200
-EMBEDDING_DIMENSION = 1024  # Titan v2
+CHUNK_SIZE_TOKENS = env.int('CHUNK_SIZE_TOKENS', default=200)  # About 800 characters of English text
+CHUNK_OVERLAP_TOKENS = env.int('CHUNK_OVERLAP_TOKENS', default=50)
+# Nova 2 output size (256, 384, 1024 or 3072): the single source for generate_embeddings, the VectorField
+# and migrations. Changing it needs a schema migration and re-embedding every chunk.
+EMBEDDING_DIMENSION = env.int('EMBEDDING_DIMENSION', default=1024)
+# Leading dimensions used for the first retrieval stage when VECTOR_QUANTIZATION=prefix (Nova embeddings
+# are Matryoshka-trained, so a prefix is a usable lower-resolution embedding)
+EMBEDDING_PREFIX_DIMENSION = env.int('EMBEDDING_PREFIX_DIMENSION', default=256)
 SIMILARITY_THRESHOLD = 0.05  # Very permissive threshold - system will fallback to top chunks if none match
 TOP_K_CHUNKS = 5
+INGESTION_WINDOW_SIZE = env.int('INGESTION_WINDOW_SIZE', default=64)  # Chunks embedded and committed together
+CHUNK_COPY_BATCH_SIZE = env.int('CHUNK_COPY_BATCH_SIZE', default=500)  # Rows per binary COPY on PostgreSQL
+# pgvector ANN index (build parameters are read when migration rag 0010 creates the index)
+VECTOR_INDEX_TYPE = env('VECTOR_INDEX_TYPE', default='hnsw')  # hnsw or ivfflat
+VECTOR_INDEX_HNSW_M = env.int('VECTOR_INDEX_HNSW_M', default=16)
+VECTOR_INDEX_HNSW_EF_CONSTRUCTION = env.int('VECTOR_INDEX_HNSW_EF_CONSTRUCTION', default=64)
+VECTOR_INDEX_IVFFLAT_LISTS = env.int('VECTOR_INDEX_IVFFLAT_LISTS', default=100)  # About rows / 1000 up to 1M rows
+VECTOR_SEARCH_HNSW_EF_SEARCH = env.int('VECTOR_SEARCH_HNSW_EF_SEARCH', default=100)  # Set per query
+VECTOR_SEARCH_IVFFLAT_PROBES = env.int('VECTOR_SEARCH_IVFFLAT_PROBES', default=10)
+VECTOR_SEARCH_OVERFETCH = env.int('VECTOR_SEARCH_OVERFETCH', default=40)  # ef_search >= top_k * this without iterative scans
+VECTOR_QUANTIZATION = env('VECTOR_QUANTIZATION', default='none')  # none, halfvec, binary (rag 0011) or prefix (rag 0012)
+VECTOR_QUANTIZED_OVERFETCH = env.int('VECTOR_QUANTIZED_OVERFETCH', default=10)  # Candidates per result re-ranked at full precision
+# Hybrid retrieval: vector and keyword candidates merged by reciprocal-rank fusion
+RETRIEVAL_MODE = env('RETRIEVAL_MODE', default='hybrid')  # hybrid or vector
+HYBRID_CANDIDATES = env.int('HYBRID_CANDIDATES', default=20)  # Per retriever, before fusion
+HYBRID_VECTOR_WEIGHT = env.float('HYBRID_VECTOR_WEIGHT', default=1.0)
+HYBRID_KEYWORD_WEIGHT = env.float('HYBRID_KEYWORD_WEIGHT', default=1.0)
+HYBRID_RRF_K = env.int('HYBRID_RRF_K', default=60)
+SEARCH_TEXT_CONFIG = env('SEARCH_TEXT_CONFIG', default='english')  # PostgreSQL text search config; read by migration rag 0013 too
+# Per-user normalized embedding matrices for retrieval without pgvector (apps/rag/matrix_cache.py)
+EMBEDDING_MATRIX_CACHE_DIR = env('EMBEDDING_MATRIX_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'rag-embedding-matrices'))
+EMBEDDING_MATRIX_CACHE_MAX_USERS = env.int('EMBEDDING_MATRIX_CACHE_MAX_USERS', default=64)  # Memory-mapped per process
+# Per-user BM25 inverted index for keyword retrieval without PostgreSQL (apps/rag/lexical_index.py)
+LEXICAL_INDEX_DIR = env('LEXICAL_INDEX_DIR', default=os.path.join(tempfile.gettempdir(), 'rag-lexical-index'))
+LEXICAL_INDEX_MAX_USERS = env.int('LEXICAL_INDEX_MAX_USERS', default=64)  # Users whose segments stay loaded per process
+BM25_K1 = env.float('BM25_K1', default=1.2)
+BM25_B = env.float('BM25_B', default=0.75)
+INGESTION_TEXT_BLOCK_CHARS = 64 * 1024  # Block size for page-less TXT/DOCX streaming
+PDF_EXTRACTION_WORKERS = env.int('PDF_EXTRACTION_WORKERS', default=min(4, os.cpu_count() or 1))  # 1 disables the process pool
+PDF_PARALLEL_PAGE_THRESHOLD = env.int('PDF_PARALLEL_PAGE_THRESHOLD', default=50)  # Smaller PDFs aren't worth spawning workers
+PDF_PAGES_PER_TASK = 16
+IMAGE_MAX_DIMENSION = env.int('IMAGE_MAX_DIMENSION', default=2048)  # Longest side sent to vision models, in pixels
+IMAGE_JPEG_QUALITY = env.int('IMAGE_JPEG_QUALITY', default=85)
+
+# Embedding generation (Bedrock Nova)
+EMBEDDING_MAX_CONCURRENCY = env.int('EMBEDDING_MAX_CONCURRENCY', default=8)  # Parallel invoke_model calls per batch
+EMBEDDING_REQUESTS_PER_SECOND = env.float('EMBEDDING_REQUESTS_PER_SECOND', default=10.0)  # Per process, halved on throttling
+EMBEDDING_RATE_BURST = env.int('EMBEDDING_RATE_BURST', default=10)
+EMBEDDING_RETRY_BASE_DELAY = 0.5  # seconds, full jitter
+EMBEDDING_RETRY_MAX_DELAY = 20.0
+EMBEDDING_CACHE_MAX_ENTRIES = env.int('EMBEDDING_CACHE_MAX_ENTRIES', default=200000)  # LRU-evicted beyond this
+EMBEDDING_CACHE_EVICT_INTERVAL = env.int('EMBEDDING_CACHE_EVICT_INTERVAL', default=300)  # seconds between size checks per process
+EMBEDDING_CACHE_STATS_FLUSH_INTERVAL = env.int('EMBEDDING_CACHE_STATS_FLUSH_INTERVAL', default=60)  # seconds between counter writes per process
+# Chat query embeddings (apps/rag/query_cache.py): per-process LRU in front of the shared `query_embeddings` cache
+QUERY_EMBEDDING_CACHE_TTL = env.int('QUERY_EMBEDDING_CACHE_TTL', default=3600)  # seconds
+QUERY_EMBEDDING_LOCAL_MAX_ENTRIES = env.int('QUERY_EMBEDDING_LOCAL_MAX_ENTRIES', default=256)
+QUERY_EMBEDDING_STATS_FLUSH_INTERVAL = env.int('QUERY_EMBEDDING_STATS_FLUSH_INTERVAL', default=60)  # seconds between shared counter writes per process
+
+# Ingestion job queue (see `manage.py run_ingestion_worker`)
+INGESTION_WORKER_CONCURRENCY = env.int('INGESTION_WORKER_CONCURRENCY', default=2)
+INGESTION_WORKER_POLL_INTERVAL = env.float('INGESTION_WORKER_POLL_INTERVAL', default=2.0)  # seconds
+INGESTION_JOB_LEASE_SECONDS = env.int('INGESTION_JOB_LEASE_SECONDS', default=120)  # Heartbeat every third of this
+INGESTION_JOB_MAX_ATTEMPTS = env.int('INGESTION_JOB_MAX_ATTEMPTS', default=3)
+INGESTION_JOB_RETRY_BACKOFF = env.int('INGESTION_JOB_RETRY_BACKOFF', default=30)  # seconds, doubled per attempt
+
+# File status event stream (GET /api/files/events/)
+FILE_EVENTS_POLL_INTERVAL = env.float('FILE_EVENTS_POLL_INTERVAL', default=1.0)  # seconds, one query per web process
+FILE_EVENTS_HEARTBEAT_SECONDS = 15  # Keeps proxies from closing idle streams
+FILE_EVENTS_STREAM_SECONDS = env.int('FILE_EVENTS_STREAM_SECONDS', default=300)  # Clients reconnect after this
+
+# Semantic answer cache (apps/chat/answer_cache.py)
+ANSWER_CACHE_ENABLED = env.bool('ANSWER_CACHE_ENABLED', default=True)
+ANSWER_CACHE_SIMILARITY_THRESHOLD = env.float('ANSWER_CACHE_SIMILARITY_THRESHOLD', default=0.97)  # Query embedding cosine similarity
+ANSWER_CACHE_TTL = env.int('ANSWER_CACHE_TTL', default=7 * 24 * 3600)  # seconds
+ANSWER_CACHE_MAX_CANDIDATES = 200  # Most recently used entries compared per question
+ANSWER_CACHE_MAX_ENTRIES_PER_USER = env.int('ANSWER_CACHE_MAX_ENTRIES_PER_USER', default=500)
+
+# Caches. `query_embeddings` is shared by all gunicorn workers: file-based by default, so it needs no extra
+# service; any Django backend works (e.g. QUERY_EMBEDDING_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'query_embeddings': {
+        'BACKEND': env('QUERY_EMBEDDING_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': env('QUERY_EMBEDDING_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'rag-query-embeddings')),
+        'TIMEOUT': QUERY_EMBEDDING_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('QUERY_EMBEDDING_CACHE_MAX_ENTRIES', default=10000),  # Culled beyond this
+        },
+    },
+}
 
 # Logging
 LOGGING = {
@@ -50,11 +50,23 @@ python manage.py migrate --noinput
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Start ingestion worker (set RUN_INGESTION_WORKER=false when it runs as its own service).
+# This background process is not supervised: if it dies, nothing restarts it and uploads
+# stay queued. In production run `manage.py run_ingestion_worker` as a separate,
+# restarted service (systemd unit, ECS service, second container) instead.
+if [ "${RUN_INGESTION_WORKER:-true}" = "true" ]; then
+    echo "Starting ingestion worker..."
+    python manage.py run_ingestion_worker &
+fi
+
 # Start Gunicorn
 echo "Starting Gunicorn..."
+# Threaded workers: each open file event stream (SSE) holds a thread, not a whole worker
 exec gunicorn config.wsgi:application \
     --bind 0.0.0.0:8000 \
     --workers 4 \
+    --worker-class gthread \
+    --threads ${GUNICORN_THREADS:-32} \
     --timeout 120 \
     --access-logfile - \
     --error-logfile -
@@ -20,7 +20,6 @@ export default function ChatInterface({
     conversationId
   );
   const messagesEndRef = useRef<HTMLDivElement>(null);
-  const streamingIntervalRef = useRef<number | null>(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -73,58 +72,52 @@ export default function ChatInterface({
     };
     setMessages((prev) => [...prev, tempUserMessage]);
 
+    // Placeholder for the answer, filled in as tokens arrive
+    const tempAssistantId = tempUserMessage.id + 1;
+    const updateAssistant = (update: (m: Message) => Message) =>
+      setMessages((prev) => prev.map((m) => (m.id === tempAssistantId ? update(m) : m)));
+
     try {
       console.log('[Chat] Sending message');
 
-      const response = await apiClient.sendMessage(
+      const response = await apiClient.streamMessage(
         userMessage,
+        {
+          onConversation: (convId, savedMessage) => {
+            // Update conversation ID if new conversation was created
+            if (convId !== currentConversationId) {
+              setCurrentConversationId(convId);
+              onConversationChange?.(convId);
+            }
+            setMessages((prev) => [
+              ...prev.filter((m) => m.id !== tempUserMessage.id),
+              savedMessage,
+              {
+                id: tempAssistantId,
+                role: 'assistant',
+                content: '',
+                file_ids: [],
+                created_at: new Date().toISOString(),
+              },
+            ]);
+          },
+          onCitations: (citations) => updateAssistant((m) => ({ ...m, citations })),
+          onDelta: (text) => updateAssistant((m) => ({ ...m, content: m.content + text })),
+          onError: (error) => console.error('[Chat] Stream error:', error),
+        },
         currentConversationId,
         selectedFileIds.length > 0 ? selectedFileIds : undefined
       );
-
-      // Update conversation ID if new conversation was created
-      if (response.conversation_id !== currentConversationId) {
-        setCurrentConversationId(response.conversation_id);
-        onConversationChange?.(response.conversation_id);
+      if (!response) {
+        throw new Error('Chat stream ended without a response');
       }
 
-      // Replace temp message with actual message and add response placeholder
-      setMessages((prev) => {
-        const filtered = prev.filter((m) => m.id !== tempUserMessage.id);
-        const assistantMsg: Message = {
-          ...response.response,
-          citations: response.citations || [],
-          content: '',
-        };
-        return [...filtered, response.message, assistantMsg];
-      });
-
-      // Pseudo-streaming: reveal assistant text gradually
-      const fullText = response.response.content || '';
-      if (fullText.length === 0) {
-        setMessages((prev) =>
-          prev.map((m) =>
-            m.id === response.response.id ? { ...m, content: fullText, citations: response.citations || [] } : m
-          )
-        );
-      } else {
-        let index = 0;
-        const step = Math.max(10, Math.floor(fullText.length / 30));
-        if (streamingIntervalRef.current) clearInterval(streamingIntervalRef.current);
-        streamingIntervalRef.current = window.setInterval(() => {
-          index = Math.min(fullText.length, index + step);
-          const partial = fullText.slice(0, index);
-          setMessages((prev) =>
-            prev.map((m) =>
-              m.id === response.response.id ? { ...m, content: partial, citations: response.citations || [] } : m
-            )
-          );
-          if (index >= fullText.length && streamingIntervalRef.current) {
-            clearInterval(streamingIntervalRef.current);
-            streamingIntervalRef.current = null;
-          }
-        }, 30);
-      }
+      // Replace the placeholder with the saved assistant message
+      setMessages((prev) =>
+        prev.map((m) =>
+          m.id === tempAssistantId ? { ...response.response, citations: response.citations || [] } : m
+        )
+      );
     } catch (error: any) {
       console.error('[Chat] Error sending message');
 
@@ -137,7 +130,7 @@ export default function ChatInterface({
         created_at: new Date().toISOString(),
       };
       setMessages((prev) => {
-        const filtered = prev.filter((m) => m.id !== tempUserMessage.id);
+        const filtered = prev.filter((m) => m.id !== tempUserMessage.id && m.id !== tempAssistantId);
         return [...filtered, errorMessage];
       });
     } finally {
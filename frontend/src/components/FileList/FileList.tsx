@@ -1,6 +1,6 @@
 import { useState, useEffect, useImperativeHandle, forwardRef, useRef } from 'react';
 import { apiClient } from '../../services/api';
-import type { FileAsset } from '../../types';
+import type { FileAsset, FileStatusEvent } from '../../types';
 
 interface FileListProps {
   selectedFiles: number[];
@@ -57,13 +57,47 @@ const FileList = forwardRef<FileListRef, FileListProps>(
 
   useEffect(() => {
     loadFiles();
-    const interval = setInterval(() => {
-      // Check if any files are in processing states using ref to get current state
-      if (filesRef.current.some((f) => ['processing', 'uploaded'].includes(f.status))) {
-        loadFiles(pageRef.current);
+
+    // Status changes are pushed over a server-sent event stream instead of polling the list
+    const controller = new AbortController();
+    let lastEventId: string | undefined;
+
+    const applyEvent = (event: FileStatusEvent) => {
+      lastEventId = event.updated_at;
+      if (!filesRef.current.some((f) => f.id === event.id)) {
+        // Not on this page yet (e.g. uploaded from another tab)
+        if (pageRef.current === 1) loadFiles(1);
+        return;
       }
-    }, 5000);
-    return () => clearInterval(interval);
+      const next = filesRef.current.map((f) =>
+        f.id === event.id
+          ? {
+              ...f,
+              status: event.status,
+              ingestion_status: event.ingestion_status,
+              metadata: { ...f.metadata, ingestion_progress: event.progress },
+            }
+          : f
+      );
+      filesRef.current = next;
+      setFiles(next);
+    };
+
+    const listen = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          await apiClient.streamFileEvents(applyEvent, controller.signal, lastEventId);
+          continue; // Server closed the stream normally: reconnect right away
+        } catch (err) {
+          if (controller.signal.aborted) return;
+          console.warn('[Files] Event stream error, reconnecting', err);
+        }
+        await new Promise((resolve) => setTimeout(resolve, 3000));
+      }
+    };
+    listen();
+
+    return () => controller.abort();
   }, []); // eslint-disable-line react-hooks/exhaustive-deps
 
   const visibleFiles = files.filter((f) => {
@@ -259,6 +293,11 @@ const FileList = forwardRef<FileListRef, FileListProps>(
                     {file.ingestion_status !== 'complete' && (
                       <span className="text-gray-400">{file.ingestion_status}</span>
                     )}
+                    {file.status === 'processing' && file.metadata?.ingestion_progress && (
+                      <span className="text-gray-400">
+                        {file.metadata.ingestion_progress.chunks_committed} chunks indexed
+                      </span>
+                    )}
                   </div>
                 </div>
               </div>
@@ -5,8 +5,11 @@ import type {
   FileListResponse,
   PresignResponse,
   FileAsset,
+  FileStatusEvent,
   ChatResponse,
+  ChatStreamHandlers,
   Conversation,
+  Message,
 } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api';
@@ -197,6 +200,79 @@ class ApiClient {
     await this.client.post(`/files/${fileId}/retry-finalize/`);
   }
 
+  // Opens a server-sent event stream with fetch instead of EventSource, so the JWT can be
+  // sent in the Authorization header (and so POST works).
+  private async openEventStream(path: string, init: RequestInit = {}): Promise<Response> {
+    const open = () =>
+      fetch(`${API_BASE_URL}${path}`, {
+        ...init,
+        headers: {
+          Accept: 'text/event-stream',
+          Authorization: `Bearer ${localStorage.getItem('access_token')}`,
+          ...(init.headers || {}),
+        },
+      });
+
+    let response = await open();
+    if (response.status === 401) {
+      // Let the axios interceptor refresh the access token, then retry once
+      await this.getCurrentUser();
+      response = await open();
+    }
+    return response;
+  }
+
+  // Calls onEvent for each event in the stream; resolves when the server ends it.
+  private async readEventStream(
+    response: Response,
+    onEvent: (eventName: string, data: string) => void
+  ): Promise<void> {
+    if (!response.body) return;
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let eventName = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event:')) eventName = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        if (data) onEvent(eventName, data);
+      }
+    }
+  }
+
+  // Server-sent file status events. Resolves when the server ends the stream.
+  async streamFileEvents(
+    onEvent: (event: FileStatusEvent) => void,
+    signal: AbortSignal,
+    lastEventId?: string
+  ): Promise<void> {
+    const response = await this.openEventStream('/files/events/', {
+      headers: lastEventId ? { 'Last-Event-ID': lastEventId } : {},
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`File event stream failed: HTTP ${response.status}`);
+    }
+    await this.readEventStream(response, (eventName, data) => {
+      if (eventName === 'file') {
+        onEvent(JSON.parse(data));
+      }
+    });
+  }
+
   // Chat endpoints
   async sendMessage(
     message: string,
@@ -229,6 +305,59 @@ class ApiClient {
     }
   }
 
+  // Streams the answer token by token (POST /chat/stream/). Resolves with the saved
+  // messages once the stream completes, or null if it ended without an answer.
+  async streamMessage(
+    message: string,
+    handlers: ChatStreamHandlers,
+    conversationId?: number,
+    fileIds?: number[],
+    signal?: AbortSignal
+  ): Promise<ChatResponse | null> {
+    console.log('[Chat] Streaming message:', {
+      message: message.substring(0, 50) + '...',
+      conversationId,
+      fileIds,
+    });
+    const response = await this.openEventStream('/chat/stream/', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        message,
+        conversation_id: conversationId,
+        file_ids: fileIds || [],
+      }),
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      // Request errors come back as a single `error` event
+      const detail = (await response.text()).match(/^data: (.*)$/m)?.[1];
+      const error = detail ? JSON.parse(detail).error : undefined;
+      console.error('[Chat] Stream request failed:', { status: response.status, error });
+      throw new Error(error || `Chat stream failed: HTTP ${response.status}`);
+    }
+
+    let userMessage: Message | undefined;
+    let result: ChatResponse | null = null;
+    await this.readEventStream(response, (eventName, data) => {
+      const payload = JSON.parse(data);
+      if (eventName === 'conversation') {
+        userMessage = payload.message;
+        handlers.onConversation?.(payload.conversation_id, payload.message);
+      } else if (eventName === 'citations') {
+        handlers.onCitations?.(payload.citations || [], !!payload.cached);
+      } else if (eventName === 'delta') {
+        handlers.onDelta?.(payload.text);
+      } else if (eventName === 'error') {
+        handlers.onError?.(payload.error);
+      } else if (eventName === 'done' && userMessage) {
+        result = { ...payload, message: userMessage };
+      }
+    });
+    console.log('[Chat] Stream finished:', { completed: result !== null });
+    return result;
+  }
+
   async getConversationHistory(conversationId: number): Promise<Conversation> {
     const response = await this.client.get(`/chat/history/${conversationId}/`);
     return response.data;
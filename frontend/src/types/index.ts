@@ -28,6 +28,19 @@ export interface FileAsset {
   metadata: Record<string, any>;
 }
 
+export interface IngestionProgress {
+  chunks_committed: number;
+  pages_extracted: number | null;
+}
+
+export interface FileStatusEvent {
+  id: number;
+  status: FileAsset['status'];
+  ingestion_status: FileAsset['ingestion_status'];
+  progress: IngestionProgress | null;
+  updated_at: string;
+}
+
 export interface FileListResponse {
   results: FileAsset[];
   count: number;
@@ -61,6 +74,15 @@ export interface ChatResponse {
   message: Message;
   response: Message;
   citations: Citation[];
+  cached?: boolean;
+}
+
+// Callbacks for the server-sent events of POST /chat/stream/, in the order they arrive
+export interface ChatStreamHandlers {
+  onConversation?: (conversationId: number, message: Message) => void;
+  onCitations?: (citations: Citation[], cached: boolean) => void;
+  onDelta?: (text: string) => void;
+  onError?: (error: string) => void;
 }
 
 export interface Conversation {